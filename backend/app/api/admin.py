@@ -0,0 +1,58 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from ..core.admission import admission
+from ..core.auth import require_admin
+from ..core.loop_monitor import loop_monitor
+from ..core.profiler import profiler, render_folded
+from ..core.serialization import ORJSONRoute
+from ..models.admin import ProfilerSettings
+
+router = APIRouter(route_class=ORJSONRoute, dependencies=[Depends(require_admin)])
+
+@router.get("/event-loop")
+async def get_event_loop_report(limit: int = Query(20, ge=1, le=100)):
+    """Event-loop lag and the code that blocked the loop longest, with stacks"""
+    return loop_monitor.report(limit)
+
+@router.delete("/event-loop")
+async def reset_event_loop_report():
+    """Clear recorded lag and blocking sites"""
+    loop_monitor.reset()
+    return {"status": "reset"}
+
+@router.get("/profiler")
+async def get_profiler():
+    """Profiler settings and the latest request profiles"""
+    return {
+        "rate": profiler.rate,
+        "routes": list(profiler.routes),
+        "interval_ms": profiler.interval * 1000,
+        "profiles": profiler.recent(),
+    }
+
+@router.put("/profiler")
+async def update_profiler(payload: ProfilerSettings):
+    """Change the fraction of requests profiled by this worker"""
+    profiler.rate = payload.rate
+    return {"rate": profiler.rate}
+
+@router.get("/profiler/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """One request's profile as folded stacks"""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return render_folded(profile.samples)
+
+@router.get("/profiler/aggregate", response_class=PlainTextResponse)
+async def get_aggregate_profile(route: Optional[str] = None):
+    """Folded stacks summed over the latest profiles, optionally of one route (e.g. "GET /hr/insights")"""
+    return render_folded(profiler.aggregate(route))
+
+@router.get("/admission")
+async def get_admission():
+    """Concurrency limit, in-flight and queued requests of each admission gate in this worker"""
+    return {"enabled": admission.enabled, "gates": admission.report()}
@@ -1,233 +1,457 @@
+import asyncio
+import logging
 import uuid
-import hashlib
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, WebSocket, WebSocketDisconnect
 from ..models.employee import (
     EmployeeOnboardRequest, EmployeeOnboardResponse, SessionRequest, SessionResponse, 
     SentimentLogRequest, SentimentLogResponse, ConsentRequest, ConsentResponse,
     VerifiableCredential, VerifiablePresentation
 )
-from ..services.fetchai import FetchAIClient
-from ..services.groq import GroqClient
-from ..services.elevenlabs import ElevenLabsClient
+from ..services.profile_cache import profile_cache
+from ..services.groq import GroqClient, classify_with_lexicon
+from ..services.elevenlabs import ELEVENLABS_API_KEY, ElevenLabsClient
 from ..services.coral import CoralClient
+from ..services.identity import identity_cache
+from ..services.credential_store import credential_store
+from ..services.pipeline import Pipeline
+from ..services.audio import preprocess_audio_async
+from ..services.stt import DEFAULT_SAMPLE_RATE, StreamingTranscriber, get_stt_backend
+from ..services.fallback import fallback_responses
+from ..core.config import settings
+from ..core.deadline import Deadline, DeadlineExceeded, current_deadline, within_deadline
+from ..core.executor import b64encode_text, run_cpu, sha256_hex
+from ..core.serialization import ORJSONRoute, loads
+from ..core.metrics import background_job
 from ..db.snowflake_client import SnowflakeClient
 from typing import Dict, Any, List, Optional
-import json
 import base64
 from datetime import datetime, timedelta
 
-router = APIRouter()
+logger = logging.getLogger("ruhani")
 
-# Organization DID for issuing credentials
-ORG_DID = None
-
-# Get or create organization DID
-async def get_org_did() -> str:
-    """Get or create the organization DID"""
-    global ORG_DID
-    if ORG_DID:
-        return ORG_DID
-    
-    # Check if org DID exists in database
-    snowflake_client = SnowflakeClient()
-    result = snowflake_client.execute(
-        "SELECT did FROM organization WHERE id = 'ruhani'"
-    )
-    
-    if result and result[0] and result[0][0]:
-        ORG_DID = result[0][0]
-        return ORG_DID
-    
-    # Create new org DID
-    coral_client = CoralClient()
-    try:
-        did_result = await coral_client.create_did(
-            employee_id="ruhani-organization",
-            name="Ruhani Organization",
-            email="admin@ruhani.ai"
-        )
-        
-        if "error" in did_result:
-            # Fall back to a deterministic mock DID
-            ORG_DID = f"did:coral:{hashlib.sha256('ruhani-organization'.encode()).hexdigest()[:16]}"
-        else:
-            ORG_DID = did_result["did"]
-        
-        # Store org DID in database
-        snowflake_client.execute(
-            "INSERT INTO organization (id, name, did, did_document) VALUES (%s, %s, %s, PARSE_JSON(%s))",
-            ("ruhani", "Ruhani Organization", ORG_DID, str(did_result.get("did_document", {})).replace("'", '"'))
-        )
-        
-        return ORG_DID
-    finally:
-        await coral_client.close()
+router = APIRouter(route_class=ORJSONRoute)
 
 @router.post("/onboard", response_model=EmployeeOnboardResponse)
-async def onboard_employee(payload: EmployeeOnboardRequest, background_tasks: BackgroundTasks):
-    """Onboard a new employee by fetching public info, creating DID, and storing in Snowflake"""
+async def onboard_employee(payload: EmployeeOnboardRequest):
+    """Onboard a new employee by fetching public info, creating DID, and storing in Snowflake
+
+    The steps run as a dependency graph: FetchAI enrichment, DID creation and
+    the organization DID lookup start together, the Snowflake insert waits for
+    the profile and the DID, and the initial consent credential is issued as
+    soon as both DIDs are known.
+    """
     try:
         # Generate a unique ID for the employee
         employee_id = str(uuid.uuid4())
-        
-        # Fetch public info from FetchAI
-        fetchai_client = FetchAIClient()
-        public_info = await fetchai_client.fetch_public_info(
-            github=payload.github, 
-            linkedin=payload.linkedin
-        )
-        await fetchai_client.close()
-        
-        # Extract name from public info or use provided name
-        name = payload.name
-        if "public_info" in public_info and "name" in public_info["public_info"]:
-            name = public_info["public_info"]["name"]
-        
-        # Extract skills and interests as potential stressors
-        stressors = []
-        if "public_info" in public_info:
-            if "skills" in public_info["public_info"]:
-                stressors.extend(public_info["public_info"]["skills"])
-            if "interests" in public_info["public_info"]:
-                stressors.extend(public_info["public_info"]["interests"])
-        
-        # Create DID for employee using Coral Protocol
         coral_client = CoralClient()
-        try:
-            # Create DID for the employee
+        
+        async def fetch_profile():
+            # Fetch public info from FetchAI, reusing cached profiles
+            return await profile_cache.fetch_public_info(
+                github=payload.github, 
+                linkedin=payload.linkedin
+            )
+        
+        async def create_did():
+            # The DID only needs the employee id, so it is created from the
+            # submitted details without waiting for FetchAI enrichment
             did_result = await coral_client.create_did(
                 employee_id=employee_id,
-                name=name,
-                email=f"{name.lower().replace(' ', '.')}@example.com"
+                name=payload.name,
+                email=payload.email
             )
-            
             if "error" in did_result:
                 raise HTTPException(status_code=500, detail=f"Failed to create DID: {did_result['error']}")
-            
-            employee_did = did_result["did"]
-            did_document = did_result["did_document"]
-            
-            # Store in Snowflake
-            snowflake_client = SnowflakeClient()
+            return did_result
+        
+        async def store_employee(profile: Dict[str, Any], did: Dict[str, Any]):
+            # Extract name from public info or use provided name
+            name = payload.name
+            if "public_info" in profile and "name" in profile["public_info"]:
+                name = profile["public_info"]["name"]
+            
+            # Extract skills and interests as potential stressors
+            stressors = []
+            if "public_info" in profile:
+                if "skills" in profile["public_info"]:
+                    stressors.extend(profile["public_info"]["skills"])
+                if "interests" in profile["public_info"]:
+                    stressors.extend(profile["public_info"]["interests"])
             
             # Insert employee data into Snowflake with DID information
-            snowflake_client.execute(
-                """INSERT INTO employees (id, name, email, github_url, linkedin_url, team, stressors, did, did_document) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, PARSE_JSON(%s))""",
-                (employee_id, name, f"{name.lower().replace(' ', '.')}@example.com", 
-                 payload.github, payload.linkedin, payload.role, json.dumps(stressors),
-                 employee_did, str(did_document).replace("'", '"'))
-            )
-            
-            # Create initial consent credential in background
-            background_tasks.add_task(
-                create_initial_consent, 
-                employee_id=employee_id, 
-                employee_did=employee_did,
-                name=name
-            )
-            
-            return EmployeeOnboardResponse(
-                success=True, 
-                message=f"Successfully onboarded {name}",
-                employee_id=employee_id,
-                did=employee_did
-            )
+            def insert():
+                snowflake_client = SnowflakeClient()
+                snowflake_client.execute(
+                    """INSERT INTO employees (id, name, email, github_url, linkedin_url, team, stressors, did, did_document) 
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, PARSE_JSON(%s))""",
+                    (employee_id, name, f"{name.lower().replace(' ', '.')}@example.com", 
+                     payload.github, payload.linkedin, payload.role, stressors,
+                     did["did"], did["did_document"])
+                )
+            await asyncio.to_thread(insert)
+            
+            # Make the new DID visible to later lookups straight away
+            identity_cache.remember_employee(employee_id, did["did"])
+            return name
+        
+        async def issue_consent(did: Dict[str, Any], org_did: str):
+            return await issue_initial_consent(coral_client, did["did"], org_did)
+        
+        async def record_consent(consent: Optional[Dict[str, Any]], store: str):
+            # The consent record refers to the employee row, so it is written after it
+            if consent:
+                await asyncio.to_thread(store_initial_consent, employee_id, consent)
+        
+        pipeline = (
+            Pipeline()
+            .stage("profile", fetch_profile)
+            .stage("did", create_did)
+            .stage("org_did", identity_cache.get_org_did)
+            .stage("store", store_employee, depends_on=["profile", "did"])
+            .stage("consent", issue_consent, depends_on=["did", "org_did"])
+            .stage("record_consent", record_consent, depends_on=["consent", "store"])
+        )
+        try:
+            results, timings = await pipeline.run()
         finally:
             await coral_client.close()
+        
+        name = results["store"]
+        logger.info(f"Onboarded employee {employee_id} with stage timings (ms): {timings}")
+        return EmployeeOnboardResponse(
+            success=True, 
+            message=f"Successfully onboarded {name}",
+            employee_id=employee_id,
+            did=results["did"]["did"],
+            stage_timings_ms=timings
+        )
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in onboard_employee: {str(e)}")
+        logger.exception(f"Error in onboard_employee: {e}")
         raise HTTPException(status_code=500, detail=f"Error onboarding employee: {str(e)}")
 
+# Transcript used when a session arrives without audio; audio without speech is never replaced by it
+NO_SPEECH_DETAIL = "No speech detected in the audio"
+SAMPLE_TRANSCRIPT = (
+    "I've been feeling stressed about the upcoming project deadline. "
+    "The requirements keep changing and I'm not sure if we'll be able to deliver on time."
+)
+
 @router.post("/session", response_model=SessionResponse)
 async def process_session(payload: SessionRequest, background_tasks: BackgroundTasks):
-    """Process an employee session with audio transcription, LLM consultation, and TTS response"""
+    """Process an employee session with audio transcription, LLM consultation, and TTS response.
+
+    Every stage, from decoding the audio to storing the session, shares one
+    deadline; see run_session for what happens when it runs out. Audio in
+    which no speech is found is rejected with 422 and nothing is stored.
+    """
     try:
-        # Generate a unique ID for the session
-        session_id = str(uuid.uuid4())
+        with Deadline(settings.SESSION_DEADLINE_SECONDS):
+            # Without audio we fall back to a sample transcript
+            transcript: Optional[str] = SAMPLE_TRANSCRIPT
+            audio = None
+            
+            # Transcribe uploaded audio, trimmed to speech in the audio worker pool
+            if payload.audio_data:
+                try:
+                    audio = await preprocess_audio_async(base64.b64decode(payload.audio_data))
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid audio_data: {str(e) or 'could not decode audio'}")
+                if not audio["pcm"]:
+                    raise HTTPException(status_code=422, detail=NO_SPEECH_DETAIL)
+                stt_backend = get_stt_backend()
+                try:
+                    transcript = (await within_deadline(
+                        "stt", stt_backend.transcribe(audio["pcm"], audio["sample_rate"]),
+                        reserve=settings.SESSION_RESPONSE_RESERVE_SECONDS
+                    )).strip()
+                except DeadlineExceeded:
+                    # Transcribed again when the session is completed
+                    transcript = None
+                finally:
+                    await stt_backend.close()
+                if transcript == "":
+                    raise HTTPException(status_code=422, detail=NO_SPEECH_DETAIL)
+            
+            # If there's an audio_url, we would transcribe it
+            if payload.audio_url:
+                # This is a placeholder - in a real implementation, you would download the audio
+                # and transcribe it the same way as audio_data
+                pass
+            
+            response, credential_args = await run_session(payload.employee_id, transcript, audio)
+        
+        # Create session credential in background, unless it is issued once the session is completed
+        if credential_args is not None:
+            background_tasks.add_task(create_session_credential, **credential_args)
+        
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error in process_session: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing session: {str(e)}")
+
+@router.websocket("/session/stream")
+async def stream_session(websocket: WebSocket, employee_id: str,
+                         sample_rate: int = Query(DEFAULT_SAMPLE_RATE, gt=0, le=48000)):
+    """Process a session from audio streamed while the employee is speaking.
+
+    The client sends 16-bit little-endian mono PCM as binary messages and a
+    ``{"event": "end"}`` text message when speech ends. The server replies
+    with ``partial`` messages as segments are transcribed, a ``final``
+    transcript, and then the ``response`` with the same fields as POST /session.
+    When no speech was transcribed, the response has ``success`` false and
+    status "no_speech", and the session is neither classified nor stored.
+    A client that sends audio faster than it can be transcribed, by more than
+    STT_MAX_BUFFER_SECONDS, is disconnected with code 1009.
+    """
+    await websocket.accept()
+    transcriber = StreamingTranscriber(get_stt_backend(), sample_rate=sample_rate)
+    
+    async def send_partials():
+        async for partial in transcriber.partials():
+            await websocket.send_json({"type": "partial", **partial})
+    
+    sender = asyncio.ensure_future(send_partials())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                transcriber.feed(message["bytes"])
+            elif message.get("text") and loads(message["text"]).get("event") == "end":
+                break
+        
+        # Speech has ended: only the last short segment is still to be transcribed
+        transcriber.finish()
+        await sender
+        await websocket.send_json({"type": "final", "transcript": transcriber.transcript})
+        if not transcriber.transcript:
+            response = SessionResponse(success=False, message=NO_SPEECH_DETAIL, status="no_speech")
+            await websocket.send_json({"type": "response", **response.model_dump()})
+            await websocket.close()
+            return
         
+        # The transcript is done, so the deadline covers responding to it and storing the session
+        with Deadline(settings.SESSION_STREAM_DEADLINE_SECONDS):
+            response, credential_args = await run_session(employee_id, transcriber.transcript)
+        if credential_args is not None:
+            asyncio.ensure_future(create_session_credential(**credential_args))
+        await websocket.send_json({"type": "response", **response.model_dump()})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except BufferError as e:
+        logger.warning(f"Closing session stream for {employee_id}: {e}")
+        await websocket.send_json({"type": "error", "detail": "Too much audio waiting to be transcribed"})
+        await websocket.close(code=1009)
+    except Exception as e:
+        logger.exception(f"Error in stream_session: {e}")
+        await websocket.send_json({"type": "error", "detail": f"Error processing session: {str(e)}"})
+        await websocket.close(code=1011)
+    finally:
+        sender.cancel()
+        await transcriber.close()
+
+# Prompts for the session response
+SESSION_SYSTEM_PROMPT = """
+    You are Ruhani, an empathetic AI assistant designed to support employees' mental well-being.
+    Your goal is to listen, understand, and provide supportive responses that help employees
+    manage stress and improve their mental health. Be compassionate, non-judgmental, and helpful.
+    Keep your responses concise (2-3 paragraphs maximum) and focused on providing practical advice.
+    """
+
+SESSION_USER_PROMPT = """Based on this employee's statement: \"{transcript}\", 
+    provide a supportive and helpful response. Acknowledge their feelings, 
+    offer practical advice, and suggest resources or techniques that might help.
+    """
+
+# Response used when the LLM call fails
+DEFAULT_RESPONSE = "I understand you're feeling stressed. Let's work through this together."
+
+# Sessions completed in the background at once; see complete_session
+completion_slots = asyncio.Semaphore(settings.SESSION_COMPLETION_CONCURRENCY)
+
+async def run_session(employee_id: str, transcript: Optional[str], audio: Optional[Dict[str, Any]] = None):
+    """Respond to a transcript, classify it and store the session.
+
+    Each stage is bounded by the current deadline, if there is one; all but
+    the insert keep SESSION_RESPONSE_RESERVE_SECONDS back for it. A session whose
+    transcript (None when speech-to-text ran out of time) or LLM response is
+    missing is answered with a fallback response, stored as "pending" and
+    finished by complete_session in the background. A late TTS call leaves
+    the response without audio, and the session "pending" until its audio
+    is generated; a slow insert is awaited in the background.
+    
+    Returns the SessionResponse and the arguments for create_session_credential,
+    or None when the credential is issued by complete_session instead.
+    """
+    # Generate a unique ID for the session
+    session_id = str(uuid.uuid4())
+    reserve = settings.SESSION_RESPONSE_RESERVE_SECONDS
+    degraded: List[str] = []
+    llm_response: Optional[str] = None
+    audio_data = ""
+    risk_level: Optional[str] = None
+    mood: Optional[str] = None
+    summary_hash: Optional[str] = None
+    
+    if transcript is None:
+        degraded.append("stt")
+    else:
         # Initialize clients
         groq_client = GroqClient()
         elevenlabs_client = ElevenLabsClient()
         
-        # For now, we'll use a mock transcript since we don't have actual audio processing
-        # In a real implementation, you would use the audio_url to download and process the audio
-        transcript = "I've been feeling stressed about the upcoming project deadline. "
-        transcript += "The requirements keep changing and I'm not sure if we'll be able to deliver on time."
-        
-        # If there's an audio_url, we would transcribe it
-        if payload.audio_url:
-            # This is a placeholder - in a real implementation, you would download the audio
-            # and pass it to the transcribe_audio method
-            # transcript_result = await groq_client.transcribe_audio(audio_data)
-            # transcript = transcript_result["transcript"]
-            pass
-        
-        # Prepare system prompt for the LLM
-        system_prompt = """
-        You are Ruhani, an empathetic AI assistant designed to support employees' mental well-being.
-        Your goal is to listen, understand, and provide supportive responses that help employees
-        manage stress and improve their mental health. Be compassionate, non-judgmental, and helpful.
-        Keep your responses concise (2-3 paragraphs maximum) and focused on providing practical advice.
-        """
-        
-        # Prepare user prompt based on transcript
-        user_prompt = f"""Based on this employee's statement: \"{transcript}\", 
-        provide a supportive and helpful response. Acknowledge their feelings, 
-        offer practical advice, and suggest resources or techniques that might help.
-        """
-        
-        # Get LLM response
-        llm_result = await groq_client.consult_llm(user_prompt, system_prompt)
-        llm_response = llm_result.get("response", "I understand you're feeling stressed. Let's work through this together.")
-        
-        # Generate TTS response
-        tts_result = await elevenlabs_client.generate_tts(llm_response)
-        
-        # Close clients
-        await groq_client.close()
-        await elevenlabs_client.close()
-        
-        # Determine risk level based on transcript content
-        risk_level = "low"
-        if "stressed" in transcript.lower() or "anxiety" in transcript.lower():
-            risk_level = "medium"
-        if "overwhelmed" in transcript.lower() or "can't handle" in transcript.lower():
-            risk_level = "high"
+        async def respond():
+            # Get LLM response from the large model, then speak it
+            try:
+                llm_result = await within_deadline(
+                    "llm", groq_client.consult_llm(SESSION_USER_PROMPT.format(transcript=transcript), SESSION_SYSTEM_PROMPT),
+                    reserve
+                )
+            except DeadlineExceeded:
+                degraded.append("llm")
+                return None, ""
+            llm_response = llm_result.get("response", DEFAULT_RESPONSE)
+            try:
+                tts_result = await within_deadline("tts", elevenlabs_client.generate_tts(llm_response), reserve)
+            except DeadlineExceeded:
+                degraded.append("tts")
+                return llm_response, ""
+            return llm_response, tts_result.get("audio_data", "")
+        
+        async def classify():
+            # The lexicon result stands in for a model that does not answer in time
+            try:
+                return await within_deadline("classify", groq_client.classify_session(transcript), reserve)
+            except DeadlineExceeded:
+                return await classify_with_lexicon(transcript)
+        
+        # Classify risk and mood with the small model while the response is generated
+        try:
+            (llm_response, audio_data), classification = await asyncio.gather(respond(), classify())
+        finally:
+            # Close clients
+            await groq_client.close()
+            await elevenlabs_client.close()
         
-        # Create a hash of the summary for privacy
-        summary_hash = hashlib.sha256(transcript.encode()).hexdigest()
+        risk_level = classification["risk_level"]
+        mood = classification["mood"]
+        logger.info(f"Session {session_id} model calls: {groq_client.calls}")
         
-        # Store session in Snowflake
+        # Create a hash of the summary for privacy
+        summary_hash = await run_cpu(sha256_hex, transcript)
+    
+    pending = any(stage in degraded for stage in ("stt", "llm", "tts"))
+    
+    # Store session in Snowflake, the last stage, which may use the reserve. The insert
+    # cannot be cancelled once running, so if it does not finish in time it is left
+    # running and awaited by complete_session.
+    stored = asyncio.ensure_future(asyncio.to_thread(
+        store_session, session_id, employee_id, mood, transcript, llm_response, risk_level, summary_hash,
+        "pending" if pending else "complete"
+    ))
+    try:
+        await within_deadline("db", asyncio.shield(stored))
+    except DeadlineExceeded:
+        degraded.append("db")
+    
+    credential_args = {
+        "session_id": session_id,
+        "employee_id": employee_id,
+        "mood": mood,
+        "summary_hash": summary_hash,
+        "risk_level": risk_level
+    }
+    if pending or "db" in degraded:
+        asyncio.ensure_future(complete_session(
+            session_id, employee_id, stored, pending, transcript, audio, llm_response, risk_level, mood
+        ))
+        credential_args = None
+    
+    if llm_response is None:
+        llm_response, audio_data = fallback_responses.response_for(mood)
+    if degraded:
+        logger.warning(f"Session {session_id} ran out of time in {', '.join(degraded)}")
+    
+    response = SessionResponse(
+        success=True,
+        message="Session accepted, the full response will follow" if pending else "Session processed successfully",
+        session_id=session_id,
+        transcript=transcript,
+        response=llm_response,
+        audio_data=audio_data,
+        risk_level=risk_level,
+        mood=mood,
+        status="pending" if pending else "complete",
+        degraded_stages=degraded
+    )
+    return response, credential_args
+
+def store_session(session_id: str, employee_id: str, mood: Optional[str], transcript: Optional[str],
+                  llm_response: Optional[str], risk_level: Optional[str], summary_hash: Optional[str],
+                  status: str, response_audio: Optional[str] = None) -> bool:
+    """Insert a session row, with the base64 audio of its response when it was generated late; returns whether it was stored"""
+    snowflake_client = SnowflakeClient()
+    try:
+        if response_audio is None:
+            return snowflake_client.execute(
+                """INSERT INTO sessions (session_id, employee_id, mood, summary, llm_response, risk_level, summary_hash, status) 
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                (session_id, employee_id, mood, transcript, llm_response, risk_level, summary_hash, status)
+            ) is not None
+        # Snowflake only accepts constants in VALUES, so the audio is converted in a SELECT
+        return snowflake_client.execute(
+            """INSERT INTO sessions
+               (session_id, employee_id, mood, summary, llm_response, risk_level, summary_hash, status, response_audio)
+               SELECT %s, %s, %s, %s, %s, %s, %s, %s, TO_BINARY(%s, 'BASE64')""",
+            (session_id, employee_id, mood, transcript, llm_response, risk_level, summary_hash, status, response_audio)
+        ) is not None
+    finally:
+        snowflake_client.close()
+
+@router.get("/session/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str):
+    """Get a stored session, e.g. the full response of one that was answered with a fallback"""
+    def fetch():
         snowflake_client = SnowflakeClient()
-        snowflake_client.execute(
-            """INSERT INTO sessions (session_id, employee_id, mood, summary, llm_response, risk_level, summary_hash) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-            (session_id, payload.employee_id, "stressed", transcript, llm_response, risk_level, summary_hash)
-        )
-        
-        # Create session credential in background
-        background_tasks.add_task(
-            create_session_credential,
-            session_id=session_id,
-            employee_id=payload.employee_id,
-            mood="stressed",
-            summary_hash=summary_hash,
-            risk_level=risk_level
-        )
-        
-        return SessionResponse(
-            success=True,
-            message="Session processed successfully",
-            session_id=session_id,
-            transcript=transcript,
-            response=llm_response,
-            audio_data=tts_result.get("audio_data", ""),
-            risk_level=risk_level
-        )
+        try:
+            cursor = snowflake_client.execute(
+                """SELECT summary, llm_response, risk_level, mood, credential_id, status, response_audio
+                   FROM sessions WHERE session_id = %s""",
+                (session_id,), name="get_session"
+            )
+            if cursor is None:
+                raise RuntimeError("sessions query failed")
+            return cursor.fetchone()
+        finally:
+            snowflake_client.close()
+    
+    try:
+        row = await asyncio.to_thread(fetch)
     except Exception as e:
-        print(f"Error in process_session: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing session: {str(e)}")
+        logger.exception(f"Error in get_session: {e}")
+        raise HTTPException(status_code=500, detail=f"Error loading session: {str(e)}")
+    
+    if row is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    transcript, llm_response, risk_level, mood, credential_id, status, response_audio = row
+    return SessionResponse(
+        success=True,
+        message="Session found",
+        session_id=session_id,
+        transcript=transcript,
+        response=llm_response,
+        audio_data=await run_cpu(b64encode_text, bytes(response_audio)) if response_audio else None,
+        risk_level=risk_level,
+        mood=mood,
+        credential_id=credential_id,
+        status=status or "complete"
+    )
 
 @router.post("/sentiment", response_model=SentimentLogResponse)
 async def log_sentiment(payload: SentimentLogRequest, background_tasks: BackgroundTasks):
@@ -262,7 +486,7 @@ async def log_sentiment(payload: SentimentLogRequest, background_tasks: Backgrou
             log_id=log_id
         )
     except Exception as e:
-        print(f"Error in log_sentiment: {str(e)}")
+        logger.exception(f"Error in log_sentiment: {e}")
         raise HTTPException(status_code=500, detail=f"Error logging sentiment: {str(e)}")
 
 @router.post("/consent", response_model=ConsentResponse)
@@ -275,19 +499,15 @@ async def create_consent(payload: ConsentRequest):
         expires_at = granted_at + timedelta(days=payload.expiration_days)
         
         # Get employee DID
-        snowflake_client = SnowflakeClient()
-        employee_result = snowflake_client.execute(
-            "SELECT did FROM employees WHERE id = %s",
-            (payload.employee_id,)
-        )
+        employee_did = await identity_cache.get_employee_did(payload.employee_id)
         
-        if not employee_result or not employee_result[0] or not employee_result[0][0]:
+        if not employee_did:
             raise HTTPException(status_code=404, detail="Employee not found or DID not available")
         
-        employee_did = employee_result[0][0]
+        snowflake_client = SnowflakeClient()
         
         # Get organization DID
-        org_did = await get_org_did()
+        org_did = await identity_cache.get_org_did()
         
         # Create consent credential
         coral_client = CoralClient()
@@ -307,13 +527,10 @@ async def create_consent(payload: ConsentRequest):
             credential_id = consent_result["credential"]["id"]
             
             # Store credential in database
-            credential_data = str(consent_result["credential"]).replace("'", '"')
-            snowflake_client.execute(
-                """INSERT INTO credentials 
-                   (credential_id, credential_type, issuer_did, subject_did, issuance_date, expiration_date, credential_data) 
-                   VALUES (%s, %s, %s, %s, %s, %s, PARSE_JSON(%s))""",
-                (credential_id, "ConsentCredential", employee_did, org_did, granted_at.isoformat(), 
-                 expires_at.isoformat(), credential_data)
+            await asyncio.to_thread(
+                credential_store.store,
+                snowflake_client, consent_result["credential"], "ConsentCredential", employee_did, org_did,
+                granted_at.isoformat(), expires_at.isoformat()
             )
             
             # Store consent record
@@ -321,7 +538,7 @@ async def create_consent(payload: ConsentRequest):
                 """INSERT INTO consent_records 
                    (consent_id, employee_id, data_categories, authorized_parties, purpose, credential_id, granted_at, expires_at) 
                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-                (consent_id, payload.employee_id, json.dumps(payload.data_categories), json.dumps([org_did]), 
+                (consent_id, payload.employee_id, payload.data_categories, [org_did], 
                  payload.purpose, credential_id, granted_at.isoformat(), expires_at.isoformat())
             )
             
@@ -340,87 +557,195 @@ async def create_consent(payload: ConsentRequest):
         finally:
             await coral_client.close()
     except Exception as e:
-        print(f"Error in create_consent: {str(e)}")
+        logger.exception(f"Error in create_consent: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating consent: {str(e)}")
 
-# Background tasks for Coral Protocol credential issuance
-async def create_initial_consent(employee_id: str, employee_did: str, name: str):
-    """Create initial consent credential for new employee"""
+@router.get("/credentials/{credential_id}")
+async def get_credential(credential_id: str):
+    """Get the full document of a stored verifiable credential"""
+    try:
+        snowflake_client = SnowflakeClient()
+        credential = await credential_store.get_document(snowflake_client, credential_id)
+    except Exception as e:
+        logger.exception(f"Error in get_credential: {e}")
+        raise HTTPException(status_code=500, detail=f"Error loading credential: {str(e)}")
+    
+    if credential is None:
+        raise HTTPException(status_code=404, detail="Credential not found")
+    return credential
+
+# Initial consent issued during onboarding
+INITIAL_CONSENT_CATEGORIES = ["wellness_metrics", "session_summaries", "risk_assessments"]
+INITIAL_CONSENT_PURPOSE = "Wellness monitoring and HR insights"
+INITIAL_CONSENT_DAYS = 90
+
+async def issue_initial_consent(coral_client: CoralClient, employee_did: str, org_did: str) -> Optional[Dict[str, Any]]:
+    """Issue the initial consent credential for a new employee, or None if issuance failed"""
     try:
-        # Default consent parameters
-        data_categories = ["wellness_metrics", "session_summaries", "risk_assessments"]
-        purpose = "Wellness monitoring and HR insights"
-        expiration_days = 90
+        consent_result = await coral_client.create_consent_credential(
+            issuer_did=employee_did,  # Employee issues consent
+            subject_did=org_did,       # Organization is the subject
+            data_categories=INITIAL_CONSENT_CATEGORIES,
+            authorized_parties=[org_did],
+            purpose=INITIAL_CONSENT_PURPOSE,
+            expiration_days=INITIAL_CONSENT_DAYS
+        )
         
-        # Get organization DID
-        org_did = await get_org_did()
+        if "error" in consent_result:
+            logger.warning(f"Failed to create initial consent credential for {employee_did}: {consent_result['error']}")
+            return None
         
-        # Create consent credential
-        coral_client = CoralClient()
+        return {
+            "credential": consent_result["credential"],
+            "employee_did": employee_did,
+            "org_did": org_did
+        }
+    except Exception as e:
+        logger.exception(f"Error creating initial consent: {e}")
+        return None
+
+def store_initial_consent(employee_id: str, consent: Dict[str, Any]) -> None:
+    """Store an issued initial consent credential and its consent record"""
+    try:
+        # Generate a unique consent ID
+        consent_id = str(uuid.uuid4())
+        granted_at = datetime.utcnow()
+        expires_at = granted_at + timedelta(days=INITIAL_CONSENT_DAYS)
+        credential_id = consent["credential"]["id"]
+        org_did = consent["org_did"]
+        
+        # Store credential in database
+        snowflake_client = SnowflakeClient()
+        credential_store.store(
+            snowflake_client, consent["credential"], "ConsentCredential", consent["employee_did"], org_did,
+            granted_at.isoformat(), expires_at.isoformat()
+        )
+        
+        # Store consent record
+        snowflake_client.execute(
+            """INSERT INTO consent_records 
+               (consent_id, employee_id, data_categories, authorized_parties, purpose, credential_id, granted_at, expires_at) 
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+            (consent_id, employee_id, INITIAL_CONSENT_CATEGORIES, [org_did], 
+             INITIAL_CONSENT_PURPOSE, credential_id, granted_at.isoformat(), expires_at.isoformat())
+        )
+        
+        logger.info(f"Created initial consent credential for {employee_id}")
+    except Exception as e:
+        logger.exception(f"Error storing initial consent: {e}")
+
+@background_job
+async def complete_session(session_id: str, employee_id: str, stored: "asyncio.Future[bool]", pending: bool,
+                           transcript: Optional[str], audio: Optional[Dict[str, Any]], llm_response: Optional[str],
+                           risk_level: Optional[str], mood: Optional[str]):
+    """Finish a session that ran out of time, then issue its credential.
+
+    For a pending session, the missing transcript, classification and LLM
+    response are produced without a deadline, the response is spoken (the
+    employee got a fallback or no audio) and the stored session is updated
+    to "complete" with it; a session that is not pending was only slow to
+    insert and is saved if the original insert failed. A session whose audio
+    turns out to hold no speech is deleted instead.
+    """
+    # Tasks inherit the request's context; its deadline has passed and no longer applies
+    current_deadline.set(None)
+    async with completion_slots:
         try:
-            consent_result = await coral_client.create_consent_credential(
-                issuer_did=employee_did,  # Employee issues consent
-                subject_did=org_did,       # Organization is the subject
-                data_categories=data_categories,
-                authorized_parties=[org_did],
-                purpose=purpose,
-                expiration_days=expiration_days
-            )
-            
-            if "error" in consent_result:
-                print(f"Failed to create initial consent credential for {name}: {consent_result['error']}")
+            try:
+                saved = await stored
+            except Exception as e:
+                logger.warning(f"Failed to store session {session_id} before completing it: {e}")
+                saved = False
+            
+            if transcript is None:
+                stt_backend = get_stt_backend()
+                try:
+                    transcript = (await stt_backend.transcribe(audio["pcm"], audio["sample_rate"])).strip()
+                finally:
+                    await stt_backend.close()
+                if not transcript:
+                    def delete() -> bool:
+                        snowflake_client = SnowflakeClient()
+                        try:
+                            return snowflake_client.execute(
+                                "DELETE FROM sessions WHERE session_id = %s", (session_id,)
+                            ) is not None
+                        finally:
+                            snowflake_client.close()
+                    if saved and not await asyncio.to_thread(delete):
+                        logger.warning(f"Failed to delete session {session_id} without speech")
+                    logger.info(f"Dropped session {session_id}: {NO_SPEECH_DETAIL.lower()}")
+                    return
+            if llm_response is None or mood is None:
+                groq_client = GroqClient()
+                try:
+                    if mood is None:
+                        classification = await groq_client.classify_session(transcript)
+                        risk_level, mood = classification["risk_level"], classification["mood"]
+                    if llm_response is None:
+                        llm_result = await groq_client.consult_llm(
+                            SESSION_USER_PROMPT.format(transcript=transcript), SESSION_SYSTEM_PROMPT
+                        )
+                        llm_response = llm_result.get("response", DEFAULT_RESPONSE)
+                finally:
+                    await groq_client.close()
+            summary_hash = await run_cpu(sha256_hex, transcript)
+            
+            response_audio = None
+            if pending and ELEVENLABS_API_KEY:
+                elevenlabs_client = ElevenLabsClient()
+                try:
+                    tts_result = await elevenlabs_client.generate_tts(llm_response)
+                finally:
+                    await elevenlabs_client.close()
+                response_audio = tts_result.get("audio_data")
+                if not response_audio:
+                    logger.warning(f"Failed to speak the response of session {session_id}: {tts_result.get('error')}")
+            
+            if not saved:
+                saved = await asyncio.to_thread(
+                    store_session, session_id, employee_id, mood, transcript, llm_response, risk_level, summary_hash,
+                    "complete", response_audio
+                )
+            elif pending:
+                def update() -> bool:
+                    snowflake_client = SnowflakeClient()
+                    try:
+                        return snowflake_client.execute(
+                            """UPDATE sessions SET mood = %s, summary = %s, llm_response = %s, risk_level = %s,
+                               summary_hash = %s, response_audio = TO_BINARY(%s, 'BASE64'), status = 'complete'
+                               WHERE session_id = %s""",
+                            (mood, transcript, llm_response, risk_level, summary_hash, response_audio, session_id)
+                        ) is not None
+                    finally:
+                        snowflake_client.close()
+                saved = await asyncio.to_thread(update)
+            if not saved:
+                logger.warning(f"Failed to store completed session {session_id}")
                 return
-            
-            # Generate a unique consent ID
-            consent_id = str(uuid.uuid4())
-            granted_at = datetime.utcnow()
-            expires_at = granted_at + timedelta(days=expiration_days)
-            credential_id = consent_result["credential"]["id"]
-            
-            # Store credential in database
-            snowflake_client = SnowflakeClient()
-            credential_data = str(consent_result["credential"]).replace("'", '"')
-            snowflake_client.execute(
-                """INSERT INTO credentials 
-                   (credential_id, credential_type, issuer_did, subject_did, issuance_date, expiration_date, credential_data) 
-                   VALUES (%s, %s, %s, %s, %s, %s, PARSE_JSON(%s))""",
-                (credential_id, "ConsentCredential", employee_did, org_did, granted_at.isoformat(), 
-                 expires_at.isoformat(), credential_data)
-            )
-            
-            # Store consent record
-            snowflake_client.execute(
-                """INSERT INTO consent_records 
-                   (consent_id, employee_id, data_categories, authorized_parties, purpose, credential_id, granted_at, expires_at) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-                (consent_id, employee_id, json.dumps(data_categories), json.dumps([org_did]), 
-                 purpose, credential_id, granted_at.isoformat(), expires_at.isoformat())
-            )
-            
-            print(f"Created initial consent credential for {name}")
-        finally:
-            await coral_client.close()
-    except Exception as e:
-        print(f"Error creating initial consent: {str(e)}")
+            logger.info(f"Completed session {session_id}")
+        except Exception as e:
+            logger.exception(f"Error completing session {session_id}: {e}")
+            return
+    
+    asyncio.ensure_future(create_session_credential(session_id, employee_id, mood, summary_hash, risk_level))
 
+# Background tasks for Coral Protocol credential issuance
+@background_job
 async def create_session_credential(session_id: str, employee_id: str, mood: str, summary_hash: str, risk_level: str = "low"):
     """Create verifiable credential for a wellness session"""
     try:
         # Get employee DID
-        snowflake_client = SnowflakeClient()
-        employee_result = snowflake_client.execute(
-            "SELECT did FROM employees WHERE id = %s",
-            (employee_id,)
-        )
+        employee_did = await identity_cache.get_employee_did(employee_id)
         
-        if not employee_result or not employee_result[0] or not employee_result[0][0]:
-            print(f"Employee not found or DID not available for employee_id: {employee_id}")
+        if not employee_did:
+            logger.warning(f"Employee not found or DID not available for employee_id: {employee_id}")
             return
         
-        employee_did = employee_result[0][0]
+        snowflake_client = SnowflakeClient()
         
         # Get organization DID
-        org_did = await get_org_did()
+        org_did = await identity_cache.get_org_did()
         
         # Create session credential
         coral_client = CoralClient()
@@ -436,7 +761,7 @@ async def create_session_credential(session_id: str, employee_id: str, mood: str
             )
             
             if "error" in credential_result:
-                print(f"Failed to create session credential: {credential_result['error']}")
+                logger.warning(f"Failed to create session credential: {credential_result['error']}")
                 return
             
             credential_id = credential_result["credential"]["id"]
@@ -444,13 +769,10 @@ async def create_session_credential(session_id: str, employee_id: str, mood: str
             expiration_date = issuance_date + timedelta(days=365)
             
             # Store credential in database
-            credential_data = str(credential_result["credential"]).replace("'", '"')
-            snowflake_client.execute(
-                """INSERT INTO credentials 
-                   (credential_id, credential_type, issuer_did, subject_did, issuance_date, expiration_date, credential_data) 
-                   VALUES (%s, %s, %s, %s, %s, %s, PARSE_JSON(%s))""",
-                (credential_id, "WellnessSessionCredential", org_did, employee_did, issuance_date.isoformat(), 
-                 expiration_date.isoformat(), credential_data)
+            await asyncio.to_thread(
+                credential_store.store,
+                snowflake_client, credential_result["credential"], "WellnessSessionCredential", org_did, employee_did,
+                issuance_date.isoformat(), expiration_date.isoformat()
             )
             
             # Update session with credential ID
@@ -459,12 +781,13 @@ async def create_session_credential(session_id: str, employee_id: str, mood: str
                 (credential_id, session_id)
             )
             
-            print(f"Created session credential for session {session_id}")
+            logger.info(f"Created session credential for session {session_id}")
         finally:
             await coral_client.close()
     except Exception as e:
-        print(f"Error creating session credential: {str(e)}")
+        logger.exception(f"Error creating session credential: {e}")
 
+@background_job
 async def update_session_with_sentiment(employee_id: str, sentiment_score: float):
     """Update the most recent session credential with sentiment data"""
     try:
@@ -484,18 +807,13 @@ async def update_session_with_sentiment(employee_id: str, sentiment_score: float
         credential_id = session_result[0][1]
         
         # Get employee DID
-        employee_result = snowflake_client.execute(
-            "SELECT did FROM employees WHERE id = %s",
-            (employee_id,)
-        )
+        employee_did = await identity_cache.get_employee_did(employee_id)
         
-        if not employee_result or not employee_result[0] or not employee_result[0][0]:
+        if not employee_did:
             return
         
-        employee_did = employee_result[0][0]
-        
         # Get organization DID
-        org_did = await get_org_did()
+        org_did = await identity_cache.get_org_did()
         
         # Revoke the old credential
         coral_client = CoralClient()
@@ -506,7 +824,7 @@ async def update_session_with_sentiment(employee_id: str, sentiment_score: float
             )
             
             if "error" in revoke_result:
-                print(f"Failed to revoke credential: {revoke_result['error']}")
+                logger.warning(f"Failed to revoke credential: {revoke_result['error']}")
                 return
             
             # Update credential status in database
@@ -541,7 +859,7 @@ async def update_session_with_sentiment(employee_id: str, sentiment_score: float
             )
             
             if "error" in new_credential_result:
-                print(f"Failed to create updated session credential: {new_credential_result['error']}")
+                logger.warning(f"Failed to create updated session credential: {new_credential_result['error']}")
                 return
             
             new_credential_id = new_credential_result["credential"]["id"]
@@ -549,13 +867,10 @@ async def update_session_with_sentiment(employee_id: str, sentiment_score: float
             expiration_date = issuance_date + timedelta(days=365)
             
             # Store new credential in database
-            credential_data = str(new_credential_result["credential"]).replace("'", '"')
-            snowflake_client.execute(
-                """INSERT INTO credentials 
-                   (credential_id, credential_type, issuer_did, subject_did, issuance_date, expiration_date, credential_data) 
-                   VALUES (%s, %s, %s, %s, %s, %s, PARSE_JSON(%s))""",
-                (new_credential_id, "WellnessSessionCredential", org_did, employee_did, issuance_date.isoformat(), 
-                 expiration_date.isoformat(), credential_data)
+            await asyncio.to_thread(
+                credential_store.store,
+                snowflake_client, new_credential_result["credential"], "WellnessSessionCredential", org_did, employee_did,
+                issuance_date.isoformat(), expiration_date.isoformat()
             )
             
             # Update session with new credential ID
@@ -564,8 +879,8 @@ async def update_session_with_sentiment(employee_id: str, sentiment_score: float
                 (new_credential_id, session_id)
             )
             
-            print(f"Updated session credential with sentiment data for session {session_id}")
+            logger.info(f"Updated session credential with sentiment data for session {session_id}")
         finally:
             await coral_client.close()
     except Exception as e:
-        print(f"Error updating session with sentiment: {str(e)}")
\ No newline at end of file
+        logger.exception(f"Error updating session with sentiment: {e}")
\ No newline at end of file
@@ -1,75 +1,311 @@
+import asyncio
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
-from ..models.hr import HRInsightsResponse, HRTrendsResponse, HRAtRiskResponse, EmployeeInsight, EmployeeTrend, EmployeeRisk
+import base64
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from pydantic import BaseModel
+from ..models.hr import (
+    HRInsightsResponse, HRTrendsResponse, HRAtRiskResponse, EmployeeInsight, EmployeeTrend, EmployeeRisk,
+    PresentationReference
+)
 from ..models.employee import VerifiableCredential, VerifiablePresentation
+from ..core.executor import run_cpu
+from ..core.imports import lazy_import
+from ..core.serialization import ORJSONRoute, dumps, loads
 from ..db.snowflake_client import SnowflakeClient
 from ..services.coral import CoralClient
-from typing import List, Dict, Any, Optional
+from ..services import hr_analytics
+from ..services.identity import identity_cache
+from ..services.credential_store import credential_store
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple, Type
 from datetime import datetime, timedelta
 import random
-import json
 
-router = APIRouter()
+pd = lazy_import("pandas")
 
-# Helper function to check consent for HR data access
-async def check_hr_data_access(employee_id: str, data_category: str) -> bool:
-    """Check if HR has consent to access employee data for a specific category"""
+logger = logging.getLogger("ruhani")
+
+router = APIRouter(route_class=ORJSONRoute)
+
+# Pagination defaults for the HR list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Streaming export settings
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+def _isoformat(value: Any) -> Optional[str]:
+    """Render a Snowflake timestamp as an ISO 8601 string"""
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def _encode_cursor(*position: Any) -> str:
+    """Encode a keyset position, such as (last_check_in, employee_id), as an opaque cursor"""
+    raw = dumps([_isoformat(value) for value in position])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: Optional[str], size: int = 2) -> Optional[Tuple[str, ...]]:
+    """Decode a cursor produced by _encode_cursor holding a position of the given size"""
+    if not cursor:
+        return None
     try:
-        snowflake_client = SnowflakeClient()
-        
-        # Get the latest consent record for this employee
-        consent_record = snowflake_client.execute(
-            """SELECT data_categories, credential_id, expires_at 
-               FROM consent_records 
-               WHERE employee_id = %s 
-               AND expires_at > CURRENT_TIMESTAMP() 
-               ORDER BY granted_at DESC LIMIT 1""",
-            (employee_id,)
-        )
-        
-        if not consent_record or not consent_record[0]:
-            return False
-        
-        data_categories = json.loads(consent_record[0][0])
-        credential_id = consent_record[0][1]
-        expires_at = consent_record[0][2]
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, list) or len(position) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(str(value) for value in position)
+
+def _parse_fields(fields: Optional[str], model: Type[BaseModel], always: Set[str]) -> Set[str]:
+    """Parse a comma-separated ``fields=`` parameter into the set of attributes to return"""
+    if not fields:
+        return set(model.model_fields)
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected | always
+
+def _department(team: Optional[str]) -> Optional[str]:
+    """Derive the department from a 'Department/Team' string"""
+    if team is None:
+        return None
+    return team.split('/')[0] if '/' in team else team
+
+def _keyset_filters(department: Optional[str], team: Optional[str]) -> Tuple[str, List[Any]]:
+    """Build the SQL predicates for the department and team filters"""
+    clauses = []
+    params: List[Any] = []
+    if department:
+        clauses.append("AND SPLIT_PART(e.team, '/', 1) = %s")
+        params.append(department)
+    if team:
+        clauses.append("AND e.team = %s")
+        params.append(team)
+    return "\n".join(clauses), params
+
+def consenting_employees(snowflake_client: SnowflakeClient, employee_ids: List[str], data_category: str) -> Set[str]:
+    """Employees whose latest unexpired consent, backed by a non-revoked credential, covers a data category
+
+    One query for the whole batch; blocking, so run it in a thread. A failed
+    query grants access to no one.
+    """
+    if not employee_ids:
+        return set()
+    placeholders = ", ".join(["%s"] * len(employee_ids))
+    result = snowflake_client.execute(
+        f"""SELECT latest.employee_id
+            FROM (
+                SELECT employee_id, data_categories, credential_id
+                FROM consent_records
+                WHERE employee_id IN ({placeholders})
+                AND expires_at > CURRENT_TIMESTAMP()
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY employee_id ORDER BY granted_at DESC) = 1
+            ) latest
+            JOIN credentials c ON c.credential_id = latest.credential_id
+            WHERE c.revoked = FALSE
+            AND ARRAY_CONTAINS(%s::VARIANT, latest.data_categories)""",
+        tuple(employee_ids) + (data_category,),
+        name="hr_consent"
+    )
+    return {row[0] for row in result.fetchall()} if result else set()
+
+def _wants_ndjson(request: Request) -> bool:
+    """Check whether the client asked for a newline-delimited JSON stream"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def _ndjson_line(model: BaseModel) -> bytes:
+    """Serialize a single row for an NDJSON stream"""
+    return model.model_dump_json(exclude_unset=True).encode() + b"\n"
+
+def _insights_query(department: Optional[str], team: Optional[str]) -> Tuple[str, List[Any]]:
+    """Build the keyset query over employees with recent session credentials, newest check-in first
+
+    The trailing parameters are the cursor position (three times, then the
+    employee id) and the row limit, which may be None for no limit.
+    """
+    filter_sql, filter_params = _keyset_filters(department, team)
+    query = f"""
+    SELECT e.id, e.name, e.team, e.did, MAX(s.created_at) AS last_check_in
+    FROM employees e
+    JOIN sessions s ON s.employee_id = e.id
+    JOIN credentials c ON c.credential_id = s.credential_id
+    WHERE e.did IS NOT NULL
+    AND c.credential_type = 'WellnessSessionCredential'
+    AND c.revoked = FALSE
+    AND c.issuance_date > DATEADD(day, -30, CURRENT_TIMESTAMP())
+    {filter_sql}
+    GROUP BY e.id, e.name, e.team, e.did
+    HAVING %s IS NULL
+        OR MAX(s.created_at) < TO_TIMESTAMP_NTZ(%s)
+        OR (MAX(s.created_at) = TO_TIMESTAMP_NTZ(%s) AND e.id < %s)
+    ORDER BY last_check_in DESC, e.id DESC
+    LIMIT %s
+    """
+    return query, filter_params
+
+def _keyset_params(filter_params: List[Any], after: Optional[Tuple[str, str]], limit: Optional[int]) -> Tuple[Any, ...]:
+    """Bind the filter values, cursor position and limit for a keyset query"""
+    after_time, after_id = after or (None, None)
+    return tuple(filter_params) + (after_time, after_time, after_time, after_id, limit)
+
+async def _build_insights(
+    snowflake_client: SnowflakeClient,
+    coral_client: CoralClient,
+    employees: List[Tuple],
+    selected: Set[str],
+    status: Optional[str] = None,
+    risk_level: Optional[str] = None,
+) -> List[Optional[EmployeeInsight]]:
+    """Build the insights for a batch of employee rows
+
+    Session credentials for the whole batch are fetched in one Arrow query
+    and the per-employee features are computed with vectorized group-bys.
+    Only the credentials' hot fields are queried; full documents are loaded
+    for verification only when their hash has not been verified before.
+    The result is aligned with ``employees``; an entry is None when that
+    employee is filtered out or not accessible.
+    """
+    # Check which employees consented to HR accessing their wellness data, in one query
+    consented = await asyncio.to_thread(
+        consenting_employees, snowflake_client, [employee[0] for employee in employees], "wellness_metrics"
+    )
+    consenting = [employee for employee in employees if employee[0] in consented]
+    if not consenting:
+        return [None] * len(employees)
+    
+    # Get session credentials for the consenting employees
+    placeholders = ", ".join(["%s"] * len(consenting))
+    frames = await asyncio.to_thread(list, snowflake_client.iter_pandas_batches(
+        f"""SELECT s.employee_id, c.content_hash, c.issuance_date, s.mood, s.risk_level
+            FROM credentials c
+            JOIN sessions s ON c.credential_id = s.credential_id
+            WHERE c.subject_did IN ({placeholders})
+            AND c.credential_type = 'WellnessSessionCredential'
+            AND c.revoked = FALSE
+            AND c.issuance_date > DATEADD(day, -30, CURRENT_TIMESTAMP())""",
+        tuple(employee[3] for employee in consenting),
+        name="hr_insight_sessions"
+    ))
+    if not frames:
+        return [None] * len(employees)
+    sessions = pd.concat(frames, ignore_index=True)
+    
+    # Verify credentials and keep only the verified sessions
+    verified = await credential_store.verify(snowflake_client, coral_client, sessions["content_hash"])
+    verified_hashes = [content_hash for content_hash, ok in verified.items() if ok]
+    features = await run_cpu(
+        hr_analytics.insight_features, sessions[sessions["content_hash"].isin(verified_hashes)]
+    )
+    
+    # Apply the status and risk filters on the computed features
+    if status:
+        features = features[features["status"] == status]
+    if risk_level:
+        features = features[features["risk_level"] == risk_level]
+    
+    teams = pd.Series([employee[2] for employee in employees], dtype=object)
+    department_values = hr_analytics.departments(teams).tolist() if "department" in selected else None
+    
+    insights: List[Optional[EmployeeInsight]] = []
+    for index, (employee_id, name, team, employee_did, last_check_in) in enumerate(employees):
+        # Skip employees without consent, without verified sessions or filtered out
+        if employee_id not in features.index:
+            insights.append(None)
+            continue
         
-        # Check if the credential is valid and not revoked
-        credential_status = snowflake_client.execute(
-            """SELECT revoked FROM credentials 
-               WHERE credential_id = %s""",
-            (credential_id,)
-        )
+        values: Dict[str, Any] = {
+            "id": str(uuid.uuid4()),
+            "employee_id": employee_id,
+            "name": name,
+            "team": team,
+            "last_check_in": _isoformat(last_check_in),
+        }
+        if department_values is not None:
+            values["department"] = department_values[index]
+        for column in hr_analytics.FEATURE_COLUMNS:
+            if column in selected:
+                values[column] = features.at[employee_id, column]
         
-        if not credential_status or not credential_status[0] or credential_status[0][0]:
-            return False
+        # Create insight with only the requested attributes
+        insights.append(EmployeeInsight(**{key: values[key] for key in selected}))
+    
+    return insights
+
+async def _stream_insights(
+    after: Optional[Tuple[str, str]],
+    selected: Set[str],
+    department: Optional[str],
+    team: Optional[str],
+    status: Optional[str],
+    risk_level: Optional[str],
+) -> AsyncIterator[bytes]:
+    """Stream every matching insight as NDJSON, one row per line as soon as it is built"""
+    coral_client = None
+    streamed = False
+    try:
+        # Connecting and fetching each batch block, so both run in threads
+        snowflake_client = await asyncio.to_thread(SnowflakeClient)
+        coral_client = CoralClient()
+        query, filter_params = _insights_query(department, team)
         
-        # Check if the requested data category is in the consented categories
-        return data_category in data_categories
+        async for employees in iterate_in_threadpool(snowflake_client.iter_batches(
+            query, _keyset_params(filter_params, after, None), STREAM_BATCH_SIZE, name="hr_insights"
+        )):
+            for insight in await _build_insights(snowflake_client, coral_client, employees, selected, status, risk_level):
+                if insight:
+                    streamed = True
+                    yield _ndjson_line(insight)
     except Exception as e:
-        print(f"Error checking HR data access: {str(e)}")
-        return False
+        logger.exception(f"Error streaming insights: {e}")
+        # For demo purposes, stream mock data if nothing was sent yet
+        if not streamed:
+            for insight in generate_mock_insights():
+                yield _ndjson_line(insight)
+    finally:
+        if coral_client:
+            await coral_client.close()
+
+@router.get(
+    "/insights",
+    response_model=HRInsightsResponse,
+    response_model_exclude_unset=True,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def get_insights(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of insights to return"),
+    cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    department: Optional[str] = None,
+    team: Optional[str] = None,
+    status: Optional[str] = Query(None, description="excellent, stable, improving, or declining"),
+    risk_level: Optional[str] = Query(None, description="high, medium, or low"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of insight attributes to return"),
+):
+    """Get insights about employee well-being using verifiable credentials
 
-@router.get("/insights", response_model=HRInsightsResponse)
-async def get_insights():
-    """Get insights about employee well-being using verifiable credentials"""
+    Employees are paged by (last_check_in, employee_id), most recent first.
+    With ``Accept: application/x-ndjson`` every insight after the cursor is
+    streamed instead, one JSON object per line, and ``limit`` is ignored.
+    """
+    after = _decode_cursor(cursor)
+    selected = _parse_fields(fields, EmployeeInsight, always={"id", "employee_id"})
+    
+    if _wants_ndjson(request):
+        return StreamingResponse(
+            _stream_insights(after, selected, department, team, status, risk_level),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    
     try:
         # Query Snowflake for employee data
         snowflake_client = SnowflakeClient()
-        
-        # Get all employees with their DIDs
-        employees = snowflake_client.execute(
-            "SELECT id, name, team, stressors, did FROM employees"
-        )
-        
-        # Get organization DID
-        org_result = snowflake_client.execute(
-            "SELECT did FROM organization WHERE id = 'ruhani'"
-        )
-        org_did = org_result[0][0] if org_result and org_result[0] else None
-        
-        if not org_did:
-            raise Exception("Organization DID not found")
+        query, filter_params = _insights_query(department, team)
         
         # Initialize Coral client
         coral_client = CoralClient()
@@ -77,97 +313,75 @@ async def get_insights():
         try:
             # Process data to create insights
             insights = []
+            has_more = True
             
-            for employee in employees:
-                employee_id, name, team, stressors, employee_did = employee
-                
-                if not employee_did:
-                    continue
-                
-                # Check if HR has consent to access this employee's wellness data
-                has_consent = await check_hr_data_access(employee_id, "wellness_metrics")
-                if not has_consent:
-                    continue
-                
-                # Get session credentials for this employee
-                session_credentials = snowflake_client.execute(
-                    """SELECT c.credential_data, c.issuance_date, s.session_id, s.mood, s.risk_level, s.created_at 
-                       FROM credentials c
-                       JOIN sessions s ON c.credential_id = s.credential_id
-                       WHERE c.subject_did = %s 
-                       AND c.credential_type = 'WellnessSessionCredential'
-                       AND c.revoked = FALSE
-                       AND c.issuance_date > DATEADD(day, -30, CURRENT_TIMESTAMP())
-                       ORDER BY c.issuance_date DESC""",
-                    (employee_did,)
-                )
-                
-                if not session_credentials:
-                    continue
+            # Status and risk filters need computed values, so keep scanning until the page is full
+            while has_more and len(insights) < limit:
+                employees = snowflake_client.execute(
+                    query, _keyset_params(filter_params, after, limit), name="hr_insights"
+                ).fetchall()
+                has_more = len(employees) == limit
                 
-                # Verify credentials and extract data
-                verified_sessions = []
-                moods = []
-                risk_levels = []
-                last_check_in = None
+                built = await _build_insights(snowflake_client, coral_client, employees, selected, status, risk_level)
                 
-                for cred_data in session_credentials:
-                    credential_json, issuance_date, session_id, mood, risk_level, session_time = cred_data
+                for index, (employee, insight) in enumerate(zip(employees, built)):
+                    after = (_isoformat(employee[4]), employee[0])
+                    if not insight:
+                        continue
+                    insights.append(insight)
                     
-                    # Verify the credential
-                    verification_result = await coral_client.verify_credential(
-                        credential=json.loads(credential_json) if isinstance(credential_json, str) else credential_json
-                    )
-                    
-                    if verification_result.get("verified", False):
-                        verified_sessions.append({
-                            "session_id": session_id,
-                            "mood": mood,
-                            "risk_level": risk_level,
-                            "session_time": session_time
-                        })
-                        
-                        if mood:
-                            moods.append(mood)
-                        if risk_level:
-                            risk_levels.append(risk_level)
-                        if not last_check_in and session_time:
-                            last_check_in = session_time
-                
-                # Skip employees with no verified sessions
-                if not verified_sessions:
-                    continue
-                
-                # Determine status based on risk levels
-                status = "stable"
-                if risk_levels and risk_levels[0] == "high":
-                    status = "declining"
-                elif risk_levels and risk_levels[0] == "low":
-                    status = "excellent"
-                elif len(risk_levels) > 1 and risk_levels[0] == "medium" and risk_levels[-1] == "high":
-                    status = "improving"
-                
-                # Create insight
-                insight = EmployeeInsight(
-                    id=str(uuid.uuid4()),
-                    employee_id=employee_id,
-                    name=name,
-                    team=team,
-                    department=team.split('/')[0] if '/' in team else team,
-                    last_check_in=last_check_in,
-                    status=status,
-                    mood_trend=moods[:5] if moods else [],
-                    risk_level=risk_levels[0] if risk_levels else "low"
-                )
-                insights.append(insight)
+                    if len(insights) == limit:
+                        has_more = has_more or index < len(employees) - 1
+                        break
             
-            return HRInsightsResponse(insights=insights)
+            next_cursor = _encode_cursor(*after) if has_more and after else None
+            return HRInsightsResponse(insights=insights, next_cursor=next_cursor)
         finally:
             await coral_client.close()
     except Exception as e:
-        print(f"Error in get_insights: {str(e)}")
+        logger.exception(f"Error in get_insights: {e}")
         # For demo purposes, return mock data if there's an error
-        return HRInsightsResponse(insights=generate_mock_insights())
+        return HRInsightsResponse(insights=generate_mock_insights(), next_cursor=None)
+
+def _claims(row: BaseModel) -> Dict[str, Any]:
+    """The claims a presentation covers for a response row: exactly the fields returned for it"""
+    return row.model_dump(mode="json", exclude_unset=True)
+
+async def _present(
+    coral_client: CoralClient,
+    org_did: str,
+    presentation_type: str,
+    claims: List[Dict[str, Any]],
+    credential_ids: Optional[List[str]] = None,
+) -> List[PresentationReference]:
+    """Create the batched presentations covering the claims of a response's rows
+
+    The rows are real whether or not Coral can present them, so a failed
+    presentation is logged and the rows are returned without presentations.
+    """
+    if not claims:
+        return []
+    
+    presentation_result = await coral_client.create_batch_presentation(
+        holder_did=org_did,
+        presentation_type=presentation_type,
+        items=claims,
+        credential_ids=credential_ids
+    )
+    
+    if "error" in presentation_result:
+        logger.error(f"Error creating {presentation_type} presentation: {presentation_result['error']}")
+        return []
+    
+    return [
+        PresentationReference(
+            id=presentation["presentation"]["id"],
+            claims_root=presentation["claims_root"],
+            start=presentation["start"],
+            end=presentation["end"]
+        )
+        for presentation in presentation_result["presentations"]
+    ]
 
 @router.get("/trends", response_model=HRTrendsResponse)
 async def get_trends():
@@ -177,13 +391,7 @@ async def get_trends():
         snowflake_client = SnowflakeClient()
         
         # Get organization DID
-        org_result = snowflake_client.execute(
-            "SELECT did FROM organization WHERE id = 'ruhani'"
-        )
-        org_did = org_result[0][0] if org_result and org_result[0] else None
-        
-        if not org_did:
-            raise Exception("Organization DID not found")
+        org_did = await identity_cache.get_org_did()
         
         # Get sessions with valid credentials grouped by week
         sessions_by_week = snowflake_client.execute(
@@ -201,7 +409,8 @@ async def get_trends():
                AND cr.expires_at > CURRENT_TIMESTAMP()
                AND JSON_CONTAINS(cr.data_categories, '"session_summaries"')
                GROUP BY week
-               ORDER BY week ASC"""
+               ORDER BY week ASC""",
+            name="hr_trends"
         )
         
         # Initialize Coral client
@@ -213,26 +422,8 @@ async def get_trends():
             for week_data in sessions_by_week:
                 week, session_count, high_risk, medium_risk, low_risk = week_data
                 
-                # Create a presentation of aggregated data
-                presentation_result = await coral_client.create_presentation(
-                    holder_did=org_did,
-                    credential_ids=[],  # No specific credentials, this is aggregate data
-                    presentation_type="AggregatedWellnessData",
-                    claims={
-                        "week": week,
-                        "total_sessions": session_count,
-                        "high_risk_count": high_risk,
-                        "medium_risk_count": medium_risk,
-                        "low_risk_count": low_risk
-                    }
-                )
-                
-                if "error" in presentation_result:
-                    print(f"Error creating presentation: {presentation_result['error']}")
-                    continue
-                
                 trend = EmployeeTrend(
-                    period=week,
+                    period=_isoformat(week),
                     total_sessions=session_count,
                     mood_distribution={
                         "high_risk": high_risk,
@@ -243,46 +434,205 @@ async def get_trends():
                 )
                 trends.append(trend)
             
-            return HRTrendsResponse(trends=trends)
+            # Create one presentation covering all of the aggregated data
+            presentations = await _present(
+                coral_client, org_did, "AggregatedWellnessData", [_claims(trend) for trend in trends]
+            )
+            
+            return HRTrendsResponse(trends=trends, presentations=presentations)
         finally:
             await coral_client.close()
     except Exception as e:
-        print(f"Error in get_trends: {str(e)}")
+        logger.exception(f"Error in get_trends: {e}")
         # For demo purposes, return mock data if there's an error
         return HRTrendsResponse(trends=generate_mock_trends())
 
-@router.get("/at-risk", response_model=HRAtRiskResponse)
-async def get_at_risk():
-    """Get employees who may be at risk based on verifiable credentials"""
+# Ordering of risk levels for top-N by severity
+RISK_SEVERITY = {"low": 1, "medium": 2, "high": 3}
+SEVERITY_SQL = "CASE s.risk_level WHEN 'high' THEN 3 WHEN 'medium' THEN 2 WHEN 'low' THEN 1 ELSE 0 END"
+
+def _at_risk_query(department: Optional[str], team: Optional[str], order: str) -> Tuple[str, List[Any]]:
+    """Build the keyset query over each employee's most recent qualifying session
+
+    Deduplication happens in Snowflake with QUALIFY ROW_NUMBER(), so at most
+    one row per employee is returned. Rows carry the credential's content
+    hash rather than its document, which is loaded only for verification.
+    With ``order="severity"`` the most
+    severe session is picked first and rows are ranked by severity, then
+    recency.
+
+    The leading parameter is the minimum severity; the trailing ones are the
+    cursor position and the row limit, which may be None for no limit.
+    """
+    filter_sql, filter_params = _keyset_filters(department, team)
+    if order == "severity":
+        pick_order = "severity DESC, s.created_at DESC"
+        keyset_sql = """(%s IS NULL
+            OR l.severity < %s
+            OR (l.severity = %s AND (l.created_at < TO_TIMESTAMP_NTZ(%s)
+                OR (l.created_at = TO_TIMESTAMP_NTZ(%s) AND l.id < %s))))"""
+        order_sql = "l.severity DESC, l.created_at DESC, l.id DESC"
+    else:
+        pick_order = "s.created_at DESC"
+        keyset_sql = """(%s IS NULL
+            OR l.created_at < TO_TIMESTAMP_NTZ(%s)
+            OR (l.created_at = TO_TIMESTAMP_NTZ(%s) AND l.id < %s))"""
+        order_sql = "l.created_at DESC, l.id DESC"
+    query = f"""
+    WITH latest AS (
+        SELECT e.id, e.name, e.team, e.did, s.session_id, s.created_at, s.risk_level, s.credential_id,
+               c.content_hash, {SEVERITY_SQL} AS severity
+        FROM employees e
+        JOIN sessions s ON e.id = s.employee_id
+        JOIN credentials c ON s.credential_id = c.credential_id
+        WHERE {SEVERITY_SQL} >= %s
+        AND s.created_at > DATEADD(week, -2, CURRENT_TIMESTAMP())
+        AND c.revoked = FALSE
+        AND EXISTS (
+            SELECT 1 FROM consent_records cr
+            WHERE cr.employee_id = e.id
+            AND cr.expires_at > CURRENT_TIMESTAMP()
+            AND JSON_CONTAINS(cr.data_categories, '"risk_assessments"')
+        )
+        {filter_sql}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY e.id ORDER BY {pick_order}) = 1
+    )
+    SELECT l.id, l.name, l.team, l.did, l.session_id, l.created_at, l.risk_level, l.credential_id,
+           l.content_hash, l.severity
+    FROM latest l
+    WHERE {keyset_sql}
+    ORDER BY {order_sql}
+    LIMIT %s
+    """
+    return query, filter_params
+
+def _at_risk_params(
+    risk_level: str,
+    filter_params: List[Any],
+    order: str,
+    after: Optional[Tuple[str, ...]],
+    limit: Optional[int],
+) -> Tuple[Any, ...]:
+    """Bind the minimum severity, filter values, cursor position and limit for _at_risk_query"""
+    params = (RISK_SEVERITY[risk_level],) + tuple(filter_params)
+    if order == "severity":
+        severity, after_time, after_id = after or (None, None, None)
+        return params + (severity, severity, severity, after_time, after_time, after_id, limit)
+    after_time, after_id = after or (None, None)
+    return params + (after_time, after_time, after_time, after_id, limit)
+
+def _at_risk_position(employee_data: Tuple, order: str) -> Tuple[str, ...]:
+    """Return the keyset position of an at-risk row for the given order"""
+    position = (_isoformat(employee_data[5]), employee_data[0])
+    return (str(employee_data[9]),) + position if order == "severity" else position
+
+def _build_risk(
+    employee_data: Tuple,
+    selected: Set[str],
+    verified: Dict[str, bool],
+) -> Optional[Tuple[EmployeeRisk, Dict[str, Any]]]:
+    """Build the at-risk entry for one session row along with the ID of its session credential
+
+    Returns None if the session credential did not verify.
+    """
+    employee_id, name, team, employee_did, session_id, session_time, risk_level, credential_id, content_hash, severity = employee_data
+    
+    if not verified.get(content_hash, False):
+        return None
+    
+    values: Dict[str, Any] = {
+        "employee_id": employee_id,
+        "name": name,
+        "team": team,
+        "department": _department(team),
+        "last_check_in": _isoformat(session_time),
+        "risk_level": risk_level,
+        "risk_factors": ["stress", "workload"],  # Mock data
+        "recommended_actions": ["Schedule 1:1", "Wellness check"]
+    }
+    return EmployeeRisk(**{key: values[key] for key in selected}), credential_id
+
+async def _stream_at_risk(
+    after: Optional[Tuple[str, ...]],
+    selected: Set[str],
+    department: Optional[str],
+    team: Optional[str],
+    risk_level: str,
+    order: str,
+) -> AsyncIterator[bytes]:
+    """Stream every at-risk employee as NDJSON, one row per line as soon as it is built"""
+    coral_client = None
+    streamed = False
+    try:
+        # Connecting and fetching each batch block, so both run in threads
+        snowflake_client = await asyncio.to_thread(SnowflakeClient)
+        coral_client = CoralClient()
+        query, filter_params = _at_risk_query(department, team, order)
+        params = _at_risk_params(risk_level, filter_params, order, after, None)
+        
+        async for rows in iterate_in_threadpool(
+            snowflake_client.iter_batches(query, params, STREAM_BATCH_SIZE, name="hr_at_risk")
+        ):
+            # Verify the batch's credentials together. Streams carry rows only;
+            # presentations come with the paged response.
+            verified = await credential_store.verify(snowflake_client, coral_client, [row[8] for row in rows])
+            for employee_data in rows:
+                result = _build_risk(employee_data, selected, verified)
+                if result:
+                    streamed = True
+                    yield _ndjson_line(result[0])
+    except Exception as e:
+        logger.exception(f"Error streaming at-risk employees: {e}")
+        # For demo purposes, stream mock data if nothing was sent yet
+        if not streamed:
+            for risk in generate_mock_at_risk():
+                yield _ndjson_line(risk)
+    finally:
+        if coral_client:
+            await coral_client.close()
+
+@router.get(
+    "/at-risk",
+    response_model=HRAtRiskResponse,
+    response_model_exclude_unset=True,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def get_at_risk(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of employees to return"),
+    cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    department: Optional[str] = None,
+    team: Optional[str] = None,
+    risk_level: str = Query("high", pattern="^(low|medium|high)$", description="Minimum session risk level to report on"),
+    order: str = Query("recency", pattern="^(recency|severity)$", description="Rank by most recent or most severe session"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of employee attributes to return"),
+):
+    """Get employees who may be at risk based on verifiable credentials
+
+    Each employee appears once, with their most recent (or, ordered by
+    severity, most severe) qualifying session. Pages are keyed on
+    (last_check_in, employee_id), prefixed by severity when ordered by it.
+    With ``Accept: application/x-ndjson`` every match after the cursor is
+    streamed instead, one JSON object per line, and ``limit`` is ignored.
+    """
+    after = _decode_cursor(cursor, size=3 if order == "severity" else 2)
+    selected = _parse_fields(fields, EmployeeRisk, always={"employee_id"})
+    
+    if _wants_ndjson(request):
+        return StreamingResponse(
+            _stream_at_risk(after, selected, department, team, risk_level, order),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    
     try:
         # Query Snowflake for high-risk sessions with valid credentials
         snowflake_client = SnowflakeClient()
         
         # Get organization DID
-        org_result = snowflake_client.execute(
-            "SELECT did FROM organization WHERE id = 'ruhani'"
-        )
-        org_did = org_result[0][0] if org_result and org_result[0] else None
-        
-        if not org_did:
-            raise Exception("Organization DID not found")
+        org_did = await identity_cache.get_org_did()
         
         # Get employees with high-risk sessions that have valid credentials and consent
-        at_risk_query = """
-        SELECT e.id, e.name, e.team, e.did, s.session_id, s.created_at, s.risk_level, c.credential_id, c.credential_data
-        FROM employees e
-        JOIN sessions s ON e.id = s.employee_id
-        JOIN credentials c ON s.credential_id = c.credential_id
-        JOIN consent_records cr ON cr.employee_id = e.id
-        WHERE s.risk_level = 'high'
-        AND s.created_at > DATEADD(week, -2, CURRENT_TIMESTAMP())
-        AND c.revoked = FALSE
-        AND cr.expires_at > CURRENT_TIMESTAMP()
-        AND JSON_CONTAINS(cr.data_categories, '"risk_assessments"')
-        ORDER BY s.created_at DESC
-        """
-        
-        at_risk_employees = snowflake_client.execute(at_risk_query)
+        query, filter_params = _at_risk_query(department, team, order)
         
         # Initialize Coral client
         coral_client = CoralClient()
@@ -290,62 +640,48 @@ async def get_at_risk():
         try:
             # Process data to create at-risk list
             at_risk = []
-            processed_employees = set()
+            credential_ids = []
+            has_more = True
             
-            for employee_data in at_risk_employees:
-                employee_id, name, team, employee_did, session_id, session_time, risk_level, credential_id, credential_data = employee_data
-                
-                # Skip if already processed this employee
-                if employee_id in processed_employees:
-                    continue
-                
-                # Verify the credential
-                verification_result = await coral_client.verify_credential(
-                    credential=json.loads(credential_data) if isinstance(credential_data, str) else credential_data
-                )
+            # Rows whose credential fails verification are dropped, so keep scanning until the page is full
+            while has_more and len(at_risk) < limit:
+                at_risk_employees = snowflake_client.execute(
+                    query, _at_risk_params(risk_level, filter_params, order, after, limit), name="hr_at_risk"
+                ).fetchall()
+                has_more = len(at_risk_employees) == limit
                 
-                if not verification_result.get("verified", False):
-                    continue
-                
-                # Create a presentation for HR to view
-                presentation_result = await coral_client.create_presentation(
-                    holder_did=org_did,
-                    credential_ids=[credential_id],
-                    presentation_type="EmployeeRiskAssessment",
-                    claims={
-                        "employee_id": employee_id,
-                        "risk_level": risk_level,
-                        "session_id": session_id,
-                        "session_time": session_time
-                    }
+                # Verify the page's credentials together
+                verified = await credential_store.verify(
+                    snowflake_client, coral_client, [row[8] for row in at_risk_employees]
                 )
                 
-                if "error" in presentation_result:
-                    print(f"Error creating presentation: {presentation_result['error']}")
-                    continue
-                
-                # Mark as processed
-                processed_employees.add(employee_id)
-                
-                risk = EmployeeRisk(
-                    employee_id=employee_id,
-                    name=name,
-                    team=team,
-                    department=team.split('/')[0] if '/' in team else team,
-                    last_check_in=session_time,
-                    risk_level=risk_level,
-                    risk_factors=["stress", "workload"],  # Mock data
-                    recommended_actions=["Schedule 1:1", "Wellness check"]
-                )
-                at_risk.append(risk)
+                for index, employee_data in enumerate(at_risk_employees):
+                    after = _at_risk_position(employee_data, order)
+                    
+                    result = _build_risk(employee_data, selected, verified)
+                    if not result:
+                        continue
+                    at_risk.append(result[0])
+                    credential_ids.append(result[1])
+                    
+                    if len(at_risk) == limit:
+                        has_more = has_more or index < len(at_risk_employees) - 1
+                        break
+            
+            # Create one presentation covering the whole page for HR to view
+            presentations = await _present(
+                coral_client, org_did, "EmployeeRiskAssessment",
+                [_claims(risk) for risk in at_risk], credential_ids
+            )
             
-            return HRAtRiskResponse(at_risk_employees=at_risk)
+            next_cursor = _encode_cursor(*after) if has_more and after else None
+            return HRAtRiskResponse(at_risk_employees=at_risk, next_cursor=next_cursor, presentations=presentations)
         finally:
             await coral_client.close()
     except Exception as e:
-        print(f"Error in get_at_risk: {str(e)}")
+        logger.exception(f"Error in get_at_risk: {e}")
         # For demo purposes, return mock data if there's an error
-        return HRAtRiskResponse(at_risk_employees=generate_mock_at_risk())
+        return HRAtRiskResponse(at_risk_employees=generate_mock_at_risk(), next_cursor=None, presentations=[])
 
 # Helper functions to generate mock data for demo purposes
 def generate_mock_insights() -> List[EmployeeInsight]:
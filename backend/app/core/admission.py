@@ -0,0 +1,279 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .config import settings
+from .metrics import registry
+from .serialization import dumps
+
+# Paths never subject to admission control, so probes and operators get through under load
+EXEMPT_PREFIXES = ("/health", "/metrics", "/admin", "/docs", "/redoc", "/openapi.json")
+
+admission_rejected = registry.counter(
+    "admission_rejected_total", "Requests shed by admission control, by gate and reason", ("gate", "reason")
+)
+admission_queue_wait = registry.histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a slot", ("gate",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+class AIMDLimit:
+    """Concurrency limit adapted to observed latency (additive increase, multiplicative decrease).
+
+    A request that took longer than ``target_latency`` or failed with a 5xx
+    cuts the limit by ``backoff``, at most once per ``target_latency`` so one
+    slow batch counts once. A fast request that completes while the gate was
+    full raises the limit by 1/limit, i.e. by about one per round of requests.
+    A static limit is one whose minimum and maximum are equal.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float, backoff: float = 0.75):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    def update(self, latency: float, failed: bool, saturated: bool) -> None:
+        if self.minimum == self.maximum:
+            return
+        if failed or latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target_latency:
+                self._last_decrease = now
+                self._limit = max(float(self.minimum), self._limit * self.backoff)
+        elif saturated:
+            self._limit = min(float(self.maximum), self._limit + 1 / self._limit)
+
+class AdmissionGate:
+    """Concurrency limit for a group of routes, with a bounded FIFO of waiting requests.
+
+    A request is admitted while fewer than ``limit.limit`` are in flight.
+    Otherwise it waits for up to ``queue_timeout`` seconds, provided fewer
+    than ``queue_size`` are already waiting; if not admitted by then, it is
+    rejected so the caller can retry elsewhere instead of piling up here.
+    """
+
+    def __init__(self, name: str, limit: AIMDLimit, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Exponentially weighted latency of admitted requests, for Retry-After
+        self.latency = limit.target_latency / 2
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns None once admitted, or the reason the request is rejected"""
+        if self.in_flight < self.limit.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the wait timed out; pass it on
+                self.in_flight -= 1
+                self._grant_next()
+            return self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._grant_next()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if not waiter.done():
+                waiter.cancel()
+        admission_queue_wait.observe(time.perf_counter() - started, self.name)
+        self.admitted += 1
+        return None
+
+    def release(self, latency: float, failed: bool) -> None:
+        """Give back a slot and feed the request's latency to the adaptive limit"""
+        saturated = self.in_flight >= self.limit.limit or bool(self._waiters)
+        self.in_flight -= 1
+        self.limit.update(latency, failed, saturated)
+        self.latency += 0.2 * (latency - self.latency)
+        self._grant_next()
+
+    def _grant_next(self) -> None:
+        # Slots are handed over directly, so a new arrival cannot overtake the queue
+        while self._waiters and self.in_flight < self.limit.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _reject(self, reason: str) -> str:
+        self.rejected += 1
+        admission_rejected.inc(self.name, reason)
+        return reason
+
+    def retry_after(self) -> int:
+        """Seconds a rejected caller should wait: about how long the queue takes to drain"""
+        rounds = (self.queued + 1) / max(1, self.limit.limit)
+        return max(1, math.ceil(self.latency * rounds))
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit.limit,
+            "min_limit": self.limit.minimum,
+            "max_limit": self.limit.maximum,
+            "target_latency_ms": self.limit.target_latency * 1000,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "latency_ms": round(self.latency * 1000, 1),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+class AdmissionController:
+    """Routes each HTTP request to the gate of the first matching path prefix, or the default gate"""
+
+    def __init__(self, enabled: bool, gates: List[Tuple[str, AdmissionGate]], default: AdmissionGate):
+        self.enabled = enabled
+        self.gates = gates
+        self.default = default
+
+    def gate_for(self, path: str) -> Optional[AdmissionGate]:
+        if not self.enabled or path == "/" or path.startswith(EXEMPT_PREFIXES):
+            return None
+        for prefix, gate in self.gates:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return gate
+        return self.default
+
+    def all_gates(self) -> List[AdmissionGate]:
+        return [gate for _, gate in self.gates] + [self.default]
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {gate.name: gate.state() for gate in self.all_gates()}
+
+def _adaptive_gate(name: str, max_concurrency: int, target_latency: float) -> AdmissionGate:
+    return AdmissionGate(
+        name,
+        AIMDLimit(initial=max_concurrency, minimum=settings.ADMISSION_MIN_CONCURRENCY,
+                  maximum=max_concurrency, target_latency=target_latency),
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+    )
+
+# Create a global admission controller instance. Sessions (STT, LLM, TTS) and
+# HR analytics (Snowflake) are limited independently, so a slow provider sheds
+# only the routes that depend on it.
+admission = AdmissionController(
+    enabled=settings.ADMISSION_ENABLED,
+    gates=[
+        ("/employee/session", _adaptive_gate(
+            "session", settings.ADMISSION_SESSION_MAX_CONCURRENCY, settings.ADMISSION_SESSION_TARGET_LATENCY_SECONDS
+        )),
+        ("/hr", _adaptive_gate(
+            "hr", settings.ADMISSION_HR_MAX_CONCURRENCY, settings.ADMISSION_HR_TARGET_LATENCY_SECONDS
+        )),
+    ],
+    default=AdmissionGate(
+        "default",
+        AIMDLimit(initial=settings.ADMISSION_DEFAULT_CONCURRENCY, minimum=settings.ADMISSION_DEFAULT_CONCURRENCY,
+                  maximum=settings.ADMISSION_DEFAULT_CONCURRENCY, target_latency=1.0),
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+    )
+)
+
+registry.callback(
+    "admission_limit", "Current concurrency limit of each admission gate", "gauge", ("gate",),
+    lambda: {(gate.name,): gate.limit.limit for gate in admission.all_gates()}
+)
+registry.callback(
+    "admission_in_flight", "Requests holding an admission slot", "gauge", ("gate",),
+    lambda: {(gate.name,): gate.in_flight for gate in admission.all_gates()}
+)
+registry.callback(
+    "admission_queued", "Requests waiting for an admission slot", "gauge", ("gate",),
+    lambda: {(gate.name,): gate.queued for gate in admission.all_gates()}
+)
+
+class AdmissionMiddleware:
+    """ASGI middleware that sheds HTTP requests beyond their gate's limit with a 503 and Retry-After.
+
+    A slot is held until the response body has been sent. The time to the
+    response's first byte is the latency fed to the adaptive limit, so
+    streaming exports are judged by how fast they start, not how long
+    they run. WebSocket sessions are not gated.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        gate = admission.gate_for(scope["path"]) if scope["type"] == "http" else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await gate.acquire()
+        if reason is not None:
+            await self._reject(gate, reason, send)
+            return
+
+        started = time.perf_counter()
+        latency: Optional[float] = None
+        status = 500
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                gate.release(latency if latency is not None else time.perf_counter() - started, status >= 500)
+
+        async def send_and_release(message):
+            nonlocal latency, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                latency = time.perf_counter() - started
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                release()
+
+        try:
+            await self.app(scope, receive, send_and_release)
+        finally:
+            release()
+
+    @staticmethod
+    async def _reject(gate: AdmissionGate, reason: str, send) -> None:
+        body = dumps({"detail": "Server is busy, please retry later", "gate": gate.name, "reason": reason})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(gate.retry_after()).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
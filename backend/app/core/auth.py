@@ -1,8 +1,11 @@
 import os
-import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from .imports import lazy_import
+
+jwt = lazy_import("jwt")
+
 JWT_SECRET = os.getenv("JWT_SECRET", "changeme")
 ALGORITHM = "HS256"
 
@@ -18,4 +21,9 @@ def decode_jwt_token(token: str):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return decode_jwt_token(credentials.credentials) 
\ No newline at end of file
+    return decode_jwt_token(credentials.credentials) 
+
+def require_admin(user: dict = Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return user
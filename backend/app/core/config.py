@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 import logging
 
@@ -37,6 +37,120 @@ class Settings:
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
     BACKEND_URL: str = os.getenv("BACKEND_URL", "http://localhost:8000")
     
+    # Identity cache
+    IDENTITY_CACHE_SIZE: int = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+    IDENTITY_CACHE_TTL_SECONDS: float = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "3600"))
+    # "Employee not found" answers expire sooner, as onboarding through another worker does not clear them
+    IDENTITY_CACHE_NEGATIVE_TTL_SECONDS: float = float(os.getenv("IDENTITY_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+    
+    # Credential bodies and verification results, keyed by content hash
+    CREDENTIAL_CACHE_SIZE: int = int(os.getenv("CREDENTIAL_CACHE_SIZE", "10000"))
+    CREDENTIAL_CACHE_TTL_SECONDS: float = float(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", "3600"))
+    # Coral verification calls in flight at once per worker
+    CREDENTIAL_VERIFY_CONCURRENCY: int = int(os.getenv("CREDENTIAL_VERIFY_CONCURRENCY", "8"))
+    
+    # FetchAI public-profile cache
+    PROFILE_CACHE_PATH: str = os.getenv("PROFILE_CACHE_PATH", ".cache/fetchai_profiles.sqlite3")
+    PROFILE_CACHE_TTL_SECONDS: float = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    PROFILE_CACHE_NEGATIVE_TTL_SECONDS: float = float(os.getenv("PROFILE_CACHE_NEGATIVE_TTL_SECONDS", "300"))
+    PROFILE_CACHE_REFRESH_INTERVAL_SECONDS: float = float(os.getenv("PROFILE_CACHE_REFRESH_INTERVAL_SECONDS", "3600"))
+    
+    # Speech-to-text: "groq" or "stub"; unset picks groq when GROQ_API_KEY is set
+    STT_BACKEND: Optional[str] = os.getenv("STT_BACKEND")
+    # Streamed audio is cut at the last pause once STT_SEGMENT_SECONDS are buffered,
+    # or at STT_MAX_SEGMENT_SECONDS without a pause; a stream with more than
+    # STT_MAX_BUFFER_SECONDS waiting to be transcribed is closed
+    STT_SEGMENT_SECONDS: float = float(os.getenv("STT_SEGMENT_SECONDS", "5"))
+    STT_MAX_SEGMENT_SECONDS: float = float(os.getenv("STT_MAX_SEGMENT_SECONDS", "15"))
+    STT_MAX_BUFFER_SECONDS: float = float(os.getenv("STT_MAX_BUFFER_SECONDS", "60"))
+    
+    # Shared executor for CPU-bound work: payloads up to CPU_INLINE_MAX_BYTES run
+    # inline, up to CPU_PROCESS_MIN_BYTES in threads, and larger ones in processes
+    CPU_PROCESS_WORKERS: int = int(os.getenv("CPU_PROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    CPU_THREAD_WORKERS: int = int(os.getenv("CPU_THREAD_WORKERS", "4"))
+    CPU_INLINE_MAX_BYTES: int = int(os.getenv("CPU_INLINE_MAX_BYTES", str(16 * 1024)))
+    CPU_PROCESS_MIN_BYTES: int = int(os.getenv("CPU_PROCESS_MIN_BYTES", str(1024 * 1024)))
+    
+    # Tracing: "file" appends OTLP/JSON to TRACE_FILE_PATH, "otlp" posts to an
+    # OTLP/HTTP collector at OTLP_ENDPOINT; unset keeps spans for Server-Timing only
+    TRACE_EXPORTER: Optional[str] = os.getenv("TRACE_EXPORTER")
+    TRACE_FILE_PATH: str = os.getenv("TRACE_FILE_PATH", ".cache/traces.jsonl")
+    OTLP_ENDPOINT: str = os.getenv("OTLP_ENDPOINT", "http://localhost:4318")
+    TRACE_SERVICE_NAME: str = os.getenv("TRACE_SERVICE_NAME", "ruhani-backend")
+    
+    # Prometheus metrics: with several workers, each writes its values to
+    # METRICS_DIR every METRICS_FLUSH_SECONDS so /metrics can merge them
+    METRICS_DIR: Optional[str] = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_SECONDS: float = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+    
+    # Event-loop watchdog: probe lag every LOOP_LAG_INTERVAL_SECONDS and record
+    # the stack of anything blocking the loop for LOOP_BLOCK_THRESHOLD_SECONDS
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    LOOP_LAG_INTERVAL_SECONDS: float = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+    LOOP_BLOCK_THRESHOLD_SECONDS: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.1"))
+    
+    # Sampling profiler: PROFILE_SAMPLE_RATE of requests to PROFILE_ROUTES (0 disables;
+    # adjustable at runtime through /admin/profiler) are profiled into PROFILE_DIR
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_ROUTES: List[str] = os.getenv("PROFILE_ROUTES", "/employee/session,/hr/").split(",")
+    PROFILE_INTERVAL_SECONDS: float = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", ".cache/profiles")
+    PROFILE_AGGREGATE_SIZE: int = int(os.getenv("PROFILE_AGGREGATE_SIZE", "100"))
+    
+    # Production server (python run.py --production): one worker per CPU by default
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+    # Keep above the load balancer's idle timeout so it never reuses a connection we closed
+    SERVER_KEEP_ALIVE_SECONDS: int = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "75"))
+    # On SIGTERM: time for in-flight requests, then for background jobs, to finish
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    SHUTDOWN_DRAIN_SECONDS: float = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "10"))
+    SERVER_ACCESS_LOG: bool = os.getenv("SERVER_ACCESS_LOG", "false").lower() == "true"
+    
+    # Readiness: how often a worker re-reads the schema version while it is behind
+    SCHEMA_CHECK_INTERVAL_SECONDS: float = float(os.getenv("SCHEMA_CHECK_INTERVAL_SECONDS", "15"))
+    
+    # Logging: records are written by a background thread, as JSON lines in
+    # production and as text elsewhere unless LOG_FORMAT is set
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json" if ENVIRONMENT.lower() == "production" else "text").lower()
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Warnings and errors from one line of code: the first LOG_BURST per window are
+    # written, then one in LOG_SAMPLE_EVERY with a count of the ones skipped
+    LOG_BURST: int = int(os.getenv("LOG_BURST", "10"))
+    LOG_BURST_WINDOW_SECONDS: float = float(os.getenv("LOG_BURST_WINDOW_SECONDS", "60"))
+    LOG_SAMPLE_EVERY: int = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+    
+    # Admission control, per worker: adaptive concurrency limits for sessions and
+    # HR routes, a static one for other routes, and how long requests may queue
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_SESSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_SESSION_MAX_CONCURRENCY", "32"))
+    ADMISSION_SESSION_TARGET_LATENCY_SECONDS: float = float(os.getenv("ADMISSION_SESSION_TARGET_LATENCY_SECONDS", "9"))
+    ADMISSION_HR_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_HR_MAX_CONCURRENCY", "16"))
+    ADMISSION_HR_TARGET_LATENCY_SECONDS: float = float(os.getenv("ADMISSION_HR_TARGET_LATENCY_SECONDS", "2"))
+    ADMISSION_MIN_CONCURRENCY: int = int(os.getenv("ADMISSION_MIN_CONCURRENCY", "2"))
+    ADMISSION_DEFAULT_CONCURRENCY: int = int(os.getenv("ADMISSION_DEFAULT_CONCURRENCY", "256"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))
+    
+    # Session latency budget: STT, the LLM, TTS and storing the session each get
+    # what is left of it as their timeout. A session that runs out answers with a
+    # fallback response (keeping the reserve to build it) and is completed in the
+    # background, at most SESSION_COMPLETION_CONCURRENCY at a time per worker.
+    # The defaults allow for a p95 of about 1 s of STT, 4 s for a full LLM response
+    # and 2 s of TTS; tune them from provider_request_duration_seconds. POST
+    # /employee/session includes STT, while a stream's deadline starts once its
+    # transcript is done. Keep SESSION_DEADLINE_SECONDS below
+    # ADMISSION_SESSION_TARGET_LATENCY_SECONDS.
+    SESSION_DEADLINE_SECONDS: float = float(os.getenv("SESSION_DEADLINE_SECONDS", "8"))
+    SESSION_STREAM_DEADLINE_SECONDS: float = float(os.getenv("SESSION_STREAM_DEADLINE_SECONDS", "6.5"))
+    SESSION_RESPONSE_RESERVE_SECONDS: float = float(os.getenv("SESSION_RESPONSE_RESERVE_SECONDS", "0.25"))
+    SESSION_COMPLETION_CONCURRENCY: int = int(os.getenv("SESSION_COMPLETION_CONCURRENCY", "4"))
+    # Speech of the fallback responses, recorded once and shared by every worker
+    FALLBACK_AUDIO_DIR: str = os.getenv("FALLBACK_AUDIO_DIR", ".cache/fallback_audio")
+    
     # Feature flags
     SEED_SAMPLE_DATA: bool = os.getenv("SEED_SAMPLE_DATA", "true").lower() == "true"
     
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable, Optional
+
+from .metrics import registry
+
+# Shortest timeout handed to a call made after its request's budget is spent,
+# so it fails at once instead of being given no timeout at all
+MIN_TIMEOUT = 0.001
+
+deadline_exceeded = registry.counter(
+    "deadline_exceeded_total", "Request stages cut short because the request's deadline was reached", ("stage",)
+)
+
+class DeadlineExceeded(Exception):
+    """A stage of a request could not finish within what was left of its budget"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} did not finish within the request deadline")
+        self.stage = stage
+
+class Deadline:
+    """Latency budget of one request, shared by every stage it runs.
+
+    Used as a context manager it becomes the current deadline: provider
+    clients cap their timeouts at what is left of it (timeout_for) and
+    callers bound each stage with within_deadline, so slow stages cannot add
+    up past the budget. Tasks created inside the block inherit it.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+        self._token: Optional[Token] = None
+
+    def remaining(self, reserve: float = 0.0) -> float:
+        """Seconds left, keeping reserve seconds back for the caller"""
+        return max(0.0, self.expires - time.monotonic() - reserve)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def __enter__(self) -> "Deadline":
+        self._token = current_deadline.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        current_deadline.reset(self._token)
+        self._token = None
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+def timeout_for(default: float) -> float:
+    """Timeout for a call that may otherwise take default seconds, capped at the current deadline"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    return min(default, max(deadline.remaining(), MIN_TIMEOUT))
+
+async def within_deadline(stage: str, awaitable: Awaitable, reserve: float = 0.0) -> Any:
+    """Await a stage with the current deadline's remaining budget, less reserve, as its timeout
+
+    The stage is cancelled and DeadlineExceeded raised if it would run past
+    that; without a current deadline it is simply awaited.
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return await awaitable
+    timeout = deadline.remaining(reserve)
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        deadline_exceeded.inc(stage)
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        deadline_exceeded.inc(stage)
+        raise DeadlineExceeded(stage) from None
@@ -0,0 +1,217 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from .config import settings
+from .metrics import registry
+from .tracing import span
+
+logger = logging.getLogger("ruhani")
+
+T = TypeVar("T")
+
+# Process workers are started by a fork server, a fresh single-threaded process,
+# because forking this one (it runs log, watchdog, metrics and pool threads)
+# could deadlock the children. The fork server imports these first, so every
+# worker forked from it has them loaded.
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+PROCESS_PRELOAD = ["numpy", "pandas"]
+
+def sha256_hex(data: Any) -> str:
+    """SHA-256 hex digest of bytes or text"""
+    return hashlib.sha256(data.encode() if isinstance(data, str) else data).hexdigest()
+
+def b64encode_text(data: bytes) -> str:
+    """Base64-encode bytes to text"""
+    return base64.b64encode(data).decode("utf-8")
+
+def payload_size(args: Tuple[Any, ...]) -> int:
+    """Estimate the size in bytes of a call's arguments from its bytes, text and arrays"""
+    size = 0
+    for arg in args:
+        if isinstance(arg, (bytes, bytearray, memoryview, str)):
+            size += len(arg)
+        elif hasattr(arg, "nbytes"):
+            size += int(arg.nbytes)
+        elif hasattr(arg, "memory_usage"):
+            size += int(arg.memory_usage(index=False).sum())
+    return size
+
+def _timed_call(fn: Callable[..., T], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[T, float, float]:
+    """Run fn in a worker and report when it started (wall clock) and how long it ran"""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return result, started, time.time() - started
+
+class PoolStats:
+    """Queue and run-time counters for one executor tier"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        """Calls waiting for a free worker"""
+        return max(0, self.in_flight - self.workers)
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds / done * 1000, 3) if done else 0.0,
+            "max_queue_wait_ms": round(self.max_queue_wait_seconds * 1000, 3),
+            "avg_run_ms": round(self.run_seconds / done * 1000, 3) if done else 0.0,
+        }
+
+class CPUExecutor:
+    """Shared executor for CPU-bound work on the request path.
+
+    Work is routed by payload size: small calls run inline (offloading them
+    would cost more than the work), medium calls go to a thread pool, and
+    large calls go to a process pool so they neither hold the GIL nor delay
+    unrelated requests. Pools are started and stopped with the application
+    and created on first use outside it (e.g. in CLI scripts).
+    """
+
+    def __init__(self, process_workers: int, thread_workers: int, inline_max_bytes: int, process_min_bytes: int):
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.inline_max_bytes = inline_max_bytes
+        self.process_min_bytes = process_min_bytes
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self.stats = {
+            "inline": PoolStats(1),
+            "thread": PoolStats(thread_workers),
+            "process": PoolStats(process_workers),
+        }
+
+    def start(self) -> None:
+        """Create the worker pools"""
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="cpu")
+        if self._processes is None:
+            context = multiprocessing.get_context(PROCESS_START_METHOD)
+            if PROCESS_START_METHOD == "forkserver":
+                context.set_forkserver_preload(PROCESS_PRELOAD)
+            self._processes = ProcessPoolExecutor(max_workers=self.process_workers, mp_context=context)
+
+    async def warm_up(self) -> None:
+        """Start the pools and spawn every worker now, so the first requests do not wait for them"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(pool, os.getpid)
+            for pool, workers in ((self._threads, self.thread_workers), (self._processes, self.process_workers))
+            for _ in range(workers)
+        ))
+
+    def shutdown(self) -> None:
+        """Stop the worker pools, abandoning queued work"""
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
+
+    def tier_for(self, size: int) -> str:
+        """Pick the tier for a payload of size bytes"""
+        if size <= self.inline_max_bytes:
+            return "inline"
+        if size < self.process_min_bytes:
+            return "thread"
+        return "process"
+
+    def _pool(self, tier: str) -> Executor:
+        if self._threads is None or self._processes is None:
+            self.start()
+        return self._processes if tier == "process" else self._threads
+
+    async def run(self, fn: Callable[..., T], *args: Any, size: Optional[int] = None,
+                  tier: Optional[str] = None, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on the tier chosen for its payload size.
+
+        Args:
+            fn: Function to call; must be a picklable module-level function
+                for work that may reach the process pool
+            size: Payload size in bytes, when it cannot be estimated from args
+            tier: Force "inline", "thread" or "process" instead of routing by size
+        """
+        tier = tier or self.tier_for(payload_size(args) if size is None else size)
+        stats = self.stats[tier]
+        stats.submitted += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        submitted = time.time()
+        try:
+            with span(f"cpu.{getattr(fn, '__name__', 'call')}", stage="cpu", **{"cpu.tier": tier}):
+                if tier == "inline":
+                    result, started, ran = _timed_call(fn, args, kwargs)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result, started, ran = await loop.run_in_executor(
+                        self._pool(tier), partial(_timed_call, fn, args, kwargs)
+                    )
+        except BaseException:
+            stats.failed += 1
+            raise
+        else:
+            stats.completed += 1
+            wait = max(0.0, started - submitted)
+            stats.queue_wait_seconds += wait
+            stats.max_queue_wait_seconds = max(stats.max_queue_wait_seconds, wait)
+            stats.run_seconds += ran
+            return result
+        finally:
+            stats.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Queue and run-time metrics per tier"""
+        return {tier: stats.as_dict() for tier, stats in self.stats.items()}
+
+# Create a global CPU executor instance
+cpu_executor = CPUExecutor(
+    process_workers=settings.CPU_PROCESS_WORKERS,
+    thread_workers=settings.CPU_THREAD_WORKERS,
+    inline_max_bytes=settings.CPU_INLINE_MAX_BYTES,
+    process_min_bytes=settings.CPU_PROCESS_MIN_BYTES
+)
+
+registry.callback(
+    "cpu_executor_workers", "Workers per CPU executor tier", "gauge", ("tier",),
+    lambda: {(tier,): stats.workers for tier, stats in cpu_executor.stats.items()}
+)
+registry.callback(
+    "cpu_executor_in_flight", "Calls running or waiting per CPU executor tier", "gauge", ("tier",),
+    lambda: {(tier,): stats.in_flight for tier, stats in cpu_executor.stats.items()}
+)
+registry.callback(
+    "cpu_executor_queued", "Calls waiting for a free worker per CPU executor tier", "gauge", ("tier",),
+    lambda: {(tier,): stats.queued for tier, stats in cpu_executor.stats.items()}
+)
+
+async def run_cpu(fn: Callable[..., T], *args: Any, size: Optional[int] = None,
+                  tier: Optional[str] = None, **kwargs: Any) -> T:
+    """Run CPU-bound work on the shared executor; see CPUExecutor.run"""
+    return await cpu_executor.run(fn, *args, size=size, tier=tier, **kwargs)
@@ -0,0 +1,40 @@
+import importlib
+import sys
+import types
+from typing import List
+
+# Modules imported on first use instead of at startup; preload_modules imports
+# them ahead of traffic while a worker warms up
+LAZY_MODULES: List[str] = []
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that imports it on first attribute access.
+
+    The import goes through importlib, which serializes concurrent imports,
+    so threads of the CPU executor can race to use the module safely. The
+    module's attributes are then copied onto the stand-in, so later lookups
+    cost no more than on the module itself.
+    """
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Module name, imported when an attribute is first used rather than now
+
+    Use for heavy dependencies (pandas, numpy, the Snowflake connector) that
+    health checks, tooling and most requests never touch. Annotations that
+    name the module's types must not be evaluated at import time.
+    """
+    if name not in LAZY_MODULES:
+        LAZY_MODULES.append(name)
+    return sys.modules.get(name) or LazyModule(name)
+
+def preload_modules() -> List[str]:
+    """Import every lazily imported module now; returns the ones that were not loaded yet"""
+    loaded = [name for name in LAZY_MODULES if name not in sys.modules]
+    for name in loaded:
+        importlib.import_module(name)
+    return loaded
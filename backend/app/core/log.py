@@ -0,0 +1,228 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+from .metrics import registry
+from .serialization import dumps_str
+from .tracing import current_request_id, current_span
+
+logger = logging.getLogger("ruhani")
+
+REDACTED = "[redacted]"
+# Longer strings in extra fields, e.g. provider error responses, are truncated
+MAX_FIELD_LENGTH = 2000
+# Keys of logged mappings and extra fields whose values are never written
+SENSITIVE_KEYS = re.compile(
+    r"pass(word)?|secret|token|api_?key|authorization|cookie|audio|transcript|summary|email|did_document|credential_data",
+    re.IGNORECASE
+)
+# Secrets that end up inside messages, e.g. in a provider's error response or an exception
+SECRET_PATTERN = re.compile(
+    r"\b(?:gsk|sk)_[A-Za-z0-9]{8,}|\beyJ[\w-]+\.[\w-]+\.[\w-]+|(?i:bearer)\s+[\w.~+/=-]+"
+)
+# LogRecord attributes that are not extra fields
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "trace_id", "span_id", "suppressed",
+    # Added by uvicorn for its coloured console output
+    "color_message",
+}
+
+log_records_dropped = registry.counter(
+    "log_records_dropped_total", "Log records not written, by reason", ("reason",)
+)
+
+def redact(value: Any, key: Optional[str] = None) -> Any:
+    """A copy of value safe to log: sensitive keys are masked, secrets removed and long strings truncated"""
+    if key is not None and SENSITIVE_KEYS.search(key):
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return SECRET_PATTERN.sub(REDACTED, value[:MAX_FIELD_LENGTH])
+    return value
+
+def redact_params(params: Any) -> Any:
+    """Describe bound query parameters without their values, e.g. ["str(36)", 3, None]
+
+    Strings and documents may hold transcripts, emails or credentials, so only
+    their type and length are logged; numbers, booleans and None are kept.
+    """
+    def describe(value: Any) -> Any:
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        try:
+            return f"{type(value).__name__}({len(value)})"
+        except TypeError:
+            return type(value).__name__
+
+    if isinstance(params, dict):
+        return {key: REDACTED if SENSITIVE_KEYS.search(str(key)) else describe(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [describe(value) for value in params]
+    return describe(params) if params is not None else None
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the request and trace ids of the code that logged them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span.get()
+        record.request_id = current_request_id.get()
+        record.trace_id = span.trace_id if span is not None else None
+        record.span_id = span.span_id if span is not None else None
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """Sample warnings and errors logged over and over from the same line of code.
+
+    The first ``burst`` records from a call site in each ``window`` are kept;
+    after that one in ``sample_every`` is kept and reports how many were
+    skipped since the last one (``suppressed``). Lower levels pass through.
+    """
+
+    def __init__(self, burst: int, window: float, sample_every: int):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.sample_every = max(1, sample_every)
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            # [window start, records this window, skipped since the last kept record]
+            site = self._sites.get((record.pathname, record.lineno))
+            if site is None or now - site[0] >= self.window:
+                skipped = site[2] if site is not None else 0
+                site = self._sites[(record.pathname, record.lineno)] = [now, 0, 0]
+                if skipped:
+                    record.suppressed = skipped
+            site[1] += 1
+            if site[1] <= self.burst or (site[1] - self.burst) % self.sample_every == 0:
+                if site[2]:
+                    record.suppressed = site[2]
+                    site[2] = 0
+                return True
+            site[2] += 1
+        log_records_dropped.inc("rate_limited")
+        return False
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the listener thread without blocking; records are dropped when the queue is full"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Format the message and traceback here, where the arguments are still
+        # valid; the listener thread only serializes and writes
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc("queue_full")
+
+def _extras(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: redact(value, key) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with its request and trace ids and redacted extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": SECRET_PATTERN.sub(REDACTED, record.getMessage()),
+            "request_id": getattr(record, "request_id", None),
+            "trace_id": getattr(record, "trace_id", None),
+            "span_id": getattr(record, "span_id", None),
+            "source": f"{record.module}:{record.lineno}",
+        }
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        entry.update(_extras(record))
+        if record.exc_text:
+            entry["exception"] = SECRET_PATTERN.sub(REDACTED, record.exc_text)
+        try:
+            return dumps_str(entry)
+        except TypeError:
+            return dumps_str({key: value if isinstance(value, (str, int, float, type(None))) else str(value)
+                              for key, value in entry.items()})
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line format, followed by the request id and extra fields"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = SECRET_PATTERN.sub(REDACTED, super().format(record))
+        fields = {"request_id": getattr(record, "request_id", None), "suppressed": getattr(record, "suppressed", None)}
+        fields.update(_extras(record))
+        context = " ".join(f"{key}={value}" for key, value in fields.items() if value is not None)
+        return f"{line} [{context}]" if context else line
+
+class LogPipeline:
+    """Root logging through a bounded queue drained by a listener thread.
+
+    Request handlers only stamp, sample and enqueue records; formatting and
+    writing to stderr happen on the listener thread, so slow log I/O does not
+    block the event loop. uvicorn's loggers are routed through it too.
+    """
+
+    def __init__(self):
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def configure(self) -> None:
+        """Replace the root logger's handlers with the queue and start the listener"""
+        if self.listener is not None:
+            return
+        records: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        queue_handler = LogQueueHandler(records)
+        queue_handler.addFilter(RateLimitFilter(
+            settings.LOG_BURST, settings.LOG_BURST_WINDOW_SECONDS, settings.LOG_SAMPLE_EVERY
+        ))
+        queue_handler.addFilter(ContextFilter())
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(settings.LOG_LEVEL)
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+        self.listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self) -> None:
+        """Write the queued records and stop the listener"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+# Create a global log pipeline instance
+log_pipeline = LogPipeline()
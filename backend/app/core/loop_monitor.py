@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from starlette.requests import HTTPConnection
+
+from .config import settings
+from .metrics import registry
+from .tracing import route_template
+
+logger = logging.getLogger("ruhani")
+
+# Frames kept per recorded stack
+STACK_LIMIT = 40
+# Distinct (route, blocking site) pairs kept; the least costly is evicted first
+MAX_OFFENDERS = 100
+# Recent lag samples kept for the admin endpoint's percentiles
+LAG_SAMPLES = 1200
+
+APP_ROOT = str(Path(__file__).resolve().parents[1])
+
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer scheduled by the lag probe",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+event_loop_blocks = registry.counter(
+    "event_loop_blocks_total", "Times the event loop was blocked longer than the threshold", ("route",)
+)
+event_loop_blocked_seconds = registry.counter(
+    "event_loop_blocked_seconds_total", "Time the event loop spent blocked longer than the threshold", ("route",)
+)
+
+def _blocking_site(stack: traceback.StackSummary) -> str:
+    """The innermost frame in this application's code, e.g. app/api/hr.py:321 in get_insights"""
+    for frame in reversed(stack):
+        if frame.filename.startswith(APP_ROOT):
+            return f"{Path(frame.filename).relative_to(Path(APP_ROOT).parent)}:{frame.lineno} in {frame.name}"
+    if stack:
+        return f"{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}"
+    return "unknown"
+
+class LoopMonitor:
+    """Watchdog for event-loop stalls caused by blocking code in async handlers.
+
+    A probe task sleeps for ``interval`` seconds at a time and records how
+    late it wakes up as the loop's lag. A watchdog thread checks the probe's
+    heartbeat; once the loop has been stuck for ``threshold`` seconds it
+    captures the loop thread's stack, which shows the blocking call while it
+    is still running, and the route of the task being run. When the loop
+    recovers, the stall is recorded against that route and blocking site.
+
+    Requests tag their task (see tag_current_task), and tasks created while
+    handling a request inherit its tags, so blocking code in gathered
+    pipeline stages is attributed to the request too. The tags can be read
+    from other threads with task_tags, which the profiler also relies on.
+    """
+
+    def __init__(self, enabled: bool, interval: float, threshold: float):
+        self.enabled = enabled
+        self.interval = interval
+        self.threshold = threshold
+        self.lag_samples: Deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.offenders: Dict[tuple, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task_tags: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+        self._beat = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._probe: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def tag_current_task(self, **tags: Any) -> None:
+        """Tag the current task, and the tasks it creates from now on, e.g. with its route"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._task_tags.setdefault(task, {}).update(tags)
+
+    def task_tags(self, task: Optional[asyncio.Task]) -> Dict[str, Any]:
+        """Tags of a task, safe to call from other threads"""
+        if task is None:
+            return {}
+        return self._task_tags.get(task) or {}
+
+    def running_task(self) -> Optional[asyncio.Task]:
+        """The task the event loop is running right now, safe to call from other threads"""
+        return asyncio.current_task(self._loop) if self._loop is not None else None
+
+    def _task_factory(self, loop, coro, **kwargs):
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        parent = asyncio.current_task(loop)
+        tags = self._task_tags.get(parent) if parent is not None else None
+        if tags is not None:
+            # Shared with the parent, so tags set later on the request apply to its children
+            self._task_tags[task] = tags
+        return task
+
+    async def _probe_loop(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            previous, self._beat = self._beat, now
+            self.lag_samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            event_loop_lag.observe(lag)
+            if lag >= self.threshold:
+                self._record_block(lag, previous)
+
+    def _watchdog_loop(self) -> None:
+        captured_beat = None
+        while not self._stopped.wait(self.threshold / 4):
+            beat = self._beat
+            if beat == captured_beat or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            # The loop is stuck: sample what it is running now, once per stall
+            captured_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame, limit=STACK_LIMIT)
+            task = self.running_task()
+            self._pending = {
+                "beat": beat,
+                "stack": stack,
+                "task": task.get_name() if task is not None else None,
+                "route": self.task_tags(task).get("route"),
+            }
+
+    def _record_block(self, duration: float, previous_beat: float) -> None:
+        """Record a stall that just ended, with the stack the watchdog sampled during it"""
+        pending, self._pending = self._pending, None
+        if pending is not None and pending["beat"] == previous_beat:
+            stack = pending["stack"]
+            route = pending["route"] or "background"
+            site = _blocking_site(stack)
+            task = pending["task"]
+        else:
+            # Too short for the watchdog to catch it in the act
+            stack, route, site, task = None, "unknown", "unknown", None
+
+        self.blocks += 1
+        event_loop_blocks.inc(route)
+        event_loop_blocked_seconds.inc(route, amount=duration)
+        logger.warning(f"Event loop blocked for {duration * 1000:.0f} ms in {route} at {site}")
+
+        key = (route, site)
+        offender = self.offenders.get(key)
+        if offender is None:
+            if len(self.offenders) >= MAX_OFFENDERS:
+                cheapest = min(self.offenders, key=lambda k: self.offenders[k]["total_ms"])
+                del self.offenders[cheapest]
+            offender = self.offenders[key] = {
+                "route": route, "site": site, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            }
+        offender["count"] += 1
+        offender["total_ms"] += duration * 1000
+        offender["max_ms"] = max(offender["max_ms"], duration * 1000)
+        offender["last_seen"] = time.time()
+        offender["task"] = task
+        if stack is not None:
+            offender["stack"] = stack.format()
+
+    def start(self) -> None:
+        """Track task tags on the running event loop and, when enabled, start the lag probe and watchdog"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+            if self._loop.get_task_factory() is None:
+                self._loop.set_task_factory(self._task_factory)
+        if not self.enabled or self._probe is not None:
+            return
+        self._beat = time.monotonic()
+        self._probe = asyncio.ensure_future(self._probe_loop())
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watchdog_loop, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop the lag probe and watchdog and stop tracking task tags"""
+        if self._probe is not None:
+            self._stopped.set()
+            self._probe.cancel()
+            try:
+                await self._probe
+            except asyncio.CancelledError:
+                pass
+            self._probe = None
+        if self._loop is not None:
+            if self._loop.get_task_factory() == self._task_factory:
+                self._loop.set_task_factory(None)
+            self._loop = None
+
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        """Lag percentiles and the blocking sites that cost the most loop time"""
+        samples = sorted(self.lag_samples)
+
+        def percentile(q: float) -> float:
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 3) if samples else 0.0
+
+        offenders: List[Dict[str, Any]] = sorted(
+            (dict(offender) for offender in self.offenders.values()),
+            key=lambda offender: offender["total_ms"], reverse=True
+        )
+        return {
+            "enabled": self.enabled and self._probe is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "max": round(self.max_lag * 1000, 3)},
+            "blocks": self.blocks,
+            "offenders": offenders[:limit],
+        }
+
+    def reset(self) -> None:
+        """Forget recorded lag and offenders"""
+        self.lag_samples.clear()
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.offenders.clear()
+
+# Create a global loop monitor instance
+loop_monitor = LoopMonitor(
+    enabled=settings.LOOP_MONITOR_ENABLED,
+    interval=settings.LOOP_LAG_INTERVAL_SECONDS,
+    threshold=settings.LOOP_BLOCK_THRESHOLD_SECONDS
+)
+
+async def tag_request_task(connection: HTTPConnection) -> None:
+    """App-wide dependency attributing event-loop stalls to the matched route"""
+    route = route_template(connection.scope) or connection.scope["path"]
+    loop_monitor.tag_current_task(route=f"{connection.scope.get('method', 'WS')} {route}")
@@ -0,0 +1,491 @@
+import asyncio
+import bisect
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+from starlette.requests import HTTPConnection
+
+from .config import settings
+from .serialization import dumps, loads
+from .tracing import current_span, route_template, tracer
+from .tracing import background_job as traced_background_job
+
+logger = logging.getLogger("ruhani")
+
+# Prometheus client defaults, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Provider calls include LLM completions and TTS, which can take up to their 60 s timeout
+PROVIDER_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+class Metric:
+    """A metric family whose values are kept in one shard per thread.
+
+    Each thread updates only its own shard, so recording a value never takes
+    a lock; the lock is taken once per thread, when its shard is created.
+    Readers sum the shards.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Labels, Any]] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[Labels, Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def _copies(self) -> List[Dict[Labels, Any]]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() runs without releasing the GIL, so a shard is never read mid-update
+        return [shard.copy() for shard in shards]
+
+    def samples(self) -> Dict[Labels, Any]:
+        """Current value per label set, summed across threads"""
+        totals: Dict[Labels, float] = {}
+        for shard in self._copies():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. errors"""
+
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+class Gauge(Metric):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) - amount
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, e.g. latencies.
+
+    Each label set holds one count per bucket (the last is +Inf) followed by
+    the sum of observations.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _copies(self) -> List[Dict[Labels, Any]]:
+        return [{labels: list(counts) for labels, counts in shard.items()} for shard in super()._copies()]
+
+    def samples(self) -> Dict[Labels, Any]:
+        totals: Dict[Labels, List[float]] = {}
+        for shard in self._copies():
+            for labels, counts in shard.items():
+                total = totals.get(labels)
+                totals[labels] = counts if total is None else [a + b for a, b in zip(total, counts)]
+        return totals
+
+class CallbackMetric(Metric):
+    """Counter or gauge read from application state when metrics are collected"""
+
+    def __init__(self, name: str, documentation: str, metric_type: str, labelnames: Tuple[str, ...],
+                 callback: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self) -> Dict[Labels, Any]:
+        return {tuple(labels): float(value) for labels, value in self.callback().items()}
+
+def _merge(family: Dict[str, Any], samples: Iterable[Tuple[Labels, Any]]) -> None:
+    """Add samples into a collected family, summing values of the same label set"""
+    merged = family["samples"]
+    for labels, value in samples:
+        total = merged.get(labels)
+        if total is None:
+            merged[labels] = value
+        elif isinstance(value, list):
+            merged[labels] = [a + b for a, b in zip(total, value)]
+        else:
+            merged[labels] = total + value
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class MetricsRegistry:
+    """Metric families of this process, exposed in the Prometheus text format.
+
+    Under several uvicorn workers each worker only sees its own requests, so
+    when ``METRICS_DIR`` is set every worker writes a snapshot of its values
+    to ``METRICS_DIR/<pid>.json`` every ``METRICS_FLUSH_SECONDS``. A scrape,
+    whichever worker serves it, merges its live values with the other
+    workers' snapshots: counters and histograms are summed over every file
+    (so totals survive worker restarts), gauges only over running workers.
+    The directory must be emptied before the workers start.
+    """
+
+    def __init__(self, directory: Optional[str], flush_interval: float):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, Metric] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, metric_type: str, labelnames: Tuple[str, ...],
+                 callback: Callable[[], Dict[Labels, float]]) -> CallbackMetric:
+        """Register a counter or gauge whose values are read from callback() at collection time"""
+        return self.register(CallbackMetric(name, documentation, metric_type, labelnames, callback))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current values of this process, by metric name"""
+        families = {}
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.warning(f"Failed to collect metric {metric.name}: {e}")
+                continue
+            families[metric.name] = {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": samples,
+            }
+        return families
+
+    def write_snapshot(self) -> None:
+        """Write this worker's values for the other workers to merge"""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        families = {
+            name: dict(family, samples=[[list(labels), value] for labels, value in family["samples"].items()])
+            for name, family in self.snapshot().items()
+        }
+        path = self.directory / f"{os.getpid()}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_bytes(dumps({"pid": os.getpid(), "metrics": families}))
+        os.replace(temporary, path)
+
+    def _worker_snapshots(self) -> Iterable[Tuple[bool, Dict[str, Any]]]:
+        """Yield (running, metrics) for every other worker's snapshot"""
+        if self.directory is None or not self.directory.is_dir():
+            return
+        own = os.getpid()
+        for path in self.directory.glob("*.json"):
+            try:
+                snapshot = loads(path.read_bytes())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {path}: {e}")
+                continue
+            if snapshot.get("pid") != own:
+                yield _pid_alive(snapshot["pid"]), snapshot["metrics"]
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Values of every worker, merged per metric and label set"""
+        families = self.snapshot()
+        for running, metrics in self._worker_snapshots():
+            for name, family in metrics.items():
+                if family["type"] == "gauge" and not running:
+                    continue
+                if name not in families:
+                    families[name] = dict(family, samples={})
+                _merge(families[name], ((tuple(labels), value) for labels, value in family["samples"]))
+        return families
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape_help(family['help'])}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labelnames = family["labelnames"]
+            for labels, value in sorted(family["samples"].items()):
+                if family["type"] != "histogram":
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(family["buckets"]) + [math.inf], value[:-1]):
+                    cumulative += count
+                    bucket_labels = _format_labels(list(labelnames) + ["le"], list(labels) + [_format_value(bound)])
+                    lines.append(f"{name}_bucket{bucket_labels} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {_format_value(cumulative)}")
+        return "\n".join(lines) + "\n"
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                logger.warning(f"Failed to write metrics snapshot: {e}")
+
+    def start(self) -> None:
+        """Start writing snapshots when METRICS_DIR is set"""
+        if self.directory is not None and self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the snapshot writer after a final snapshot"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+            self.write_snapshot()
+
+# Create a global metrics registry instance
+registry = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_FLUSH_SECONDS)
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route, until the last body chunk is sent",
+    ("method", "route", "status")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests and WebSocket sessions being handled", ("method", "route")
+)
+provider_request_duration = registry.histogram(
+    "provider_request_duration_seconds", "Provider API latency until response headers, by operation",
+    ("provider", "operation"), PROVIDER_BUCKETS
+)
+provider_errors = registry.counter(
+    "provider_errors_total", "Provider API calls that failed, by HTTP status class or \"transport\"",
+    ("provider", "operation", "kind")
+)
+provider_timeouts = registry.counter(
+    "provider_timeouts_total", "Provider API calls that timed out", ("provider", "operation")
+)
+snowflake_query_duration = registry.histogram(
+    "snowflake_query_duration_seconds", "Snowflake statement execution time by query name", ("query",)
+)
+snowflake_query_errors = registry.counter(
+    "snowflake_query_errors_total", "Snowflake statements that failed, by query name", ("query",)
+)
+snowflake_connections_open = registry.gauge(
+    "snowflake_connections_open", "Open Snowflake connections"
+)
+background_jobs_in_flight = registry.gauge(
+    "background_jobs_in_flight", "Background jobs scheduled or running", ("job",)
+)
+
+registry.callback(
+    "trace_export_queue_depth", "Finished spans waiting for the trace exporter", "gauge", (),
+    lambda: {(): tracer.queue_depth}
+)
+registry.callback(
+    "trace_spans_dropped_total", "Spans dropped because the export queue was full", "counter", (),
+    lambda: {(): tracer.dropped}
+)
+
+# Caches reporting hit ratios, by name; see track_cache
+_caches: Dict[str, Any] = {}
+
+def track_cache(name: str, cache: Any) -> None:
+    """Report a cache's ``hits`` and ``misses`` counters (and its size, if it has one)"""
+    _caches[name] = cache
+
+registry.callback(
+    "cache_hits_total", "Cache lookups answered from the cache", "counter", ("cache",),
+    lambda: {(name,): cache.hits for name, cache in _caches.items()}
+)
+registry.callback(
+    "cache_misses_total", "Cache lookups that missed", "counter", ("cache",),
+    lambda: {(name,): cache.misses for name, cache in _caches.items()}
+)
+registry.callback(
+    "cache_entries", "Entries held in the cache", "gauge", ("cache",),
+    lambda: {(name,): len(cache) for name, cache in _caches.items() if hasattr(cache, "__len__")}
+)
+
+# Tasks running background jobs, so shutdown can wait for them
+_job_tasks: Set[asyncio.Task] = set()
+
+def background_job(func: Callable) -> Callable:
+    """Trace an async background job (see tracing.background_job) and count it while it runs"""
+    traced_func = traced_background_job(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        task = asyncio.current_task()
+        _job_tasks.add(task)
+        background_jobs_in_flight.inc(func.__name__)
+        try:
+            return await traced_func(*args, **kwargs)
+        finally:
+            background_jobs_in_flight.dec(func.__name__)
+            _job_tasks.discard(task)
+    return wrapper
+
+async def drain_background_jobs(timeout: float) -> None:
+    """Wait up to timeout seconds for running background jobs to finish"""
+    pending = {task for task in _job_tasks if task is not asyncio.current_task() and not task.done()}
+    if not pending:
+        return
+    logger.info(f"Waiting for {len(pending)} background jobs to finish")
+    _, pending = await asyncio.wait(pending, timeout=timeout)
+    if pending:
+        logger.warning(f"Abandoned {len(pending)} background jobs still running after {timeout} s")
+
+class ProviderTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records latency, errors and timeouts of a provider's API calls.
+
+    The operation label is taken from the span the call is made in, e.g.
+    "chat" for a call inside the ``groq.chat`` span.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._transport = httpx.AsyncHTTPTransport()
+
+    def _operation(self) -> str:
+        current = current_span.get()
+        if current is None:
+            return "unknown"
+        return current.name.split(".", 1)[-1]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation = self._operation()
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TimeoutException:
+            provider_timeouts.inc(self.provider, operation)
+            raise
+        except httpx.TransportError:
+            provider_errors.inc(self.provider, operation, "transport")
+            raise
+        finally:
+            provider_request_duration.observe(time.perf_counter() - started, self.provider, operation)
+        if response.status_code >= 400:
+            provider_errors.inc(self.provider, operation, f"{response.status_code // 100}xx")
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+async def track_in_flight(connection: HTTPConnection):
+    """App-wide dependency counting requests in flight per route.
+
+    Dependencies run once the route has matched, so the route template is
+    known; the count drops when the response (including a streamed body)
+    has been sent.
+    """
+    labels = (connection.scope.get("method", "WS"), route_template(connection.scope) or "unmatched")
+    http_requests_in_flight.inc(*labels)
+    try:
+        yield
+    finally:
+        http_requests_in_flight.dec(*labels)
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request by route and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        duration: Optional[float] = None
+
+        async def send_with_status(message):
+            nonlocal status, duration
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Background tasks run after this and are not part of the request's latency
+                duration = time.perf_counter() - started
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_duration.observe(
+                duration if duration is not None else time.perf_counter() - started,
+                scope["method"], route_template(scope) or "unmatched", str(status)
+            )
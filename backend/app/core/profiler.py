@@ -0,0 +1,227 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from .auth import decode_jwt_token
+from .config import settings
+from .loop_monitor import loop_monitor
+from .tracing import route_template
+
+logger = logging.getLogger("ruhani")
+
+# Request header carrying an admin JWT to profile that one request
+PROFILE_HEADER = b"x-profile"
+# Response header naming the profile recorded for a request
+PROFILE_ID_HEADER = b"x-profile-id"
+# Frames kept per sample, innermost first
+MAX_STACK_DEPTH = 128
+# Finished profiles kept in memory for the admin endpoints, and as files
+KEEP_PROFILES = 50
+KEEP_PROFILE_FILES = 500
+
+APP_ROOT = Path(__file__).resolve().parents[1]
+
+def _frame_label(code) -> str:
+    """Flame-graph frame name, e.g. get_insights (app/api/hr.py:281)"""
+    path = Path(code.co_filename)
+    try:
+        filename = str(path.relative_to(APP_ROOT.parent))
+    except ValueError:
+        filename = path.name
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+def fold_stack(frame) -> str:
+    """Render a frame and its callers as one line of folded stack, outermost first"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def render_folded(samples: Counter) -> str:
+    """Folded stacks ("frame;frame;frame count" per line), for flamegraph.pl or speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+class Profile:
+    """Stack samples taken while one request ran on the event loop"""
+
+    def __init__(self, profile_id: str, method: str, path: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.started = time.time()
+        self.duration_ms = 0.0
+        self.samples: Counter = Counter()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "started": self.started,
+            "duration_ms": round(self.duration_ms, 1),
+            "samples": sum(self.samples.values()),
+        }
+
+class SamplingProfiler:
+    """Statistical profiler for selected live requests.
+
+    While a profiled request is in flight, a background thread samples the
+    event loop thread's stack every ``interval`` seconds and credits the
+    sample to the request whose task (or a task it created) the loop is
+    running. Time spent awaiting I/O is not sampled, so a profile shows where
+    the request kept the loop busy: HR feature loops, serialization,
+    hashing and any blocking calls. Work handed to the CPU executor is not
+    included.
+
+    Requests to ``routes`` are profiled at ``rate`` (0 disables sampling),
+    or on demand with an ``X-Profile`` header carrying an admin JWT. Each
+    finished profile is written to ``directory`` as folded stacks and added
+    to a rolling aggregate over the last ``aggregate_size`` profiles.
+    """
+
+    def __init__(self, rate: float, routes: List[str], interval: float, directory: str, aggregate_size: int):
+        self.rate = rate
+        self.routes = tuple(routes)
+        self.interval = interval
+        self.directory = Path(directory)
+        self.profiles: Deque[Profile] = deque(maxlen=max(KEEP_PROFILES, aggregate_size))
+        self.aggregate_size = aggregate_size
+        self._active: Dict[str, Profile] = {}
+        self._ids = itertools.count(1)
+        self._loop_thread_id: Optional[int] = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the sampling thread; call from the event loop thread"""
+        if self._thread is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        """Stop the sampling thread"""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _sample_loop(self) -> None:
+        while not self._stopped.is_set():
+            if not self._active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            profile = loop_monitor.task_tags(loop_monitor.running_task()).get("profile")
+            if profile is None or profile.id not in self._active:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                profile.samples[fold_stack(frame)] += 1
+
+    def wants(self, scope: Dict[str, Any]) -> bool:
+        """Whether to profile a request: an admin's X-Profile header, or the sampling rate on profiled routes"""
+        header = dict(scope.get("headers") or []).get(PROFILE_HEADER)
+        if header:
+            try:
+                return decode_jwt_token(header.decode("latin-1")).get("role") == "admin"
+            except HTTPException:
+                return False
+        return self.rate > 0 and scope["path"].startswith(self.routes) and random.random() < self.rate
+
+    def begin(self, method: str, path: str) -> Profile:
+        """Start profiling the current task's request"""
+        profile = Profile(f"{int(time.time())}-{os.getpid()}-{next(self._ids)}", method, path)
+        loop_monitor.tag_current_task(profile=profile)
+        self._active[profile.id] = profile
+        self._wake.set()
+        return profile
+
+    def finish(self, profile: Profile, route: Optional[str]) -> None:
+        """Stop profiling a request, store its folded stacks and add it to the aggregate"""
+        self._active.pop(profile.id, None)
+        profile.route = route
+        profile.duration_ms = (time.time() - profile.started) * 1000
+        self.profiles.append(profile)
+        if profile.samples:
+            asyncio.get_running_loop().run_in_executor(None, self._write, profile)
+
+    def _write(self, profile: Profile) -> None:
+        """Write a profile's folded stacks to the profile directory, keeping the latest files"""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{profile.id}.folded").write_text(render_folded(profile.samples))
+            files = sorted(self.directory.glob("*.folded"), key=lambda path: path.stat().st_mtime)
+            for path in files[:-KEEP_PROFILE_FILES]:
+                path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Failed to write profile {profile.id}: {e}")
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def recent(self, limit: int = KEEP_PROFILES) -> List[Dict[str, Any]]:
+        """Summaries of the latest profiles, newest first"""
+        return [profile.summary() for profile in reversed(self.profiles)][:limit]
+
+    def aggregate(self, route: Optional[str] = None) -> Counter:
+        """Samples summed over the last aggregate_size profiles, optionally of one route"""
+        total: Counter = Counter()
+        for profile in list(self.profiles)[-self.aggregate_size:]:
+            if route is None or profile.route == route:
+                total.update(profile.samples)
+        return total
+
+# Create a global sampling profiler instance
+profiler = SamplingProfiler(
+    rate=settings.PROFILE_SAMPLE_RATE,
+    routes=settings.PROFILE_ROUTES,
+    interval=settings.PROFILE_INTERVAL_SECONDS,
+    directory=settings.PROFILE_DIR,
+    aggregate_size=settings.PROFILE_AGGREGATE_SIZE
+)
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles the HTTP requests chosen by SamplingProfiler.wants"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.wants(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.begin(scope["method"], scope["path"])
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers") or []) + [
+                    (PROFILE_ID_HEADER, profile.id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            route = route_template(scope)
+            profiler.finish(profile, f"{scope['method']} {route}" if route else None)
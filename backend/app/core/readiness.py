@@ -0,0 +1,45 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("ruhani")
+
+class Readiness:
+    """Whether this worker has finished warming up and should be sent traffic.
+
+    Startup registers the steps a worker needs before it is useful (schema
+    check, cache and pool warm-up) and returns straight away, so the server
+    accepts connections and answers liveness checks within milliseconds. The
+    steps run in the background and the worker reports ready once all of
+    them are done.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ready_after: Optional[float] = None
+        self.pending: Dict[str, str] = {}
+
+    def waiting_for(self, step: str, reason: str = "starting") -> None:
+        """Hold readiness until step is done; reason says why in the readiness report"""
+        self.pending[step] = reason
+        self.ready_after = None
+
+    def done(self, step: str) -> None:
+        self.pending.pop(step, None)
+        if not self.pending and self.ready_after is None:
+            self.ready_after = time.monotonic() - self.started
+            logger.info(f"Ready to serve after {self.ready_after * 1000:.0f} ms")
+
+    @property
+    def ready(self) -> bool:
+        return not self.pending
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "pending": dict(self.pending),
+            "ready_after_ms": round(self.ready_after * 1000, 1) if self.ready_after is not None else None,
+        }
+
+# Create a global readiness instance
+readiness = Readiness()
@@ -0,0 +1,69 @@
+from decimal import Decimal
+from typing import Any, Callable, Coroutine
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj: Any) -> Any:
+    """Serialize the types orjson does not handle natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+def dumps(data: Any) -> bytes:
+    """Serialize data to JSON bytes"""
+    return orjson.dumps(data, default=_default, option=OPTIONS)
+
+def dumps_str(data: Any) -> str:
+    """Serialize data to JSON text, e.g. for binding to PARSE_JSON(%s)"""
+    return orjson.dumps(data, default=_default, option=OPTIONS).decode()
+
+def canonical_dumps(data: Any) -> bytes:
+    """Serialize data deterministically (sorted keys, compact) so equal data always hashes the same"""
+    return orjson.dumps(data, default=_default, option=OPTIONS | orjson.OPT_SORT_KEYS)
+
+def loads(data: Any) -> Any:
+    """Parse JSON bytes or text"""
+    return orjson.loads(data)
+
+def load_variant(value: Any) -> Any:
+    """Parse a VARIANT/OBJECT column value, which the connector returns as JSON text"""
+    if isinstance(value, (str, bytes, bytearray, memoryview)):
+        return orjson.loads(value)
+    return value
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class ORJSONRequest(Request):
+    """Request whose JSON body is parsed with orjson"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+class ORJSONRoute(APIRoute):
+    """Route that parses JSON request bodies with orjson"""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def orjson_handler(request: Request) -> Response:
+            return await handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_handler
@@ -0,0 +1,428 @@
+import asyncio
+import functools
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from .config import settings
+from .serialization import dumps
+
+logger = logging.getLogger("ruhani")
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT, PRODUCER, CONSUMER = 1, 2, 3, 4, 5
+# OTLP status codes
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+INVALID_TRACE_ID = "0" * 32
+INVALID_SPAN_ID = "0" * 16
+# Caller-supplied X-Request-ID values kept as the request id; others are replaced
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Finished spans waiting for the exporter thread; spans are dropped when it is full
+EXPORT_QUEUE_SIZE = 10000
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 2.0
+
+class Span:
+    """A timed operation within a trace, recorded in the OpenTelemetry data model"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = INTERNAL,
+                 stage: Optional[str] = None, sampled: bool = True, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.stage = stage
+        self.sampled = sampled
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._started = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_exception(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    @property
+    def elapsed_ms(self) -> float:
+        """Time since the span started"""
+        return (time.perf_counter() - self._started) * 1000
+
+    def end(self) -> None:
+        """Record the end time; later calls keep the first end time"""
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.duration_ms = self.elapsed_ms
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value identifying this span"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Render the span as an OTLP/JSON span"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message} if self.status_message else {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Encode attributes as OTLP key/value pairs"""
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": typed})
+    return encoded
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Parse a W3C traceparent header into (trace_id, parent_span_id, sampled), or None if invalid"""
+    match = TRACEPARENT_PATTERN.match((header or "").strip().lower())
+    if not match or match.group(1) == INVALID_TRACE_ID or match.group(2) == INVALID_SPAN_ID:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+def parse_request_id(header: Optional[bytes]) -> Optional[str]:
+    """A caller's X-Request-ID if it is safe to log and echo back, else None"""
+    value = (header or b"").decode("latin-1").strip()
+    return value if REQUEST_ID_PATTERN.match(value) else None
+
+class StageTimings:
+    """Per-stage time spent while handling one request, for the Server-Timing header.
+
+    Time is summed per stage across spans; a span nested inside another span
+    of the same stage is not counted again. Concurrent stages overlap, so the
+    stages may add up to more than the total.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, duration_ms: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + duration_ms
+
+    def header(self, total_ms: float) -> str:
+        entries = [f"{stage};dur={duration:.1f}" for stage, duration in self.stages.items()]
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+_active_stage: ContextVar[Optional[str]] = ContextVar("active_stage", default=None)
+_timings: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+class SpanExporter:
+    """Destination for finished spans"""
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+def otlp_payload(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """Wrap spans in an OTLP/JSON ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": "ruhani"}, "spans": [span.to_otlp() for span in spans]}],
+        }]
+    }
+
+class FileSpanExporter(SpanExporter):
+    """Append each batch to a file as one OTLP/JSON document per line"""
+
+    def __init__(self, path: str, service_name: str):
+        self.path = Path(path)
+        self.service_name = service_name
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        with self.path.open("ab") as file:
+            file.write(dumps(otlp_payload(spans, self.service_name)) + b"\n")
+
+class OTLPHttpExporter(SpanExporter):
+    """Send batches to an OTLP/HTTP collector as JSON"""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.client = httpx.Client(timeout=5.0)
+
+    def export(self, spans: List[Span]) -> None:
+        response = self.client.post(
+            self.url, content=dumps(otlp_payload(spans, self.service_name)),
+            headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+
+    def shutdown(self) -> None:
+        self.client.close()
+
+SPAN_EXPORTERS: Dict[str, Callable[[], SpanExporter]] = {
+    "file": lambda: FileSpanExporter(settings.TRACE_FILE_PATH, settings.TRACE_SERVICE_NAME),
+    "otlp": lambda: OTLPHttpExporter(settings.OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME),
+}
+
+class Tracer:
+    """Creates spans and exports the sampled ones in batches from a background thread.
+
+    Spans are always timed, so Server-Timing works without an exporter; with
+    ``TRACE_EXPORTER`` unset nothing is queued for export.
+    """
+
+    def __init__(self, exporter_name: Optional[str]):
+        self.exporter_name = exporter_name
+        self.exporter: Optional[SpanExporter] = None
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Create the configured exporter and start the export thread"""
+        if not self.exporter_name or self._thread is not None:
+            return
+        if self.exporter_name not in SPAN_EXPORTERS:
+            raise ValueError(f"Unknown trace exporter: {self.exporter_name}")
+        self.exporter = SPAN_EXPORTERS[self.exporter_name]()
+        self._thread = threading.Thread(target=self._export_loop, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        """Flush queued spans and stop the export thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.exporter.shutdown()
+
+    @property
+    def queue_depth(self) -> int:
+        """Finished spans waiting to be exported"""
+        return self._queue.qsize()
+
+    def _export_loop(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+        running = True
+        while running:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if span is None:
+                    running = False
+                else:
+                    batch.append(span)
+            except queue.Empty:
+                pass
+            if batch and (not running or len(batch) >= EXPORT_BATCH_SIZE or time.monotonic() >= deadline):
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning(f"Failed to export {len(batch)} spans: {e}")
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+
+    def _finish(self, span: Span) -> None:
+        span.end()
+        if self._thread is not None and span.sampled:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    @contextmanager
+    def span(self, name: str, stage: Optional[str] = None, kind: int = INTERNAL,
+             parent: Optional[Tuple[str, str, bool]] = None, **attributes: Any) -> Iterator[Span]:
+        """Time a block as a child of the current span (or of ``parent``, a parsed traceparent).
+
+        Args:
+            name: Span name, e.g. "groq.chat"
+            stage: Server-Timing stage the span's time counts towards
+            kind: OTLP span kind
+            parent: (trace_id, span_id, sampled) of a remote parent
+        """
+        current = current_span.get()
+        if parent:
+            trace_id, parent_id, sampled = parent
+        elif current:
+            trace_id, parent_id, sampled = current.trace_id, current.span_id, current.sampled
+        else:
+            trace_id, parent_id, sampled = os.urandom(16).hex(), None, True
+        span = Span(name, trace_id, parent_id, kind=kind, stage=stage, sampled=sampled, attributes=attributes)
+
+        outer_stage = _active_stage.get()
+        counted = stage is not None and stage != outer_stage
+        span_token = current_span.set(span)
+        stage_token = _active_stage.set(stage) if counted else None
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            if stage_token is not None:
+                _active_stage.reset(stage_token)
+            current_span.reset(span_token)
+            self._finish(span)
+            timings = _timings.get()
+            if counted and timings is not None:
+                timings.add(stage, span.duration_ms)
+
+# Create a global tracer instance
+tracer = Tracer(settings.TRACE_EXPORTER)
+
+def span(name: str, stage: Optional[str] = None, kind: int = INTERNAL, **attributes: Any):
+    """Time a block as a span of the current trace; see Tracer.span"""
+    return tracer.span(name, stage=stage, kind=kind, **attributes)
+
+def annotate(**attributes: Any) -> None:
+    """Set attributes on the current span, if any"""
+    current = current_span.get()
+    if current:
+        for key, value in attributes.items():
+            current.set_attribute(key, value)
+
+def _check_result(span: Span, result: Any) -> Any:
+    """Mark the span failed when a call returns this codebase's {"error": ...} result"""
+    if isinstance(result, dict) and "error" in result:
+        span.status = STATUS_ERROR
+        span.status_message = str(result["error"])
+    return result
+
+def traced(name: Optional[str] = None, stage: Optional[str] = None, kind: int = INTERNAL):
+    """Decorator that records each call of a sync or async function as a span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name, stage=stage, kind=kind) as call_span:
+                    return _check_result(call_span, await func(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name, stage=stage, kind=kind) as call_span:
+                return _check_result(call_span, func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def background_job(func: Callable) -> Callable:
+    """Trace an async background job as its own span, linked to the request that scheduled it"""
+    return traced(f"job.{func.__name__}", kind=CONSUMER)(func)
+
+async def inject_traceparent(request: httpx.Request) -> None:
+    """httpx request hook that propagates the current trace to outgoing calls"""
+    current = current_span.get()
+    if current:
+        request.headers["traceparent"] = current.traceparent
+
+# Pass as httpx.AsyncClient(event_hooks=HTTPX_EVENT_HOOKS) in provider clients
+HTTPX_EVENT_HOOKS = {"request": [inject_traceparent]}
+
+def route_template(scope: Dict[str, Any]) -> Optional[str]:
+    """Rebuild the matched route's template, e.g. /employee/credentials/{credential_id}
+
+    Path segments holding a path parameter's value are replaced by its name.
+    Returns None when no route matched.
+    """
+    if "endpoint" not in scope:
+        return None
+    params = {str(value): name for name, value in (scope.get("path_params") or {}).items()}
+    segments = [
+        "{" + params.pop(segment) + "}" if segment in params else segment
+        for segment in scope["path"].split("/")
+    ]
+    return "/".join(segments)
+
+class TracingMiddleware:
+    """ASGI middleware that traces every HTTP request and WebSocket session.
+
+    The server span continues the caller's trace when a valid ``traceparent``
+    header is sent. HTTP responses carry the span's ``traceparent``, a
+    ``Server-Timing`` header with the time spent in each stage and an
+    ``X-Request-ID``: the caller's, or the server span's id. Log records
+    carry the same request id (see core/log.py).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        method = scope.get("method", "WS")
+        timings = StageTimings()
+        timings_token = _timings.set(timings)
+        try:
+            with tracer.span(f"{method} {scope['path']}", kind=SERVER, parent=parent) as server_span:
+                server_span.set_attribute("http.method", method)
+                server_span.set_attribute("http.target", scope["path"])
+                request_id = parse_request_id(headers.get(b"x-request-id")) or server_span.span_id
+                server_span.set_attribute("http.request_id", request_id)
+                request_id_token = current_request_id.set(request_id)
+
+                async def send_with_timing(message):
+                    if message["type"] == "http.response.start":
+                        server_span.set_attribute("http.status_code", message["status"])
+                        message["headers"] = list(message.get("headers") or []) + [
+                            (b"server-timing", timings.header(server_span.elapsed_ms).encode("latin-1")),
+                            (b"traceparent", server_span.traceparent.encode("latin-1")),
+                            (b"x-request-id", request_id.encode("latin-1")),
+                        ]
+                    await send(message)
+                    if message["type"] == "http.response.body" and not message.get("more_body", False):
+                        # Background tasks run after this; they get spans of their own
+                        server_span.end()
+
+                try:
+                    await self.app(scope, receive, send_with_timing)
+                finally:
+                    # Name the span after the route template so it groups across requests
+                    route = route_template(scope)
+                    server_span.name = f"{method} {route}" if route else method
+                    server_span.set_attribute("http.route", route)
+                    current_request_id.reset(request_id_token)
+        finally:
+            _timings.reset(timings_token)
@@ -10,10 +10,16 @@ import random
 
 logger = logging.getLogger("ruhani")
 
-def init_snowflake_tables() -> bool:
-    """Initialize Snowflake tables if they don't exist"""
+def init_snowflake_tables(client: Optional[SnowflakeClient] = None) -> bool:
+    """Initialize Snowflake tables if they don't exist
+
+    This is the baseline schema migration (see migrations.py); later changes
+    are separate migrations rather than edits to these statements.
+    """
+    owns_client = client is None
     try:
-        client = SnowflakeClient()
+        if owns_client:
+            client = SnowflakeClient()
         
         # Create employees table with DID support
         employee_result = client.execute("""
@@ -72,7 +78,24 @@ def init_snowflake_tables() -> bool:
             logger.error("Failed to create hr_insights table")
             return False
             
-        # Create credentials table to store verifiable credentials
+        # Create credential_bodies table to store full credential documents,
+        # compressed and deduplicated by the hash of their canonical JSON
+        body_result = client.execute("""
+        CREATE TABLE IF NOT EXISTS credential_bodies (
+            content_hash VARCHAR(64) PRIMARY KEY,
+            body BINARY NOT NULL,
+            compression VARCHAR(10) NOT NULL,
+            size_bytes INTEGER,
+            created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """)
+        
+        if not body_result:
+            logger.error("Failed to create credential_bodies table")
+            return False
+            
+        # Create credentials table with the fields queries filter and display;
+        # the document itself is in credential_bodies
         credential_result = client.execute("""
         CREATE TABLE IF NOT EXISTS credentials (
             credential_id VARCHAR(255) PRIMARY KEY,
@@ -81,7 +104,7 @@ def init_snowflake_tables() -> bool:
             subject_did VARCHAR(255) NOT NULL,
             issuance_date TIMESTAMP_NTZ NOT NULL,
             expiration_date TIMESTAMP_NTZ,
-            credential_data VARIANT NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
             revoked BOOLEAN DEFAULT FALSE,
             revocation_date TIMESTAMP_NTZ,
             created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
@@ -116,7 +139,8 @@ def init_snowflake_tables() -> bool:
             return False
         
         logger.info("Snowflake tables initialized successfully")
-        client.close()
+        if owns_client:
+            client.close()
         return True
     except Exception as e:
         logger.error(f"Error initializing Snowflake tables: {e}")
@@ -289,11 +313,12 @@ def seed_sample_data() -> bool:
         logger.info("Skipping sample data seeding in production environment")
         return True
 
-# Function to run during application startup
 def init_db() -> bool:
-    """Initialize the database with required tables and sample data"""
+    """Migrate the database to the latest schema version and seed sample data"""
+    from .migrations import migrate
+
     try:
-        tables_success = init_snowflake_tables()
+        tables_success = migrate()
         if not tables_success:
             return False
             
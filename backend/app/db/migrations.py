@@ -0,0 +1,162 @@
+"""Versioned Snowflake schema migrations.
+
+Each migration runs once and is recorded in the schema_version table, so
+checking whether a database is up to date takes a single query. Migrations
+are run out-of-band, before new code is deployed, not by the app at startup.
+Run from the backend directory:
+
+    python -m app.db.migrations [--status] [--dry-run] [--no-seed]
+"""
+import argparse
+import logging
+import sys
+from typing import Callable, List, Optional, Tuple
+
+from ..core.config import settings
+from .init_snowflake import init_snowflake_tables, seed_sample_data
+from .snowflake_client import SnowflakeClient
+
+logger = logging.getLogger("ruhani")
+
+def create_organization_table(client: SnowflakeClient) -> bool:
+    """Organization row holding the DID that issues credentials (see services/identity.py)"""
+    return bool(client.execute("""
+    CREATE TABLE IF NOT EXISTS organization (
+        id VARCHAR(36) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        did VARCHAR(255),
+        did_document VARIANT,
+        created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+    )
+    """))
+
+def split_credential_documents(client: SnowflakeClient) -> bool:
+    """Move documents of credentials created before credential_bodies into it; a no-op on new databases"""
+    from .split_credentials import split_credentials
+
+    try:
+        split_credentials()
+        return True
+    except Exception as e:
+        logger.error(f"Error splitting credential documents: {e}")
+        return False
+
+def add_session_status(client: SnowflakeClient) -> bool:
+    """Sessions answered with a fallback response are "pending" until completed in the background"""
+    return bool(client.execute(
+        "ALTER TABLE sessions ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'complete'"
+    ))
+
+def add_session_response_audio(client: SnowflakeClient) -> bool:
+    """Speech of responses whose TTS ran out of time, generated when the session is completed"""
+    return bool(client.execute(
+        "ALTER TABLE sessions ADD COLUMN IF NOT EXISTS response_audio BINARY"
+    ))
+
+# (version, description, migration) in the order they are applied. Append new
+# migrations with the next version; never edit or reorder applied ones.
+# Databases created before schema_version existed start at version 0, so every
+# migration must be safe to run against a schema that already has its changes.
+MIGRATIONS: List[Tuple[int, str, Callable[[SnowflakeClient], bool]]] = [
+    (1, "baseline tables", init_snowflake_tables),
+    (2, "organization table", create_organization_table),
+    (3, "split credential documents into credential_bodies", split_credential_documents),
+    (4, "session completion status", add_session_status),
+    (5, "session response audio", add_session_response_audio),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(client: SnowflakeClient) -> Optional[int]:
+    """The database's schema version, 0 before any migration, or None if it cannot be read"""
+    result = client.execute("SELECT MAX(version) FROM schema_version", name="schema_version")
+    if result is None:
+        return None
+    row = result.fetchone()
+    return (row[0] or 0) if row else 0
+
+def check_schema() -> Optional[int]:
+    """Read the schema version with a new connection; one query, for the readiness check"""
+    try:
+        client = SnowflakeClient()
+    except Exception:
+        return None
+    try:
+        return schema_version(client)
+    finally:
+        client.close()
+
+def pending_migrations(version: int) -> List[Tuple[int, str, Callable[[SnowflakeClient], bool]]]:
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+def migrate(dry_run: bool = False) -> bool:
+    """Apply every migration newer than the database's schema version, in order"""
+    client = SnowflakeClient()
+    try:
+        if not dry_run and not client.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """):
+            logger.error("Failed to create schema_version table")
+            return False
+
+        version = schema_version(client)
+        if version is None:
+            if not dry_run:
+                return False
+            version = 0
+        pending = pending_migrations(version)
+        if not pending:
+            logger.info(f"Schema is up to date at version {version}")
+            return True
+
+        for number, description, apply in pending:
+            if dry_run:
+                logger.info(f"Would apply migration {number}: {description}")
+                continue
+            logger.info(f"Applying migration {number}: {description}")
+            # Snowflake commits DDL immediately, so a failed migration is not
+            # rolled back; it is retried, from where it stopped, on the next run
+            if not apply(client) or not client.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)", (number, description)
+            ):
+                logger.error(f"Migration {number} failed; schema left at version {version}")
+                return False
+            version = number
+        if not dry_run:
+            logger.info(f"Schema migrated to version {version}")
+        return True
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--status", action="store_true", help="Report the schema version and pending migrations")
+    parser.add_argument("--dry-run", action="store_true", help="List the migrations that would be applied")
+    parser.add_argument("--seed", action=argparse.BooleanOptionalAction, default=settings.SEED_SAMPLE_DATA,
+                        help="Seed sample data into an empty database after migrating, except in production "
+                             "(default: SEED_SAMPLE_DATA)")
+    args = parser.parse_args()
+
+    if args.status:
+        version = check_schema()
+        if version is None:
+            logger.error("Could not read the schema version")
+            sys.exit(1)
+        logger.info(f"Schema version {version}, latest {LATEST_VERSION}")
+        for number, description, _ in pending_migrations(version):
+            logger.info(f"Pending migration {number}: {description}")
+        sys.exit(0)
+
+    if not migrate(dry_run=args.dry_run):
+        sys.exit(1)
+    if args.seed and not args.dry_run and not seed_sample_data():
+        sys.exit(1)
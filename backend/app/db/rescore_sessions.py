@@ -0,0 +1,79 @@
+"""Re-score the risk level of stored sessions with the current risk lexicon.
+
+Only transcript sessions without a credential are re-scored, and a level is
+only ever raised: stored levels combine the classifier model with the
+lexicon, sentiment logs have no transcript, and credential-backed sessions
+must keep the level their signed credential states.
+
+Run from the backend directory:
+
+    python -m app.db.rescore_sessions [--dry-run]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add the parent directory to sys.path to allow imports
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.db.snowflake_client import SnowflakeClient
+from app.services.groq import RISK_LEVELS
+from app.services.risk_scoring import score_batch
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("ruhani")
+
+# Rows updated per UPDATE statement
+UPDATE_BATCH_SIZE = 1000
+
+# Transcript sessions (sentiment logs have no summary hash) whose level no credential attests to
+RESCORE_QUERY = """SELECT session_id, summary, risk_level FROM sessions
+                   WHERE summary IS NOT NULL AND summary_hash IS NOT NULL AND credential_id IS NULL"""
+
+def update_risk_levels(client: SnowflakeClient, changes: list) -> None:
+    """Write (session_id, risk_level) pairs back in a few multi-row UPDATEs"""
+    for start in range(0, len(changes), UPDATE_BATCH_SIZE):
+        chunk = changes[start:start + UPDATE_BATCH_SIZE]
+        values = ", ".join(["(%s, %s)"] * len(chunk))
+        params = tuple(value for change in chunk for value in change)
+        client.execute(
+            f"""UPDATE sessions s SET risk_level = v.risk_level
+                FROM (SELECT column1 AS session_id, column2 AS risk_level FROM VALUES {values}) v
+                WHERE s.session_id = v.session_id""",
+            params
+        )
+
+def rescore_sessions(dry_run: bool = False) -> int:
+    """Score the summaries of RESCORE_QUERY's sessions and raise levels the lexicon now rates higher.
+
+    Sessions are read as Arrow batches and each batch is scored in one call,
+    so memory use is bounded by the batch size. Returns the number of
+    sessions whose risk level changed.
+    """
+    reader = SnowflakeClient()
+    writer = SnowflakeClient()
+    scanned = changed = 0
+    severity = {level: rank for rank, level in enumerate(RISK_LEVELS)}
+    for batch in reader.iter_pandas_batches(RESCORE_QUERY, name="rescore_sessions"):
+        scores = score_batch(batch["summary"])
+        new_levels = scores["risk_level"].to_numpy()
+        old_rank = batch["risk_level"].map(severity).fillna(-1).to_numpy()
+        differs = scores["risk_level"].map(severity).to_numpy() > old_rank
+        changes = list(zip(batch["session_id"].to_numpy()[differs].tolist(), new_levels[differs].tolist()))
+        scanned += len(batch)
+        changed += len(changes)
+        if changes and not dry_run:
+            update_risk_levels(writer, changes)
+        logger.info(f"Scored {scanned} sessions, {changed} risk levels changed")
+    return changed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without updating sessions")
+    args = parser.parse_args()
+    rescore_sessions(dry_run=args.dry_run)
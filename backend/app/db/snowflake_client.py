@@ -1,55 +1,176 @@
 import logging
-import snowflake.connector
-from typing import List, Dict, Any, Optional, Union, Tuple
+import re
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional, Union, Tuple, TYPE_CHECKING
 
 from ..core.config import settings
+from ..core.imports import lazy_import
+from ..core.log import redact_params
+from ..core.serialization import dumps_str
+from ..core.metrics import snowflake_connections_open, snowflake_query_duration, snowflake_query_errors
+from ..core.tracing import CLIENT, STATUS_ERROR, span
+
+if TYPE_CHECKING:
+    import pandas
+    from snowflake.connector.cursor import SnowflakeCursor
+
+connector = lazy_import("snowflake.connector")
 
 logger = logging.getLogger("ruhani")
 
+def bind_params(params: Optional[Any]) -> Optional[Any]:
+    """Serialize dict and list parameters to JSON text so they bind to PARSE_JSON(%s) / VARIANT
+
+    Tuples are left alone, since the connector expands them for IN (%s).
+    """
+    if isinstance(params, dict):
+        return {key: dumps_str(value) if isinstance(value, (dict, list)) else value for key, value in params.items()}
+    if isinstance(params, (tuple, list)):
+        return tuple(dumps_str(value) if isinstance(value, (dict, list)) else value for value in params)
+    return params
+
+# Longest statement text recorded on a query span, and in an error log record
+MAX_TRACED_STATEMENT = 2000
+MAX_LOGGED_STATEMENT = 500
+
+# Statement verb and the first table it names, e.g. "SELECT ... FROM employees"
+QUERY_NAME_PATTERN = re.compile(
+    r"^\s*(\w+)(?:(?:(?<=UPDATE)\s+|\b.*?\b(?:FROM|INTO|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?)(\w+))?",
+    re.IGNORECASE | re.DOTALL
+)
+
+@lru_cache(maxsize=1024)
+def query_name(query: str) -> str:
+    """Default metrics name for a statement: its verb and first table, e.g. select_employees"""
+    match = QUERY_NAME_PATTERN.match(query)
+    if not match:
+        return "other"
+    verb, table = match.groups()
+    return f"{verb}_{table}".lower() if table else verb.lower()
+
+@contextmanager
+def _query_span(query: str, name: Optional[str] = None):
+    """Span and duration metric for one Snowflake statement; callers tag it with the query id once it has run"""
+    name = name or query_name(query)
+    started = time.perf_counter()
+    with span(
+        "snowflake.query", stage="snowflake", kind=CLIENT,
+        **{"db.system": "snowflake", "db.query.name": name,
+           "db.statement": " ".join(query.split())[:MAX_TRACED_STATEMENT]}
+    ) as query_span:
+        try:
+            yield query_span
+        except BaseException:
+            query_span.status = STATUS_ERROR
+            raise
+        finally:
+            snowflake_query_duration.observe(time.perf_counter() - started, name)
+            if query_span.status == STATUS_ERROR:
+                snowflake_query_errors.inc(name)
+
 class SnowflakeClient:
     def __init__(self):
         try:
-            self.conn = snowflake.connector.connect(
-                user=settings.SNOWFLAKE_USER,
-                password=settings.SNOWFLAKE_PASSWORD,
-                account=settings.SNOWFLAKE_ACCOUNT,
-                warehouse=settings.SNOWFLAKE_WAREHOUSE,
-                database=settings.SNOWFLAKE_DATABASE,
-                schema=settings.SNOWFLAKE_SCHEMA,
-                role=settings.SNOWFLAKE_ROLE
-            )
+            with span("snowflake.connect", stage="snowflake_connect", kind=CLIENT, **{"db.system": "snowflake"}):
+                self.conn = connector.connect(
+                    user=settings.SNOWFLAKE_USER,
+                    password=settings.SNOWFLAKE_PASSWORD,
+                    account=settings.SNOWFLAKE_ACCOUNT,
+                    warehouse=settings.SNOWFLAKE_WAREHOUSE,
+                    database=settings.SNOWFLAKE_DATABASE,
+                    schema=settings.SNOWFLAKE_SCHEMA,
+                    role=settings.SNOWFLAKE_ROLE
+                )
+            self._counted = True
+            snowflake_connections_open.inc()
             logger.info("Successfully connected to Snowflake")
         except Exception as e:
             logger.error(f"Failed to connect to Snowflake: {e}")
             raise
     
-    def execute(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[snowflake.connector.cursor.SnowflakeCursor]:
-        """Execute a single SQL query and return the cursor"""
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, params)
-            return cursor
-        except Exception as e:
-            logger.error(f"Error executing query: {e}\nQuery: {query}\nParams: {params}")
-            return None
+    def execute(self, query: str, params: Optional[Dict[str, Any]] = None,
+                name: Optional[str] = None) -> Optional["SnowflakeCursor"]:
+        """Execute a single SQL query and return the cursor; name labels its duration metric"""
+        with _query_span(query, name) as query_span:
+            try:
+                cursor = self.conn.cursor()
+                cursor.execute(query, bind_params(params))
+                query_span.set_attribute("snowflake.query_id", cursor.sfqid)
+                query_span.set_attribute("db.rowcount", cursor.rowcount)
+                return cursor
+            except Exception as e:
+                query_span.record_exception(e)
+                logger.error(
+                    f"Error executing {name or query_name(query)} query: {e}",
+                    extra={"statement": " ".join(query.split())[:MAX_LOGGED_STATEMENT], "params": redact_params(params)}
+                )
+                return None
     
+    def iter_batches(self, query: str, params: Optional[Any] = None, batch_size: int = 1000,
+                     name: Optional[str] = None) -> Iterator[List[Tuple]]:
+        """Execute a query and yield its rows in batches of at most batch_size
+
+        Rows are pulled from the cursor with fetchmany, so only one batch is
+        held in memory at a time regardless of the size of the result.
+        """
+        cursor = self.conn.cursor()
+        try:
+            with _query_span(query, name) as query_span:
+                cursor.execute(query, bind_params(params))
+                query_span.set_attribute("snowflake.query_id", cursor.sfqid)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def iter_pandas_batches(self, query: str, params: Optional[Any] = None,
+                            name: Optional[str] = None) -> Iterator["pandas.DataFrame"]:
+        """Execute a query and yield its result as one pandas DataFrame per Arrow batch
+
+        Column names are lower-cased so callers can use the names from the query.
+        """
+        cursor = self.conn.cursor()
+        try:
+            with _query_span(query, name) as query_span:
+                cursor.execute(query, bind_params(params))
+                query_span.set_attribute("snowflake.query_id", cursor.sfqid)
+            for frame in cursor.fetch_pandas_batches():
+                frame.columns = [column.lower() for column in frame.columns]
+                yield frame
+        finally:
+            cursor.close()
+
     def execute_many(self, queries: List[str]) -> List[Tuple[bool, Optional[str]]]:
         """Execute multiple SQL queries and return success status for each"""
         results = []
         for query in queries:
-            try:
-                cursor = self.conn.cursor()
-                cursor.execute(query)
-                results.append((True, None))
-            except Exception as e:
-                error_msg = f"Error executing query: {e}\nQuery: {query}"
-                logger.error(error_msg)
-                results.append((False, error_msg))
+            with _query_span(query) as query_span:
+                try:
+                    cursor = self.conn.cursor()
+                    cursor.execute(query)
+                    query_span.set_attribute("snowflake.query_id", cursor.sfqid)
+                    results.append((True, None))
+                except Exception as e:
+                    query_span.record_exception(e)
+                    error_msg = f"Error executing query: {e}\nQuery: {query}"
+                    logger.error(
+                        f"Error executing {query_name(query)} query: {e}",
+                        extra={"statement": " ".join(query.split())[:MAX_LOGGED_STATEMENT]}
+                    )
+                    results.append((False, error_msg))
         return results
     
     def close(self) -> None:
         """Close the Snowflake connection"""
         try:
+            if getattr(self, "_counted", False):
+                self._counted = False
+                snowflake_connections_open.dec()
             if self.conn:
                 self.conn.close()
                 logger.info("Snowflake connection closed")
@@ -0,0 +1,105 @@
+"""Move credential documents out of the credentials table into credential_bodies.
+
+Run from the backend directory:
+
+    python -m app.db.split_credentials [--dry-run] [--keep-column]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add the parent directory to sys.path to allow imports
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.core.executor import b64encode_text
+from app.core.serialization import load_variant
+from app.db.init_snowflake import init_snowflake_tables
+from app.db.snowflake_client import SnowflakeClient
+from app.services.credential_store import COMPRESSION, pack_credential
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("ruhani")
+
+# Rows written per MERGE / UPDATE statement
+WRITE_BATCH_SIZE = 500
+
+def write_batch(client: SnowflakeClient, rows: list) -> None:
+    """Store (credential_id, content_hash, body) rows: bodies once per hash, then the hot rows' hashes"""
+    bodies = {content_hash: body for _, content_hash, body in rows}
+    values = ", ".join(["(%s, TO_BINARY(%s, 'BASE64'), %s, %s)"] * len(bodies))
+    client.execute(
+        f"""MERGE INTO credential_bodies b
+            USING (SELECT column1 AS content_hash, column2 AS body, column3 AS compression, column4 AS size_bytes
+                   FROM VALUES {values}) n
+            ON b.content_hash = n.content_hash
+            WHEN NOT MATCHED THEN INSERT (content_hash, body, compression, size_bytes)
+            VALUES (n.content_hash, n.body, n.compression, n.size_bytes)""",
+        tuple(value for content_hash, body in bodies.items()
+              for value in (content_hash, b64encode_text(body), COMPRESSION, len(body)))
+    )
+    values = ", ".join(["(%s, %s)"] * len(rows))
+    client.execute(
+        f"""UPDATE credentials c SET content_hash = v.content_hash
+            FROM (SELECT column1 AS credential_id, column2 AS content_hash FROM VALUES {values}) v
+            WHERE c.credential_id = v.credential_id""",
+        tuple(value for credential_id, content_hash, _ in rows for value in (credential_id, content_hash))
+    )
+
+def split_credentials(dry_run: bool = False, keep_column: bool = False) -> int:
+    """Compress every credential document into credential_bodies and record its content hash.
+
+    Only rows without a content hash are read, so an interrupted run can be
+    resumed. Unless keep_column is set, the credential_data column is dropped
+    once every row has been moved. Returns the number of credentials moved.
+    """
+    if not dry_run and not init_snowflake_tables():
+        raise RuntimeError("Failed to create the credential tables")
+    reader = SnowflakeClient()
+    writer = SnowflakeClient()
+    columns = reader.execute("SHOW COLUMNS LIKE 'CREDENTIAL_DATA' IN TABLE credentials")
+    if not columns or not columns.fetchall():
+        logger.info("credentials.credential_data does not exist, nothing to move")
+        return 0
+    if not dry_run:
+        writer.execute("ALTER TABLE credentials ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+        # New credentials no longer write credential_data
+        writer.execute("ALTER TABLE credentials ALTER COLUMN credential_data DROP NOT NULL")
+
+    moved = raw_bytes = stored_bytes = 0
+    hashes = set()
+    query = "SELECT credential_id, credential_data FROM credentials"
+    if not dry_run:
+        query += " WHERE content_hash IS NULL"
+    for rows in reader.iter_batches(query, batch_size=WRITE_BATCH_SIZE):
+        batch = []
+        for credential_id, credential_data in rows:
+            document = load_variant(credential_data)
+            content_hash, body = pack_credential(document)
+            raw_bytes += len(credential_data) if isinstance(credential_data, str) else 0
+            if content_hash not in hashes:
+                hashes.add(content_hash)
+                stored_bytes += len(body)
+            batch.append((credential_id, content_hash, body))
+        if not dry_run:
+            write_batch(writer, batch)
+        moved += len(batch)
+        logger.info(f"Moved {moved} credentials ({len(hashes)} distinct bodies)")
+
+    logger.info(f"Credential documents: {raw_bytes} bytes as VARIANT text, {stored_bytes} bytes compressed and deduplicated")
+    if not dry_run and not keep_column:
+        writer.execute("ALTER TABLE credentials ALTER COLUMN content_hash SET NOT NULL")
+        writer.execute("ALTER TABLE credentials DROP COLUMN credential_data")
+        logger.info("Dropped credentials.credential_data")
+    return moved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Report sizes without writing anything")
+    parser.add_argument("--keep-column", action="store_true", help="Keep credentials.credential_data after moving")
+    args = parser.parse_args()
+    split_credentials(dry_run=args.dry_run, keep_column=args.keep_column)
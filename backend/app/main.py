@@ -1,18 +1,44 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.datastructures import Default
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
+from typing import Optional
 
-from .api import employee, hr
-from .db.init_snowflake import init_db
+from .api import admin, employee, hr
+from .db.migrations import LATEST_VERSION, check_schema
+from .core.executor import cpu_executor
+from .core.imports import preload_modules
+from .core.log import log_pipeline
+from .core.loop_monitor import loop_monitor, tag_request_task
+from .core.admission import AdmissionMiddleware
+from .core.config import settings
+from .core.metrics import CONTENT_TYPE, MetricsMiddleware, drain_background_jobs, registry, track_in_flight
+from .core.profiler import ProfilingMiddleware, profiler
+from .core.readiness import readiness
+from .core.serialization import ORJSONResponse
+from .core.tracing import TracingMiddleware, tracer
+from .services.fallback import fallback_responses
+from .services.identity import identity_cache
+from .services.profile_cache import profile_cache
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Write logs from a background thread, as JSON lines in production
+log_pipeline.configure()
 logger = logging.getLogger("ruhani")
 
-app = FastAPI(title="RUHANI Backend")
+# Routes with a response model keep FastAPI's direct Pydantic serialization;
+# everything else is rendered with orjson
+# These dependencies run once the route has matched: track_in_flight counts
+# requests per route, tag_request_task attributes event-loop stalls to it
+app = FastAPI(
+    title="RUHANI Backend",
+    default_response_class=Default(ORJSONResponse),
+    dependencies=[Depends(track_in_flight), Depends(tag_request_task)]
+)
+
+# Innermost, so load-shedding 503s still get CORS headers and preflights are never shed
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,20 +46,116 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "traceparent", "X-Request-ID"],
 )
 
-# Initialize database on startup
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so the server span covers the whole request including CORS handling
+app.add_middleware(TracingMiddleware)
+
+async def wait_for_schema():
+    """Hold readiness until the database has every migration this code expects"""
+    while True:
+        # One query on a new connection, kept off the event loop
+        version = await asyncio.to_thread(check_schema)
+        if version is not None and version >= LATEST_VERSION:
+            readiness.done("schema")
+            return
+        reason = "schema version unreadable" if version is None else f"schema at version {version} of {LATEST_VERSION}"
+        readiness.waiting_for("schema", f"{reason}; run python -m app.db.migrations")
+        logger.warning(f"Not ready: {reason}, checking again in {settings.SCHEMA_CHECK_INTERVAL_SECONDS:g}s")
+        await asyncio.sleep(settings.SCHEMA_CHECK_INTERVAL_SECONDS)
+
+async def warm_identity_cache():
+    # Resolve the organization DID once and preload employee DIDs
+    await identity_cache.warm_up()
+    readiness.done("identity_cache")
+
+async def record_fallback_responses():
+    # Load the recorded fallback responses, speaking any not recorded yet, so
+    # sessions that run out of time still get audio; not a readiness step, as
+    # they have none until then
+    recorded = await fallback_responses.record()
+    if recorded:
+        logger.info(f"Recorded {recorded} fallback responses")
+
+async def warm_up():
+    # Import pandas, numpy, the Snowflake connector and the other lazily imported
+    # modules before the first request needs them
+    loaded = await asyncio.to_thread(preload_modules)
+    logger.info(f"Preloaded {', '.join(loaded) or 'no modules'}")
+    readiness.done("imports")
+    
+    # Start the shared pools for CPU-bound work with every worker spawned, so the
+    # first requests do not pay for it. Process workers come from a fork server
+    # (see PROCESS_START_METHOD), never from this multi-threaded process.
+    await cpu_executor.warm_up()
+    readiness.done("cpu_pools")
+    
+    await asyncio.gather(wait_for_schema(), warm_identity_cache(), record_fallback_responses())
+
+warm_up_task: Optional[asyncio.Task] = None
+
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Initializing database...")
-    if init_db():
-        logger.info("Database initialization successful")
-    else:
-        logger.warning("Database initialization failed or partially succeeded")
+    # Export spans in the background when a trace exporter is configured
+    tracer.start()
+    
+    # Share this worker's metrics with the others when METRICS_DIR is set
+    registry.start()
+    
+    # Watch for blocking code on the event loop
+    loop_monitor.start()
+    
+    # Sample the stacks of requests selected for profiling
+    profiler.start()
+    
+    # Warm up in the background: uvicorn accepts connections once startup returns,
+    # and /health/ready reports ready once every step is done. Schema migrations
+    # run out-of-band (python -m app.db.migrations), not here.
+    global warm_up_task
+    for step in ("imports", "cpu_pools", "schema", "identity_cache"):
+        readiness.waiting_for(step)
+    warm_up_task = asyncio.ensure_future(warm_up())
+    
+    # Keep cached FetchAI profiles fresh in the background
+    profile_cache.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    # In-flight requests have finished (or timed out); let detached jobs such as
+    # credential issuance finish before the pools they use are stopped
+    await drain_background_jobs(settings.SHUTDOWN_DRAIN_SECONDS)
+    await profile_cache.stop(timeout=settings.SHUTDOWN_DRAIN_SECONDS)
+    profiler.shutdown()
+    await loop_monitor.stop()
+    cpu_executor.shutdown()
+    await registry.stop()
+    tracer.shutdown()
 
 app.include_router(employee.router, prefix="/employee", tags=["Employee"])
 app.include_router(hr.router, prefix="/hr", tags=["HR"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 @app.get("/")
 def health_check():
-    return {"status": "ok", "message": "RUHANI backend is running"}
\ No newline at end of file
+    return {"status": "ok", "message": "RUHANI backend is running"}
+
+@app.get("/health/live", tags=["Health"])
+async def liveness():
+    """The worker is up and its event loop is responding"""
+    return {"status": "ok"}
+
+@app.get("/health/ready", tags=["Health"])
+async def readiness_check():
+    """The worker has warmed up and the schema is current; 503 until then"""
+    return ORJSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics of every worker"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,5 @@
+from pydantic import BaseModel, Field
+
+class ProfilerSettings(BaseModel):
+    """Model for runtime profiler settings"""
+    rate: float = Field(..., ge=0, le=1, description="Fraction of requests to the profiled routes to profile")
@@ -60,6 +60,7 @@ class EmployeeOnboardResponse(BaseModel):
     employee_id: Optional[str] = None
     did: Optional[str] = None
     created_at: Optional[datetime] = None
+    stage_timings_ms: Optional[Dict[str, float]] = None
 
 class SessionRequest(BaseModel):
     employee_id: str
@@ -75,7 +76,13 @@ class SessionResponse(BaseModel):
     response: Optional[str] = None
     audio_data: Optional[str] = None  # Base64 encoded audio data
     risk_level: Optional[str] = None  # 'low', 'medium', 'high'
+    mood: Optional[str] = None
     credential_id: Optional[str] = None
+    # "pending" when answered with a fallback response within the session deadline;
+    # the full response is then available from GET /employee/session/{session_id}.
+    # "no_speech" when a streamed session had no speech; nothing is stored then
+    status: str = "complete"
+    degraded_stages: List[str] = []  # Stages that ran out of time: 'stt', 'llm', 'tts', 'db'
 
 class SentimentLogRequest(BaseModel):
     employee_id: str
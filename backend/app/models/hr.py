@@ -3,16 +3,20 @@ from typing import List, Dict, Optional, Any
 from datetime import datetime
 
 class EmployeeInsight(BaseModel):
-    """Model for employee insight data"""
+    """Model for employee insight data
+
+    Only ``id`` and ``employee_id`` are always present; the remaining
+    attributes are omitted when they are not selected with ``fields=``.
+    """
     id: str
     employee_id: str
-    name: str
-    team: str
-    department: str
+    name: Optional[str] = None
+    team: Optional[str] = None
+    department: Optional[str] = None
     last_check_in: Optional[str] = None
-    status: str = Field(..., description="excellent, stable, improving, or declining")
-    mood_trend: List[str] = Field(default_factory=list)
-    risk_level: str = Field(..., description="high, medium, or low")
+    status: Optional[str] = Field(None, description="excellent, stable, improving, or declining")
+    mood_trend: Optional[List[str]] = None
+    risk_level: Optional[str] = Field(None, description="high, medium, or low")
 
 class EmployeeTrend(BaseModel):
     """Model for employee trend data"""
@@ -22,24 +26,47 @@ class EmployeeTrend(BaseModel):
     common_topics: List[str] = Field(default_factory=list)
 
 class EmployeeRisk(BaseModel):
-    """Model for at-risk employee data"""
+    """Model for at-risk employee data
+
+    Only ``employee_id`` is always present; the remaining attributes are
+    omitted when they are not selected with ``fields=``.
+    """
     employee_id: str
-    name: str
-    team: str
-    department: str
-    last_check_in: str
-    risk_level: str = Field(..., description="high, medium, or low")
-    risk_factors: List[str] = Field(default_factory=list)
-    recommended_actions: List[str] = Field(default_factory=list)
+    name: Optional[str] = None
+    team: Optional[str] = None
+    department: Optional[str] = None
+    last_check_in: Optional[str] = None
+    risk_level: Optional[str] = Field(None, description="high, medium, or low")
+    risk_factors: Optional[List[str]] = None
+    recommended_actions: Optional[List[str]] = None
+
+class PresentationReference(BaseModel):
+    """Reference to a batched presentation covering rows of a response"""
+    id: str
+    claims_root: str = Field(
+        ...,
+        description="SHA-256 Merkle root of the covered rows as returned: leaves are SHA-256(0x00 || canonical JSON "
+                    "of the row, keys sorted, no whitespace), nodes SHA-256(0x01 || left || right)"
+    )
+    start: int = Field(..., description="Index of the first covered row")
+    end: int = Field(..., description="Index after the last covered row")
 
 class HRInsightsResponse(BaseModel):
     """Response model for HR insights endpoint"""
     insights: List[EmployeeInsight] = Field(default_factory=list)
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page, if any")
 
 class HRTrendsResponse(BaseModel):
     """Response model for HR trends endpoint"""
     trends: List[EmployeeTrend] = Field(default_factory=list)
+    presentations: List[PresentationReference] = Field(
+        default_factory=list, description="Presentations of the rows; empty when Coral could not present them"
+    )
 
 class HRAtRiskResponse(BaseModel):
     """Response model for HR at-risk endpoint"""
-    at_risk_employees: List[EmployeeRisk] = Field(default_factory=list)
\ No newline at end of file
+    at_risk_employees: List[EmployeeRisk] = Field(default_factory=list)
+    presentations: List[PresentationReference] = Field(
+        default_factory=list, description="Presentations of the rows; empty when Coral could not present them"
+    )
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page, if any")
\ No newline at end of file
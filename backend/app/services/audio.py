@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import io
+import shutil
+import subprocess
+import wave
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..core.executor import run_cpu
+from ..core.imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Audio handed to speech-to-text is 16 kHz mono 16-bit PCM
+TARGET_SAMPLE_RATE = 16000
+FRAME_MS = 30
+# Frames louder than the noise floor by this margin count as speech
+SPEECH_MARGIN_DB = 12.0
+# Quietest level ever treated as speech, so silent clips stay silent
+MIN_SPEECH_DBFS = -50.0
+# The threshold never sits further than this below the loudest frame, so
+# clips that are nearly all speech are not mistaken for noise
+PEAK_HEADROOM_DB = 25.0
+# Pauses shorter than this stay inside a speech segment
+MIN_SILENCE_MS = 500
+# Speech shorter than this is dropped as a click or noise burst
+MIN_SPEECH_MS = 200
+# Audio kept either side of each speech segment so word edges are not clipped
+PADDING_MS = 150
+# Silence inserted between speech segments in the compacted audio
+GAP_MS = 200
+RESAMPLE_TAPS = 63
+
+def _wav_samples(data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode a PCM WAV file to float32 samples shaped (frames, channels)"""
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        # Sign-extend packed 24-bit samples into the top of 32-bit integers
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = (packed[:, 0] << 8) | (packed[:, 1] << 16) | (packed[:, 2] << 24)
+        samples = values.astype(np.float32) / 2 ** 31
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2 ** 31
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+    return samples.reshape(-1, channels), rate
+
+def _ffmpeg_samples(data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode any format ffmpeg understands straight to 16 kHz mono"""
+    if not shutil.which("ffmpeg"):
+        raise ValueError("Only WAV audio can be decoded without ffmpeg installed")
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "pipe:1"],
+        input=data, capture_output=True
+    )
+    if result.returncode != 0:
+        raise ValueError(f"Could not decode audio: {result.stderr.decode(errors='replace').strip()}")
+    samples = np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768
+    return samples.reshape(-1, 1), TARGET_SAMPLE_RATE
+
+def decode_audio(data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode an audio file to float32 samples shaped (frames, channels) and its sample rate"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return _wav_samples(data)
+    return _ffmpeg_samples(data)
+
+def pcm16_to_samples(pcm: bytes) -> np.ndarray:
+    """Convert 16-bit little-endian mono PCM to float32 samples"""
+    return np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype="<i2").astype(np.float32) / 32768
+
+def samples_to_pcm16(samples: np.ndarray) -> bytes:
+    """Convert float32 samples to 16-bit little-endian PCM"""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """Average all channels into one"""
+    return samples.mean(axis=1, dtype=np.float32) if samples.ndim == 2 else samples
+
+def resample(samples: np.ndarray, rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Resample mono audio by linear interpolation, low-pass filtering first when downsampling"""
+    if rate == target_rate or not len(samples):
+        return samples.astype(np.float32, copy=False)
+    if target_rate < rate:
+        # Windowed-sinc low-pass just under the new Nyquist frequency to avoid aliasing
+        cutoff = 0.45 * target_rate / rate
+        taps = np.arange(RESAMPLE_TAPS) - (RESAMPLE_TAPS - 1) / 2
+        kernel = (2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(RESAMPLE_TAPS)).astype(np.float32)
+        samples = np.convolve(samples, kernel / kernel.sum(), mode="same")
+    length = int(round(len(samples) * target_rate / rate))
+    positions = np.arange(length, dtype=np.float64) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def frame_energy(samples: np.ndarray, rate: int, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """RMS level of each non-overlapping frame in dBFS"""
+    frame = max(1, rate * frame_ms // 1000)
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """Return [start, end) index pairs of the runs of True in a boolean array"""
+    edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+    return np.column_stack((np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+def detect_speech(samples: np.ndarray, rate: int) -> List[Tuple[int, int]]:
+    """Find speech in mono audio with an adaptive energy threshold.
+
+    The noise floor is estimated from the quietest frames; frames well above
+    it (or within PEAK_HEADROOM_DB of the loudest frame) are speech. Short
+    pauses are bridged, very short bursts are dropped and each segment is
+    padded slightly.
+
+    Returns:
+        List of (start, end) sample offsets of speech segments
+    """
+    energy = frame_energy(samples, rate)
+    if not len(energy):
+        return []
+    noise_floor = np.percentile(energy, 10)
+    threshold = max(min(noise_floor + SPEECH_MARGIN_DB, energy.max() - PEAK_HEADROOM_DB), MIN_SPEECH_DBFS)
+    speech = energy > threshold
+
+    # Bridge pauses shorter than MIN_SILENCE_MS
+    pauses = _runs(~speech)
+    short = (pauses[:, 1] - pauses[:, 0]) * FRAME_MS < MIN_SILENCE_MS
+    inner = (pauses[:, 0] > 0) & (pauses[:, 1] < len(speech))
+    for start, end in pauses[short & inner]:
+        speech[start:end] = True
+
+    # Drop bursts shorter than MIN_SPEECH_MS, then pad and merge what remains
+    segments = _runs(speech)
+    segments = segments[(segments[:, 1] - segments[:, 0]) * FRAME_MS >= MIN_SPEECH_MS]
+    frame = rate * FRAME_MS // 1000
+    padding = rate * PADDING_MS // 1000
+    merged: List[Tuple[int, int]] = []
+    for start, end in segments:
+        start = max(0, start * frame - padding)
+        end = min(len(samples), end * frame + padding)
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def find_pause(pcm: bytes, rate: int) -> Optional[int]:
+    """Byte offset at which to split 16-bit mono PCM without cutting speech.
+
+    Returns the middle of the last pause of at least MIN_SILENCE_MS found by
+    detect_speech (including trailing silence), the end of the audio when it
+    has no speech at all, or None when speech runs on without such a pause.
+    """
+    samples = pcm16_to_samples(pcm)
+    segments = detect_speech(samples, rate)
+    if not segments:
+        return len(samples) * 2
+    # Segments are padded, so a pause of MIN_SILENCE_MS leaves at least this much between them
+    min_gap = rate * (MIN_SILENCE_MS - 2 * PADDING_MS) // 1000
+    gaps = [(end, start) for (_, end), (start, _) in zip(segments, segments[1:])]
+    gaps.append((segments[-1][1], len(samples)))
+    for end, start in reversed(gaps):
+        if start - end >= min_gap:
+            return (end + start) // 2 * 2
+    return None
+
+def compact_speech(samples: np.ndarray, rate: int) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """Cut mono audio down to its speech segments joined by short gaps.
+
+    Returns:
+        The compacted samples at TARGET_SAMPLE_RATE and the speech segments
+        found, as sample offsets into the input
+    """
+    segments = detect_speech(samples, rate)
+    gap = np.zeros(TARGET_SAMPLE_RATE * GAP_MS // 1000, dtype=np.float32)
+    pieces: List[np.ndarray] = []
+    for start, end in segments:
+        if pieces:
+            pieces.append(gap)
+        pieces.append(resample(samples[start:end], rate))
+    compacted = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    return compacted, segments
+
+def preprocess_audio(data: bytes) -> Dict[str, Any]:
+    """Decode an audio file and reduce it to compact speech-only PCM for STT.
+
+    Decodes, downmixes to mono, trims silence and resamples the remaining
+    speech to 16 kHz 16-bit PCM. Runs in a worker process via
+    preprocess_audio_async, so it must stay a plain module-level function.
+
+    Returns:
+        Dictionary with ``pcm``, ``sample_rate``, ``duration_seconds`` of the
+        input, ``speech_seconds`` kept and the number of ``segments``
+    """
+    samples, rate = decode_audio(data)
+    mono = downmix(samples)
+    compacted, segments = compact_speech(mono, rate)
+    return {
+        "pcm": samples_to_pcm16(compacted),
+        "sample_rate": TARGET_SAMPLE_RATE,
+        "duration_seconds": round(len(mono) / rate, 3),
+        "speech_seconds": round(len(compacted) / TARGET_SAMPLE_RATE, 3),
+        "segments": len(segments)
+    }
+
+def trim_pcm(pcm: bytes, rate: int) -> bytes:
+    """Trim silence from a 16-bit mono PCM segment and resample it to 16 kHz; empty if no speech"""
+    compacted, _ = compact_speech(pcm16_to_samples(pcm), rate)
+    return samples_to_pcm16(compacted)
+
+async def preprocess_audio_async(data: bytes) -> Dict[str, Any]:
+    """Run preprocess_audio on the shared CPU executor so decoding never blocks the event loop"""
+    return await run_cpu(preprocess_audio, data)
+
+async def trim_pcm_async(pcm: bytes, rate: int) -> bytes:
+    """Run trim_pcm on the shared CPU executor"""
+    return await run_cpu(trim_pcm, pcm, rate)
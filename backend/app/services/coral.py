@@ -1,15 +1,56 @@
 import os
 import httpx
-import json
+import logging
 import uuid
 import base64
 import hashlib
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple, Union
 
+from ..core.executor import run_cpu
+from ..core.serialization import canonical_dumps
+from ..core.metrics import ProviderTransport
+from ..core.tracing import CLIENT, HTTPX_EVENT_HOOKS, traced
+
+logger = logging.getLogger("ruhani")
+
 CORAL_API_KEY = os.getenv("CORAL_API_KEY")
 CORAL_API_BASE_URL = os.getenv("CORAL_API_BASE_URL", "https://api.coralprotocol.com/v1")
 
+# Largest number of claim sets covered by a single batched presentation
+MAX_PRESENTATION_ITEMS = 5000
+# Rough serialized size of one claim set, used to route hashing work by size
+CLAIMS_SIZE_ESTIMATE = 256
+
+def canonical_json(data: Any) -> bytes:
+    """Serialize data deterministically so equal claims always hash the same"""
+    return canonical_dumps(data)
+
+# Domain-separation prefixes, so a leaf hash can never be passed off as an internal node
+MERKLE_LEAF_PREFIX = b"\x00"
+MERKLE_NODE_PREFIX = b"\x01"
+
+def merkle_root(leaves: List[bytes]) -> str:
+    """Compute the hex SHA-256 Merkle root of a list of leaf hashes.
+
+    Internal nodes are SHA-256(0x01 || left || right); an odd node at any
+    level is paired with itself.
+    """
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+    level = leaves
+    while len(level) > 1:
+        if len(level) % 2:
+            level = level + [level[-1]]
+        level = [
+            hashlib.sha256(MERKLE_NODE_PREFIX + level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)
+        ]
+    return level[0].hex()
+
+def claims_merkle_root(items: List[Dict[str, Any]]) -> str:
+    """Merkle root over claim sets, each leaf being SHA-256(0x00 || canonical JSON of the claims)"""
+    return merkle_root([hashlib.sha256(MERKLE_LEAF_PREFIX + canonical_json(item)).digest() for item in items])
+
 class CoralClient:
     """Client for Coral Protocol - a decentralized identity and verifiable credential protocol.
     
@@ -25,8 +66,11 @@ class CoralClient:
             "Authorization": f"Bearer {CORAL_API_KEY}",
             "Content-Type": "application/json"
         }
-        self.client = httpx.AsyncClient(timeout=10.0)
+        self.client = httpx.AsyncClient(
+            timeout=10.0, event_hooks=HTTPX_EVENT_HOOKS, transport=ProviderTransport("coral")
+        )
     
+    @traced("coral.create_did", stage="coral", kind=CLIENT)
     async def create_did(self, employee_id: str, name: str, email: str) -> Dict[str, Any]:
         """Create a decentralized identifier (DID) for an employee.
         
@@ -70,12 +114,13 @@ class CoralClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"Coral API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error creating DID with Coral: {str(e)}")
+            logger.error(f"Error creating DID with Coral: {e}")
             return {"error": f"Error creating DID with Coral: {str(e)}"}
     
+    @traced("coral.resolve_did", stage="coral", kind=CLIENT)
     async def resolve_did(self, did: str) -> Dict[str, Any]:
         """Resolve a DID to get its DID document.
         
@@ -107,12 +152,13 @@ class CoralClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"Coral API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error resolving DID with Coral: {str(e)}")
+            logger.error(f"Error resolving DID with Coral: {e}")
             return {"error": f"Error resolving DID with Coral: {str(e)}"}
     
+    @traced("coral.issue_credential", stage="coral", kind=CLIENT)
     async def issue_credential(self, 
                              issuer_did: str, 
                              subject_did: str, 
@@ -176,12 +222,13 @@ class CoralClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"Coral API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error issuing credential with Coral: {str(e)}")
+            logger.error(f"Error issuing credential with Coral: {e}")
             return {"error": f"Error issuing credential with Coral: {str(e)}"}
     
+    @traced("coral.verify_credential", stage="coral", kind=CLIENT)
     async def verify_credential(self, credential: Dict[str, Any]) -> Dict[str, Any]:
         """Verify a credential's authenticity and validity.
         
@@ -208,12 +255,13 @@ class CoralClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"Coral API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error verifying credential with Coral: {str(e)}")
+            logger.error(f"Error verifying credential with Coral: {e}")
             return {"error": f"Error verifying credential with Coral: {str(e)}"}
     
+    @traced("coral.create_presentation", stage="coral", kind=CLIENT)
     async def create_presentation(self, 
                                 credentials: List[Dict[str, Any]], 
                                 holder_did: str,
@@ -266,12 +314,104 @@ class CoralClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"Coral API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error creating presentation with Coral: {str(e)}")
+            logger.error(f"Error creating presentation with Coral: {e}")
             return {"error": f"Error creating presentation with Coral: {str(e)}"}
     
+    @traced("coral.create_batch_presentation", stage="coral", kind=CLIENT)
+    async def create_batch_presentation(self,
+                                      holder_did: str,
+                                      presentation_type: str,
+                                      items: List[Dict[str, Any]],
+                                      credential_ids: Optional[List[str]] = None,
+                                      audience: Optional[str] = None) -> Dict[str, Any]:
+        """Create signed presentations covering many claim sets at once.
+        
+        Each item's claims are hashed and only the Merkle root of those hashes
+        is signed, so one presentation covers a whole response. Batches larger
+        than MAX_PRESENTATION_ITEMS are split over several presentations.
+        
+        Args:
+            holder_did: DID of the presentation holder
+            presentation_type: Type of presentation (e.g., 'AggregatedWellnessData')
+            items: Claim sets to cover, one per response row
+            credential_ids: IDs of the credentials the claims were derived from
+            audience: Intended recipient of the presentation
+            
+        Returns:
+            Dictionary with the ``presentations`` created, each with its
+            ``claims_root`` and the ``start``/``end`` item range it covers
+        """
+        presentations = []
+        for start in range(0, len(items), MAX_PRESENTATION_ITEMS):
+            chunk = items[start:start + MAX_PRESENTATION_ITEMS]
+            claims_root = await run_cpu(claims_merkle_root, chunk, size=len(chunk) * CLAIMS_SIZE_ESTIMATE)
+            
+            if not CORAL_API_KEY:
+                # In development, we'll create a mock presentation
+                creation_date = datetime.utcnow().isoformat()
+                presentation = {
+                    "@context": [
+                        "https://www.w3.org/2018/credentials/v1"
+                    ],
+                    "id": f"urn:uuid:{uuid.uuid4()}",
+                    "type": ["VerifiablePresentation", presentation_type],
+                    "holder": holder_did,
+                    "verifiableCredential": credential_ids or [],
+                    "claimsDigest": {
+                        "algorithm": "sha256-merkle",
+                        "root": claims_root,
+                        "leafCount": len(chunk)
+                    },
+                    "proof": {
+                        "type": "Ed25519Signature2020",
+                        "created": creation_date,
+                        "verificationMethod": f"{holder_did}#keys-1",
+                        "proofPurpose": "authentication",
+                        "challenge": str(uuid.uuid4()),
+                        "domain": audience or holder_did,
+                        "proofValue": f"z{base64.b64encode(uuid.uuid4().bytes).decode()}"
+                    }
+                }
+                presentations.append({
+                    "presentation": presentation,
+                    "claims_root": claims_root,
+                    "start": start,
+                    "end": start + len(chunk)
+                })
+                continue
+            
+            url = f"{CORAL_API_BASE_URL}/presentations/create"
+            payload = {
+                "holder_did": holder_did,
+                "presentation_type": presentation_type,
+                "credential_ids": credential_ids or [],
+                "claims_root": claims_root,
+                "leaf_count": len(chunk),
+                "audience": audience or holder_did
+            }
+            
+            try:
+                response = await self.client.post(url, headers=self.headers, json=payload)
+                response.raise_for_status()
+                presentations.append({
+                    "presentation": response.json().get("presentation"),
+                    "claims_root": claims_root,
+                    "start": start,
+                    "end": start + len(chunk)
+                })
+            except httpx.HTTPStatusError as e:
+                logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
+                return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
+            except Exception as e:
+                logger.error(f"Error creating batch presentation with Coral: {e}")
+                return {"error": f"Error creating batch presentation with Coral: {str(e)}"}
+        
+        return {"presentations": presentations, "mock": not CORAL_API_KEY}
+    
+    @traced("coral.verify_presentation", stage="coral", kind=CLIENT)
     async def verify_presentation(self, presentation: Dict[str, Any]) -> Dict[str, Any]:
         """Verify a presentation's authenticity and validity.
         
@@ -297,12 +437,13 @@ class CoralClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"Coral API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error verifying presentation with Coral: {str(e)}")
+            logger.error(f"Error verifying presentation with Coral: {e}")
             return {"error": f"Error verifying presentation with Coral: {str(e)}"}
     
+    @traced("coral.revoke_credential", stage="coral", kind=CLIENT)
     async def revoke_credential(self, credential_id: str, issuer_did: str) -> Dict[str, Any]:
         """Revoke a previously issued credential.
         
@@ -332,12 +473,13 @@ class CoralClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"Coral API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"Coral API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error revoking credential with Coral: {str(e)}")
+            logger.error(f"Error revoking credential with Coral: {e}")
             return {"error": f"Error revoking credential with Coral: {str(e)}"}
     
+    @traced("coral.create_consent_credential", stage="coral")
     async def create_consent_credential(self, 
                                       issuer_did: str, 
                                       subject_did: str,
@@ -374,6 +516,7 @@ class CoralClient:
             expiration_days=expiration_days
         )
     
+    @traced("coral.create_session_credential", stage="coral")
     async def create_session_credential(self,
                                       issuer_did: str,
                                       subject_did: str,
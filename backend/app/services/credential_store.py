@@ -0,0 +1,186 @@
+import asyncio
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.executor import b64encode_text, run_cpu, sha256_hex
+from ..core.metrics import track_cache
+from ..core.serialization import canonical_dumps, loads
+from ..db.snowflake_client import SnowflakeClient
+from .coral import CoralClient
+from .identity import MISSING, TTLCache
+
+COMPRESSION = "zlib"
+COMPRESSION_LEVEL = 6
+
+def pack_credential(credential: Dict[str, Any]) -> Tuple[str, bytes]:
+    """Return the canonical-JSON digest of a credential and its compressed body"""
+    body = canonical_dumps(credential)
+    return sha256_hex(body), zlib.compress(body, COMPRESSION_LEVEL)
+
+def unpack_credential(body: bytes) -> Dict[str, Any]:
+    """Decompress and parse a credential body stored by pack_credential"""
+    return loads(zlib.decompress(body))
+
+def seconds_until_expiry(credential: Dict[str, Any]) -> Optional[float]:
+    """Seconds until a credential's expirationDate (UTC when it has no offset), or None if it never expires"""
+    expiration_date = credential.get("expirationDate")
+    if not expiration_date:
+        return None
+    expires = datetime.fromisoformat(expiration_date)
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return (expires - datetime.now(timezone.utc)).total_seconds()
+
+class CredentialStore:
+    """Hot/cold storage for verifiable credentials.
+
+    The ``credentials`` table holds only the fixed fields that queries filter
+    and display, plus ``content_hash``, the SHA-256 of the credential's
+    canonical JSON. The full document lives in ``credential_bodies``,
+    compressed and keyed by that hash, so identical bodies are stored once.
+
+    Bodies are loaded only when a full document is needed and are cached by
+    hash. Because a hash names immutable content, verification results are
+    cached by hash too, but never past the credential's expirationDate;
+    revocation is tracked in the hot ``revoked`` column, which every query
+    filters on.
+    """
+
+    def __init__(self, max_size: int, ttl: float, verify_concurrency: int):
+        self.bodies = TTLCache(max_size, ttl)
+        self.verified = TTLCache(max_size, ttl)
+        # Coral verifications in flight at once, across requests
+        self.verify_slots = asyncio.Semaphore(verify_concurrency)
+
+    def store(self, snowflake_client: SnowflakeClient, credential: Dict[str, Any], credential_type: str,
+              issuer_did: str, subject_did: str, issuance_date: str, expiration_date: Optional[str]) -> str:
+        """Store a credential's body (once per distinct content) and its hot row.
+
+        Blocking (compression and two Snowflake round trips), so call it in a
+        thread. The hot row is only inserted once its body is stored, so a
+        row never refers to a missing body.
+
+        Returns:
+            The credential's content hash
+
+        Raises:
+            RuntimeError: if the body or the hot row could not be stored
+        """
+        content_hash, body = pack_credential(credential)
+        stored_body = snowflake_client.execute(
+            """MERGE INTO credential_bodies b
+               USING (SELECT %s AS content_hash, TO_BINARY(%s, 'BASE64') AS body, %s AS compression,
+                             %s AS size_bytes) n
+               ON b.content_hash = n.content_hash
+               WHEN NOT MATCHED THEN INSERT (content_hash, body, compression, size_bytes)
+               VALUES (n.content_hash, n.body, n.compression, n.size_bytes)""",
+            (content_hash, b64encode_text(body), COMPRESSION, len(body))
+        )
+        if stored_body is None:
+            raise RuntimeError(f"Failed to store the body of credential {credential['id']}")
+        stored_row = snowflake_client.execute(
+            """INSERT INTO credentials
+               (credential_id, credential_type, issuer_did, subject_did, issuance_date, expiration_date, content_hash)
+               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+            (credential["id"], credential_type, issuer_did, subject_did, issuance_date, expiration_date, content_hash)
+        )
+        if stored_row is None:
+            raise RuntimeError(f"Failed to store credential {credential['id']}")
+        self.bodies.set(content_hash, credential)
+        return content_hash
+
+    async def load(self, snowflake_client: SnowflakeClient, content_hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Load full credential documents by content hash, fetching uncached bodies in one query"""
+        documents: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for content_hash in dict.fromkeys(content_hashes):
+            document = self.bodies.get(content_hash)
+            if document is MISSING:
+                missing.append(content_hash)
+            else:
+                documents[content_hash] = document
+        if not missing:
+            return documents
+
+        def fetch() -> List[Tuple[str, Any]]:
+            placeholders = ", ".join(["%s"] * len(missing))
+            result = snowflake_client.execute(
+                f"SELECT content_hash, body FROM credential_bodies WHERE content_hash IN ({placeholders})",
+                tuple(missing)
+            )
+            return result.fetchall() if result else []
+
+        for content_hash, body in await asyncio.to_thread(fetch):
+            document = await run_cpu(unpack_credential, bytes(body))
+            self.bodies.set(content_hash, document)
+            documents[content_hash] = document
+        return documents
+
+    async def _verify_document(self, coral_client: CoralClient, content_hash: str,
+                               document: Optional[Dict[str, Any]]) -> bool:
+        """Verify one credential with Coral, caching the result until the credential expires"""
+        if document is None:
+            return False
+        remaining = seconds_until_expiry(document)
+        if remaining is not None and remaining <= 0:
+            # Expired for good, whatever Coral would say
+            self.verified.set(content_hash, False)
+            return False
+        async with self.verify_slots:
+            verification_result = await coral_client.verify_credential(credential=document)
+        verified = bool(verification_result.get("verified", False))
+        # Errors talking to Coral are not a verdict on the credential, so they are not cached
+        if "error" not in verification_result:
+            self.verified.set(content_hash, verified, None if remaining is None else min(self.verified.ttl, remaining))
+        return verified
+
+    async def verify(self, snowflake_client: SnowflakeClient, coral_client: CoralClient,
+                     content_hashes: Iterable[str]) -> Dict[str, bool]:
+        """Verify credentials by content hash, loading bodies only for hashes not verified before.
+
+        Uncached credentials are verified concurrently, at most
+        CREDENTIAL_VERIFY_CONCURRENCY at a time; expired ones never verify.
+
+        Returns:
+            Whether each hash's credential verified; hashes without a stored
+            body count as unverified
+        """
+        results: Dict[str, bool] = {}
+        unknown: List[str] = []
+        for content_hash in dict.fromkeys(content_hashes):
+            verified = self.verified.get(content_hash)
+            if verified is MISSING:
+                unknown.append(content_hash)
+            else:
+                results[content_hash] = verified
+        if not unknown:
+            return results
+
+        documents = await self.load(snowflake_client, unknown)
+        verdicts = await asyncio.gather(*(
+            self._verify_document(coral_client, content_hash, documents.get(content_hash))
+            for content_hash in unknown
+        ))
+        results.update(zip(unknown, verdicts))
+        return results
+
+    async def get_document(self, snowflake_client: SnowflakeClient, credential_id: str) -> Optional[Dict[str, Any]]:
+        """Load the full document of a credential, or None if it does not exist"""
+        result = snowflake_client.execute(
+            "SELECT content_hash FROM credentials WHERE credential_id = %s", (credential_id,)
+        )
+        row = result.fetchone() if result else None
+        if not row:
+            return None
+        return (await self.load(snowflake_client, [row[0]])).get(row[0])
+
+# Create a global credential store instance
+credential_store = CredentialStore(
+    max_size=settings.CREDENTIAL_CACHE_SIZE,
+    ttl=settings.CREDENTIAL_CACHE_TTL_SECONDS,
+    verify_concurrency=settings.CREDENTIAL_VERIFY_CONCURRENCY
+)
+track_cache("credential_bodies", credential_store.bodies)
+track_cache("credential_verifications", credential_store.verified)
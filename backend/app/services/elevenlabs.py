@@ -3,10 +3,19 @@ import httpx
 import base64
 from typing import Dict, Any, Optional
 
+from ..core.deadline import timeout_for
+from ..core.executor import run_cpu, b64encode_text
+from ..core.metrics import ProviderTransport
+from ..core.tracing import CLIENT, HTTPX_EVENT_HOOKS, traced
+
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_API_BASE_URL = os.getenv("ELEVENLABS_API_BASE_URL", "https://api.elevenlabs.io/v1")
 ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")  # Default voice ID (Rachel)
 
+# Longer timeout for TTS operations; calls made for a request with a deadline
+# get what is left of it instead when that is shorter
+REQUEST_TIMEOUT = 30.0
+
 class ElevenLabsClient:
     def __init__(self):
         self.headers = {
@@ -14,8 +23,12 @@ class ElevenLabsClient:
             "Content-Type": "application/json",
             "Accept": "audio/mpeg"
         }
-        self.client = httpx.AsyncClient(timeout=30.0)  # Longer timeout for TTS operations
+        self.client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            event_hooks=HTTPX_EVENT_HOOKS, transport=ProviderTransport("elevenlabs")
+        )
 
+    @traced("elevenlabs.generate_tts", stage="elevenlabs", kind=CLIENT)
     async def generate_tts(self, text: str, voice_id: Optional[str] = None) -> Dict[str, Any]:
         """Call ElevenLabs TTS endpoint to convert text to speech"""
         if not ELEVENLABS_API_KEY:
@@ -34,13 +47,15 @@ class ElevenLabsClient:
         }
         
         try:
-            response = await self.client.post(url, headers=self.headers, json=payload)
+            response = await self.client.post(
+                url, headers=self.headers, json=payload, timeout=timeout_for(REQUEST_TIMEOUT)
+            )
             response.raise_for_status()
             
             # In a production environment, you would likely save this to a file or cloud storage
             # and return a URL. For simplicity, we'll return the base64-encoded audio.
             audio_data = response.content
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+            audio_base64 = await run_cpu(b64encode_text, audio_data)
             
             return {
                 "audio_data": audio_base64,
@@ -0,0 +1,105 @@
+import asyncio
+import base64
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from ..core.config import settings
+from ..core.executor import b64encode_text, sha256_hex
+from .elevenlabs import ELEVENLABS_API_KEY, ELEVENLABS_VOICE_ID, ElevenLabsClient
+
+logger = logging.getLogger("ruhani")
+
+# Responses given when a session's own response cannot be generated in time,
+# by the mood of the session ("default" when the mood is not known)
+FALLBACK_RESPONSES: Dict[str, str] = {
+    "default": (
+        "Thank you for sharing that with me. I'm taking a moment to think about what you said, "
+        "and a fuller response will be waiting for you shortly. In the meantime, try a few slow, deep breaths."
+    ),
+    "stressed": (
+        "It sounds like a lot is weighing on you right now, and that's completely understandable. "
+        "Try picking just one small thing to focus on next. I'll have a fuller response for you shortly."
+    ),
+    "anxious": (
+        "I can hear that you're feeling uneasy, and it's okay to feel that way. "
+        "Try breathing in for four counts and out for six. I'll have a fuller response for you shortly."
+    ),
+    "overwhelmed": (
+        "It sounds like things feel like too much right now. You don't have to solve everything at once. "
+        "Take a short break if you can. I'll have a fuller response for you shortly."
+    ),
+    "distressed": (
+        "I'm really glad you reached out, and what you're feeling matters. If you feel unsafe, please contact "
+        "someone you trust or a crisis line right away. I'll have a fuller response for you shortly."
+    ),
+}
+
+class FallbackResponses:
+    """Fallback text and its speech, recorded once and kept on disk and in memory.
+
+    Recordings are files in ``directory`` named by a hash of the voice and
+    text, so every worker (and every restart) reuses them, and changing a
+    response records it again. At startup each worker loads the recordings
+    and synthesizes only the missing ones, so a session that runs out of
+    time is answered without another provider call. Until a recording
+    exists (or without an ElevenLabs key) the fallback has no audio.
+    """
+
+    def __init__(self, responses: Dict[str, str], directory: str):
+        self.responses = responses
+        self.directory = Path(directory)
+        self.audio: Dict[str, str] = {}
+
+    def response_for(self, mood: Optional[str]) -> Tuple[str, str]:
+        """(text, base64 audio or "") of the fallback response for a mood"""
+        key = mood if mood in self.responses else "default"
+        return self.responses[key], self.audio.get(key, "")
+
+    def _path(self, text: str) -> Path:
+        return self.directory / f"{sha256_hex(f'{ELEVENLABS_VOICE_ID}:{text}')[:32]}.mp3"
+
+    def _load(self) -> Dict[str, str]:
+        """Base64 audio of the responses already recorded on disk"""
+        audio = {}
+        for key, text in self.responses.items():
+            path = self._path(text)
+            if path.is_file():
+                audio[key] = b64encode_text(path.read_bytes())
+        return audio
+
+    def _save(self, text: str, audio_data: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(text)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(base64.b64decode(audio_data))
+        os.replace(temporary, path)
+
+    async def record(self) -> int:
+        """Load recorded responses and synthesize those with no recording yet; returns how many were synthesized"""
+        self.audio.update(await asyncio.to_thread(self._load))
+        if not ELEVENLABS_API_KEY or len(self.audio) == len(self.responses):
+            return 0
+        recorded = 0
+        client = ElevenLabsClient()
+        try:
+            for key, text in self.responses.items():
+                if key in self.audio:
+                    continue
+                result = await client.generate_tts(text)
+                if result.get("success"):
+                    self.audio[key] = result["audio_data"]
+                    recorded += 1
+                    try:
+                        await asyncio.to_thread(self._save, text, result["audio_data"])
+                    except OSError as e:
+                        logger.warning(f"Failed to save fallback response {key}: {e}")
+                else:
+                    logger.warning(f"Failed to record fallback response {key}: {result.get('error')}")
+        finally:
+            await client.close()
+        return recorded
+
+# Create a global fallback responses instance
+fallback_responses = FallbackResponses(FALLBACK_RESPONSES, settings.FALLBACK_AUDIO_DIR)
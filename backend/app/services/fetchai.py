@@ -1,8 +1,14 @@
 import os
 import httpx
+import logging
 import json
 from typing import Dict, Any, Optional
 
+from ..core.metrics import ProviderTransport
+from ..core.tracing import CLIENT, HTTPX_EVENT_HOOKS, traced
+
+logger = logging.getLogger("ruhani")
+
 FETCHAI_API_KEY = os.getenv("FETCHAI_API_KEY")
 FETCHAI_API_BASE_URL = os.getenv("FETCHAI_API_BASE_URL", "https://api.fetch.ai/v1")
 
@@ -12,8 +18,11 @@ class FetchAIClient:
             "Authorization": f"Bearer {FETCHAI_API_KEY}",
             "Content-Type": "application/json"
         }
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = httpx.AsyncClient(
+            timeout=30.0, event_hooks=HTTPX_EVENT_HOOKS, transport=ProviderTransport("fetchai")
+        )
 
+    @traced("fetchai.fetch_public_info", stage="fetchai", kind=CLIENT)
     async def fetch_public_info(self, github: Optional[str] = None, linkedin: Optional[str] = None) -> Dict[str, Any]:
         """Fetch public information about a person using Fetch.ai agents"""
         if not FETCHAI_API_KEY:
@@ -36,10 +45,10 @@ class FetchAIClient:
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
-            print(f"FetchAI API error: {e.response.status_code} - {e.response.text}")
+            logger.error(f"FetchAI API error: {e.response.status_code}", extra={"response": e.response.text})
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
-            print(f"Error fetching from FetchAI: {str(e)}")
+            logger.error(f"Error fetching from FetchAI: {e}")
             return {"error": f"Error fetching from FetchAI: {str(e)}"}
     
     def _generate_mock_data(self, github: Optional[str] = None, linkedin: Optional[str] = None) -> Dict[str, Any]:
@@ -1,45 +1,117 @@
 import os
+import time
 import httpx
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from ..core.deadline import timeout_for
+from ..core.executor import run_cpu
+from ..core.metrics import PROVIDER_BUCKETS, ProviderTransport, registry
+from ..core.tracing import CLIENT, HTTPX_EVENT_HOOKS, annotate, traced
+from .risk_scoring import score_transcript, mood_for
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_BASE_URL = os.getenv("GROQ_API_BASE_URL", "https://api.groq.com/v1")
 GROQ_LLM_MODEL = os.getenv("GROQ_LLM_MODEL", "llama3-70b-8192")
 
+GROQ_CLASSIFIER_MODEL = os.getenv("GROQ_CLASSIFIER_MODEL", "llama3-8b-8192")
+GROQ_STT_MODEL = os.getenv("GROQ_STT_MODEL", "whisper-large-v3")
+# USD per million prompt and completion tokens by model, e.g.
+# {"llama3-70b-8192": [0.59, 0.79]}; models without a price are not costed
+GROQ_MODEL_PRICES: Dict[str, List[float]] = json.loads(os.getenv("GROQ_MODEL_PRICES", "{}"))
+
+# Longer timeout for LLM operations; calls made for a request with a deadline
+# get what is left of it instead when that is shorter
+REQUEST_TIMEOUT = 60.0
+
+# Model used for each kind of call: the large model writes responses,
+# the small, fast model handles structured classification
+MODEL_ROUTES = {
+    "response": GROQ_LLM_MODEL,
+    "classify": GROQ_CLASSIFIER_MODEL,
+}
+
+RISK_LEVELS = ("low", "medium", "high")
+
+CLASSIFIER_PROMPT = """
+You classify short statements from employees for a workplace well-being service.
+Reply with a JSON object only, of the form {"risk_level": "low" | "medium" | "high", "mood": "<one word>"}.
+Use "high" for signs of crisis, burnout or feeling overwhelmed, "medium" for notable stress or anxiety,
+and "low" otherwise. The mood is a single lower-case word such as calm, happy, stressed, anxious or overwhelmed.
+"""
+
+llm_request_duration = registry.histogram(
+    "llm_request_duration_seconds", "Groq model call latency, including the response body, by model and task",
+    ("model", "task"), PROVIDER_BUCKETS
+)
+llm_errors = registry.counter(
+    "llm_errors_total", "Groq model calls that failed, by model and task", ("model", "task")
+)
+llm_tokens = registry.counter(
+    "llm_tokens_total", "Tokens used by Groq model calls, by model, task and kind (prompt or completion)",
+    ("model", "task", "kind")
+)
+llm_cost = registry.counter(
+    "llm_cost_usd_total", "Cost of Groq model calls in USD at GROQ_MODEL_PRICES, by model and task",
+    ("model", "task")
+)
+
+def _record_usage(model: str, task: str, latency_ms: float, usage: Dict[str, Any], error: bool) -> None:
+    """Record one call's latency, token usage and cost in the LLM metrics"""
+    llm_request_duration.observe(latency_ms / 1000, model, task)
+    if error:
+        llm_errors.inc(model, task)
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    if prompt_tokens:
+        llm_tokens.inc(model, task, "prompt", amount=prompt_tokens)
+    if completion_tokens:
+        llm_tokens.inc(model, task, "completion", amount=completion_tokens)
+    price = GROQ_MODEL_PRICES.get(model)
+    if price and (prompt_tokens or completion_tokens):
+        llm_cost.inc(model, task, amount=(prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000)
+
+async def classify_with_lexicon(transcript: str) -> Dict[str, Any]:
+    """Risk level and mood of a transcript from the lexicon scorer alone, without a model call"""
+    lexicon = await run_cpu(score_transcript, transcript)
+    return {
+        "risk_level": lexicon["risk_level"],
+        "mood": mood_for(lexicon["categories"]),
+        "source": "lexicon"
+    }
+
 class GroqClient:
     def __init__(self):
         self.headers = {
             "Authorization": f"Bearer {GROQ_API_KEY}",
             "Content-Type": "application/json"
         }
-        self.client = httpx.AsyncClient(timeout=60.0)  # Longer timeout for LLM operations
-
-    async def consult_llm(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
-        """Call Groq LLM endpoint to get a response to the prompt"""
-        if not GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
+        self.client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            event_hooks=HTTPX_EVENT_HOOKS, transport=ProviderTransport("groq")
+        )
+        # Latency and token usage of each call made by this client
+        self.calls: List[Dict[str, Any]] = []
 
+    @traced("groq.chat", stage="groq", kind=CLIENT)
+    async def _chat(self, task: str, messages: List[Dict[str, str]], **options) -> Dict[str, Any]:
+        """Send a chat completion to the model routed for task, recording latency and token usage"""
+        model = MODEL_ROUTES[task]
         url = f"{GROQ_API_BASE_URL}/chat/completions"
+        payload = {"model": model, "messages": messages, **options}
         
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        
-        messages.append({"role": "user", "content": prompt})
-        
-        payload = {
-            "model": GROQ_LLM_MODEL,
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 1024
-        }
-        
+        annotate(**{"llm.task": task, "llm.model": model})
+        start = time.perf_counter()
+        usage: Dict[str, Any] = {}
+        error = True
         try:
-            response = await self.client.post(url, headers=self.headers, json=payload)
+            response = await self.client.post(
+                url, headers=self.headers, json=payload, timeout=timeout_for(REQUEST_TIMEOUT)
+            )
             response.raise_for_status()
             result = response.json()
-            
+            usage = result.get("usage") or {}
+            error = False
             return {
                 "response": result["choices"][0]["message"]["content"],
                 "raw_response": result
@@ -48,26 +120,112 @@ class GroqClient:
             return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
         except Exception as e:
             return {"error": f"Error calling Groq LLM: {str(e)}"}
+        finally:
+            latency_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.calls.append({
+                "task": task,
+                "model": model,
+                "latency_ms": latency_ms,
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0)
+            })
+            _record_usage(model, task, latency_ms, usage, error)
+            annotate(**{"llm.total_tokens": usage.get("total_tokens", 0)})
 
-    async def transcribe_audio(self, audio_data: bytes) -> Dict[str, Any]:
-        """Call Groq STT endpoint to transcribe audio"""
+    @traced("groq.consult_llm", stage="groq")
+    async def consult_llm(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Call Groq LLM endpoint to get a response to the prompt"""
         if not GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY environment variable is not set")
+        
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        
+        messages.append({"role": "user", "content": prompt})
+        
+        return await self._chat("response", messages, temperature=0.7, max_tokens=1024)
+
+    @traced("groq.classify_session", stage="groq")
+    async def classify_session(self, transcript: str) -> Dict[str, Any]:
+        """Classify the risk level and mood of a transcript with the small model.
 
-        # Note: As of my knowledge, Groq doesn't have a native STT API
-        # This is a placeholder for when they add one, or we can switch to another provider
-        # For now, we'll simulate a response
+        The lexicon scorer is always run as well: its result is used when the
+        model is unavailable or returns malformed output, and the model can
+        never lower the risk level the lexicon found.
+
+        Returns:
+            Dictionary with ``risk_level``, ``mood`` and ``source``
+            ("model" or "lexicon")
+        """
+        fallback = await classify_with_lexicon(transcript)
+        if not GROQ_API_KEY:
+            return fallback
         
-        # In a real implementation, you would upload the audio to Groq or another STT service
-        # url = f"{GROQ_API_BASE_URL}/audio/transcriptions"
-        # files = {"file": audio_data}
-        # response = await self.client.post(url, headers=self.headers, files=files)
+        result = await self._chat(
+            "classify",
+            [
+                {"role": "system", "content": CLASSIFIER_PROMPT},
+                {"role": "user", "content": transcript}
+            ],
+            temperature=0,
+            max_tokens=64,
+            response_format={"type": "json_object"}
+        )
+        if "error" in result:
+            return fallback
+        
+        try:
+            classification = json.loads(result["response"])
+            risk_level = str(classification["risk_level"]).lower()
+            mood = str(classification.get("mood") or fallback["mood"]).lower()
+        except (ValueError, KeyError, TypeError):
+            return fallback
+        if risk_level not in RISK_LEVELS:
+            return fallback
         
-        # For now, return a mock response
         return {
-            "transcript": "This is a simulated transcript. In production, this would be the actual transcribed text from the audio.",
-            "confidence": 0.95
+            "risk_level": max(risk_level, fallback["risk_level"], key=RISK_LEVELS.index),
+            "mood": mood,
+            "source": "model"
         }
+
+    @traced("groq.transcribe_audio", stage="groq", kind=CLIENT)
+    async def transcribe_audio(self, audio_data: bytes, filename: str = "audio.wav") -> Dict[str, Any]:
+        """Call Groq STT endpoint to transcribe an audio file"""
+        if not GROQ_API_KEY:
+            raise ValueError("GROQ_API_KEY environment variable is not set")
+
+        url = f"{GROQ_API_BASE_URL}/audio/transcriptions"
+        headers = {"Authorization": self.headers["Authorization"]}
+        
+        start = time.perf_counter()
+        error = True
+        try:
+            response = await self.client.post(
+                url,
+                headers=headers,
+                files={"file": (filename, audio_data)},
+                data={"model": GROQ_STT_MODEL, "response_format": "json"},
+                timeout=timeout_for(REQUEST_TIMEOUT)
+            )
+            response.raise_for_status()
+            transcript = response.json().get("text", "")
+            error = False
+            return {"transcript": transcript}
+        except httpx.HTTPStatusError as e:
+            return {"error": f"HTTP error: {e.response.status_code}", "details": e.response.text}
+        except Exception as e:
+            return {"error": f"Error calling Groq STT: {str(e)}"}
+        finally:
+            latency_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.calls.append({
+                "task": "transcribe",
+                "model": GROQ_STT_MODEL,
+                "latency_ms": latency_ms
+            })
+            _record_usage(GROQ_STT_MODEL, "transcribe", latency_ms, {}, error)
         
     async def close(self):
         """Close the HTTP client"""
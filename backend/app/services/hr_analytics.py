@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from typing import Dict, Any, Iterable, List, Tuple
+
+from ..core.imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Number of recent moods reported in an insight's mood trend
+MOOD_TREND_LENGTH = 5
+
+FEATURE_COLUMNS = ["risk_level", "status", "mood_trend"]
+
+def departments(teams: pd.Series) -> pd.Series:
+    """Derive the department from 'Department/Team' strings for a whole column at once"""
+    return teams.str.split("/", n=1).str[0]
+
+def _group_starts(codes: np.ndarray) -> np.ndarray:
+    """Return the index where each run of equal values starts in a sorted array"""
+    if not len(codes):
+        return np.empty(0, dtype=np.intp)
+    return np.r_[0, np.flatnonzero(codes[1:] != codes[:-1]) + 1]
+
+def _factorize_labels(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode a string column as integer codes, with -1 for missing or empty values"""
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=object)
+    empty = np.flatnonzero(uniques == "")
+    if len(empty):
+        codes[codes == empty[0]] = -1
+    return codes, uniques
+
+def _label_code(uniques: np.ndarray, label: str) -> int:
+    """Return the code of a label, or -2 (never a valid code) if it does not occur"""
+    matches = np.flatnonzero(uniques == label)
+    return int(matches[0]) if len(matches) else -2
+
+def insight_features(sessions: pd.DataFrame) -> pd.DataFrame:
+    """Compute per-employee insight features from verified session rows.
+
+    Args:
+        sessions: One row per verified session with ``employee_id``,
+            ``issuance_date``, ``mood`` and ``risk_level`` columns
+
+    Returns:
+        DataFrame indexed by employee_id with ``risk_level`` (the latest
+        one), ``status`` (derived from the latest and oldest risk levels)
+        and ``mood_trend`` (the most recent moods, newest first)
+    """
+    codes, employees = pd.factorize(sessions["employee_id"])
+    employees = pd.Index(employees, name="employee_id")
+    risks, risk_labels = _factorize_labels(sessions["risk_level"])
+    moods, mood_labels = _factorize_labels(sessions["mood"])
+
+    # Newest session first within each employee; lexsort is stable, so ties keep row order
+    issued = sessions["issuance_date"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    order = np.lexsort((-issued, codes))
+    codes, risks, moods = codes[order], risks[order], moods[order]
+
+    # Latest and oldest risk level, ignoring sessions without one
+    has_risk = risks >= 0
+    risk_codes, risks = codes[has_risk], risks[has_risk]
+    starts = _group_starts(risk_codes)
+    ends = np.append(starts[1:], len(risk_codes)) if len(starts) else starts
+    latest = np.full(len(employees), -1, dtype=np.intp)
+    oldest = np.full(len(employees), -1, dtype=np.intp)
+    count = np.zeros(len(employees), dtype=np.intp)
+    latest[risk_codes[starts]] = risks[starts]
+    oldest[risk_codes[starts]] = risks[ends - 1]
+    count[risk_codes[starts]] = ends - starts
+
+    high = _label_code(risk_labels, "high")
+    medium = _label_code(risk_labels, "medium")
+    low = _label_code(risk_labels, "low")
+    status = np.select(
+        [
+            latest == high,
+            latest == low,
+            (count > 1) & (latest == medium) & (oldest == high),
+        ],
+        ["declining", "excellent", "improving"],
+        default="stable",
+    )
+    risk_level = np.where(count > 0, np.append(risk_labels, None)[latest], "low").astype(object)
+
+    # Most recent moods, ignoring sessions without one, laid out as one padded row per employee
+    has_mood = moods >= 0
+    mood_codes, moods = codes[has_mood], moods[has_mood]
+    starts = _group_starts(mood_codes)
+    sizes = np.diff(np.r_[starts, len(mood_codes)])
+    rank = np.arange(len(mood_codes)) - np.repeat(starts, sizes)
+    recent = rank < MOOD_TREND_LENGTH
+    grid = np.full((len(employees), MOOD_TREND_LENGTH), None, dtype=object)
+    grid[mood_codes[recent], rank[recent]] = mood_labels[moods[recent]]
+    lengths = np.zeros(len(employees), dtype=np.intp)
+    lengths[mood_codes[starts]] = np.minimum(sizes, MOOD_TREND_LENGTH)
+    mood_trend = [row[:length] for row, length in zip(grid.tolist(), lengths.tolist())]
+
+    return pd.DataFrame(
+        {"risk_level": risk_level, "status": status, "mood_trend": mood_trend},
+        index=employees,
+    )
+
+def insight_features_loop(sessions: Iterable[Tuple[str, Any, str, str]]) -> Dict[str, Dict[str, Any]]:
+    """Row-at-a-time reference implementation of insight_features.
+
+    Args:
+        sessions: (employee_id, issuance_date, mood, risk_level) tuples
+
+    Returns:
+        Dictionary mapping employee_id to its ``risk_level``, ``status``
+        and ``mood_trend``
+    """
+    grouped: Dict[str, List[Tuple[Any, str, str]]] = {}
+    for employee_id, issuance_date, mood, risk_level in sessions:
+        grouped.setdefault(employee_id, []).append((issuance_date, mood, risk_level))
+
+    features = {}
+    for employee_id, rows in grouped.items():
+        rows.sort(key=lambda row: row[0], reverse=True)
+        moods = [mood for _, mood, _ in rows if mood]
+        risk_levels = [risk_level for _, _, risk_level in rows if risk_level]
+
+        # Determine status based on risk levels
+        status = "stable"
+        if risk_levels and risk_levels[0] == "high":
+            status = "declining"
+        elif risk_levels and risk_levels[0] == "low":
+            status = "excellent"
+        elif len(risk_levels) > 1 and risk_levels[0] == "medium" and risk_levels[-1] == "high":
+            status = "improving"
+
+        features[employee_id] = {
+            "risk_level": risk_levels[0] if risk_levels else "low",
+            "status": status,
+            "mood_trend": moods[:MOOD_TREND_LENGTH],
+        }
+    return features
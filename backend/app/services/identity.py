@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from ..core.config import settings
+from ..core.metrics import track_cache
+from ..db.snowflake_client import SnowflakeClient
+from .coral import CoralClient
+
+logger = logging.getLogger("ruhani")
+
+ORG_ID = "ruhani"
+ORG_NAME = "Ruhani Organization"
+
+# Sentinel for cache misses, since None is a valid cached value
+MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed time-to-live.
+
+    Safe to use from worker threads (e.g. code run with asyncio.to_thread)
+    as well as the event loop.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or MISSING if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache a value for ttl seconds (the cache's TTL by default), evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class IdentityCache:
+    """Process-wide cache of organization and employee decentralized identifiers.
+
+    Employee DIDs are kept in a TTL-bound LRU cache. "Not found" answers are
+    kept for negative_ttl only, since an employee onboarded through another
+    worker is only remembered by that worker. Failed lookups are not cached.
+    The organization DID is bootstrapped once per process under a lock, so
+    concurrent first requests share a single lookup or creation, and only a
+    DID read back from Snowflake is kept, so every worker uses the same one.
+    Snowflake calls run in threads, off the event loop.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.employee_dids = TTLCache(max_size, ttl)
+        self.negative_ttl = negative_ttl
+        self._org_did: Optional[str] = None
+        self._org_lock = asyncio.Lock()
+
+    async def get_org_did(self) -> str:
+        """Get the organization DID, creating and storing it on first use"""
+        if self._org_did:
+            return self._org_did
+        async with self._org_lock:
+            if not self._org_did:
+                self._org_did = await self._bootstrap_org_did()
+            return self._org_did
+
+    @staticmethod
+    def _load_org_did(snowflake_client: SnowflakeClient) -> Optional[str]:
+        """The stored organization DID, or None if there is none; raises if it cannot be read"""
+        result = snowflake_client.execute(
+            "SELECT did FROM organization WHERE id = %s", (ORG_ID,)
+        )
+        if result is None:
+            raise RuntimeError("Failed to read the organization DID")
+        row = result.fetchone()
+        return row[0] if row and row[0] else None
+
+    async def _bootstrap_org_did(self) -> str:
+        """Load the organization DID from Snowflake, or create and store it if none exists yet"""
+        snowflake_client = await asyncio.to_thread(SnowflakeClient)
+        try:
+            return await self._load_or_create_org_did(snowflake_client)
+        finally:
+            await asyncio.to_thread(snowflake_client.close)
+
+    async def _load_or_create_org_did(self, snowflake_client: SnowflakeClient) -> str:
+        existing = await asyncio.to_thread(self._load_org_did, snowflake_client)
+        if existing:
+            return existing
+
+        # Create new org DID
+        coral_client = CoralClient()
+        try:
+            did_result = await coral_client.create_did(
+                employee_id="ruhani-organization",
+                name=ORG_NAME,
+                email="admin@ruhani.ai"
+            )
+        finally:
+            await coral_client.close()
+
+        if "error" in did_result:
+            # Fall back to a deterministic mock DID
+            org_did = f"did:coral:{hashlib.sha256('ruhani-organization'.encode()).hexdigest()[:16]}"
+        else:
+            org_did = did_result["did"]
+
+        # Insert only if no other worker got there first, then adopt whichever DID won
+        merged = await asyncio.to_thread(
+            snowflake_client.execute,
+            """MERGE INTO organization o
+               USING (SELECT %s AS id, %s AS name, %s AS did, PARSE_JSON(%s) AS did_document) n
+               ON o.id = n.id
+               WHEN NOT MATCHED THEN INSERT (id, name, did, did_document)
+               VALUES (n.id, n.name, n.did, n.did_document)""",
+            (ORG_ID, ORG_NAME, org_did, did_result.get("did_document", {}))
+        )
+        stored = await asyncio.to_thread(self._load_org_did, snowflake_client) if merged is not None else None
+        if not stored:
+            # Another worker may store a different DID; use none until one is stored
+            raise RuntimeError("Failed to store the organization DID")
+        return stored
+
+    async def get_employee_did(self, employee_id: str) -> Optional[str]:
+        """Get an employee's DID, or None if the employee or their DID does not exist"""
+        did = self.employee_dids.get(employee_id)
+        if did is not MISSING:
+            return did
+
+        def lookup() -> Tuple[bool, Optional[str]]:
+            snowflake_client = SnowflakeClient()
+            try:
+                result = snowflake_client.execute(
+                    "SELECT did FROM employees WHERE id = %s", (employee_id,)
+                )
+                if result is None:
+                    return False, None
+                row = result.fetchone()
+                return True, row[0] if row and row[0] else None
+            finally:
+                snowflake_client.close()
+
+        ok, did = await asyncio.to_thread(lookup)
+        # A failed query is not an answer; leave it uncached so the next call retries
+        if ok:
+            self.employee_dids.set(employee_id, did, ttl=None if did else self.negative_ttl)
+        return did
+
+    def remember_employee(self, employee_id: str, did: str) -> None:
+        """Record a newly onboarded employee, replacing any cached "not found" answer"""
+        self.employee_dids.set(employee_id, did)
+
+    def preload_employee_dids(self) -> int:
+        """Load every employee DID in one query and return how many were cached"""
+        snowflake_client = SnowflakeClient()
+        count = 0
+        try:
+            for rows in snowflake_client.iter_batches("SELECT id, did FROM employees WHERE did IS NOT NULL"):
+                for employee_id, did in rows:
+                    self.employee_dids.set(employee_id, did)
+                    count += 1
+        finally:
+            snowflake_client.close()
+        return count
+
+    async def warm_up(self) -> None:
+        """Bootstrap the organization DID and preload employee DIDs before serving traffic"""
+        try:
+            org_did = await self.get_org_did()
+            logger.info(f"Organization DID ready: {org_did}")
+        except Exception as e:
+            logger.warning(f"Organization DID bootstrap failed, will retry on first use: {e}")
+        try:
+            count = await asyncio.to_thread(self.preload_employee_dids)
+            logger.info(f"Preloaded {count} employee DIDs")
+        except Exception as e:
+            logger.warning(f"Employee DID preload failed: {e}")
+
+# Create a global identity cache instance
+identity_cache = IdentityCache(
+    max_size=settings.IDENTITY_CACHE_SIZE,
+    ttl=settings.IDENTITY_CACHE_TTL_SECONDS,
+    negative_ttl=settings.IDENTITY_CACHE_NEGATIVE_TTL_SECONDS
+)
+track_cache("employee_dids", identity_cache.employee_dids)
@@ -0,0 +1,57 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from ..core.tracing import span
+
+StageFunc = Callable[..., Awaitable[Any]]
+
+class Pipeline:
+    """Small dependency-graph executor for async steps.
+
+    Each stage is an async function that receives the results of the stages
+    it depends on as keyword arguments. Stages start as soon as their
+    dependencies finish, so independent steps run concurrently. If any stage
+    fails, the stages still running are cancelled and the error is raised.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[StageFunc, Tuple[str, ...]]] = {}
+
+    def stage(self, name: str, func: StageFunc, depends_on: Iterable[str] = ()) -> "Pipeline":
+        """Register a stage; dependencies must already be registered"""
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dependency!r}")
+        self._stages[name] = (func, depends_on)
+        return self
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Run every stage and return (results, timings in milliseconds) keyed by stage name"""
+        tasks: Dict[str, asyncio.Task] = {}
+        timings: Dict[str, float] = {}
+
+        async def run_stage(name: str, func: StageFunc, depends_on: Tuple[str, ...]) -> Any:
+            inputs = {dependency: await tasks[dependency] for dependency in depends_on}
+            start = time.perf_counter()
+            try:
+                with span(f"pipeline.{name}"):
+                    return await func(**inputs)
+            finally:
+                timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+        # Stages are registered after their dependencies, so every awaited task exists
+        for name, (func, depends_on) in self._stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(name, func, depends_on))
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+        return {name: task.result() for name, task in tasks.items()}, timings
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ..core.config import settings
+from ..core.serialization import dumps_str, loads
+from ..core.metrics import background_job, track_cache
+from .fetchai import FetchAIClient
+
+logger = logging.getLogger("ruhani")
+
+# Most stale entries refreshed per background refresh cycle
+REFRESH_BATCH_SIZE = 50
+
+# Source of the placeholder profile FetchAIClient returns without an API key
+MOCK_SOURCE = "mock_data"
+
+def normalize_profile_url(url: Optional[str]) -> str:
+    """Normalize a profile URL so equivalent spellings share a cache entry.
+
+    Drops the scheme, a leading "www.", query string, fragment and trailing
+    slashes, and lower-cases the rest (GitHub and LinkedIn handles are
+    case-insensitive).
+    """
+    if not url:
+        return ""
+    url = url.strip()
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}".lower()
+
+class ProfileCache:
+    """Persistent cache of FetchAI public-profile lookups.
+
+    Entries are stored in SQLite keyed by the normalized GitHub and LinkedIn
+    URLs. Fresh entries are served directly; stale successful entries are
+    served while a refresh runs in the background; failures are cached for
+    a shorter time so a broken profile is not retried on every request.
+    Mock profiles (no API key) are never stored. Concurrent lookups of the
+    same profile share a single FetchAI call. SQLite is only used from
+    threads, one at a time, so disk I/O never blocks the event loop.
+    """
+
+    def __init__(self, path: str, ttl: float, negative_ttl: float, refresh_interval: float):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._refresher: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the cache database on first use"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS profiles (
+                       key TEXT PRIMARY KEY,
+                       github TEXT,
+                       linkedin TEXT,
+                       payload TEXT NOT NULL,
+                       ok INTEGER NOT NULL,
+                       fetched_at REAL NOT NULL
+                   )"""
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(github: Optional[str], linkedin: Optional[str]) -> str:
+        """Build the cache key for a pair of profile URLs"""
+        return f"github:{normalize_profile_url(github)}|linkedin:{normalize_profile_url(linkedin)}"
+
+    def _load(self, key: str) -> Optional[Tuple[Dict[str, Any], bool, float]]:
+        """Return (payload, ok, fetched_at) for a key, if cached"""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT payload, ok, fetched_at FROM profiles WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        payload = loads(row[0])
+        # Written by versions that cached mock profiles; look the profile up again
+        if payload.get("source") == MOCK_SOURCE:
+            return None
+        return payload, bool(row[1]), row[2]
+
+    def _store(self, key: str, github: Optional[str], linkedin: Optional[str], payload: Dict[str, Any]) -> None:
+        """Store a lookup result, never replacing a good entry with a failure"""
+        if payload.get("source") == MOCK_SOURCE:
+            return
+        ok = "error" not in payload
+        with self._lock:
+            self._write(key, github, linkedin, payload, ok)
+
+    def _write(self, key: str, github: Optional[str], linkedin: Optional[str], payload: Dict[str, Any], ok: bool) -> None:
+        conn = self._db()
+        if ok:
+            conn.execute(
+                "INSERT OR REPLACE INTO profiles (key, github, linkedin, payload, ok, fetched_at) VALUES (?, ?, ?, ?, 1, ?)",
+                (key, github, linkedin, dumps_str(payload), time.time())
+            )
+        else:
+            conn.execute(
+                """INSERT INTO profiles (key, github, linkedin, payload, ok, fetched_at) VALUES (?, ?, ?, ?, 0, ?)
+                   ON CONFLICT(key) DO UPDATE SET payload = excluded.payload, fetched_at = excluded.fetched_at
+                   WHERE profiles.ok = 0""",
+                (key, github, linkedin, dumps_str(payload), time.time())
+            )
+        conn.commit()
+
+    async def fetch_public_info(self, github: Optional[str] = None, linkedin: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch public profile information, from the cache when possible"""
+        key = self.make_key(github, linkedin)
+        cached = await asyncio.to_thread(self._load, key)
+        if cached:
+            payload, ok, fetched_at = cached
+            age = time.time() - fetched_at
+            if ok and age < self.ttl:
+                self.hits += 1
+                return payload
+            if not ok and age < self.negative_ttl:
+                self.hits += 1
+                return payload
+            if ok:
+                # Serve the stale profile and refresh it in the background
+                self.hits += 1
+                self._schedule_refresh(key, github, linkedin)
+                return payload
+        self.misses += 1
+        return await self._fetch(key, github, linkedin)
+
+    async def _fetch(self, key: str, github: Optional[str], linkedin: Optional[str]) -> Dict[str, Any]:
+        """Call FetchAI, sharing one call between concurrent lookups of the same key"""
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_and_store(key, github, linkedin))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _fetch_and_store(self, key: str, github: Optional[str], linkedin: Optional[str]) -> Dict[str, Any]:
+        """Call FetchAI and cache the outcome"""
+        fetchai_client = FetchAIClient()
+        try:
+            payload = await fetchai_client.fetch_public_info(github=github, linkedin=linkedin)
+        except Exception as e:
+            payload = {"error": f"Error fetching from FetchAI: {str(e)}"}
+        finally:
+            await fetchai_client.close()
+        await asyncio.to_thread(self._store, key, github, linkedin, payload)
+        return payload
+
+    def _schedule_refresh(self, key: str, github: Optional[str], linkedin: Optional[str]) -> None:
+        """Refresh an entry in the background unless a fetch is already running"""
+        if key not in self._in_flight:
+            asyncio.ensure_future(self._fetch(key, github, linkedin))
+
+    @background_job
+    async def refresh_stale(self) -> int:
+        """Refresh up to REFRESH_BATCH_SIZE stale successful entries and return how many"""
+        rows = await asyncio.to_thread(self._stale_entries)
+        for key, github, linkedin in rows:
+            await self._fetch(key, github, linkedin)
+        return len(rows)
+
+    def _stale_entries(self) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        with self._lock:
+            return self._db().execute(
+                "SELECT key, github, linkedin FROM profiles WHERE ok = 1 AND fetched_at < ? ORDER BY fetched_at LIMIT ?",
+                (time.time() - self.ttl, REFRESH_BATCH_SIZE)
+            ).fetchall()
+
+    async def _refresh_loop(self) -> None:
+        """Periodically refresh stale entries until cancelled"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                refreshed = await self.refresh_stale()
+                if refreshed:
+                    logger.info(f"Refreshed {refreshed} stale FetchAI profiles")
+            except Exception as e:
+                logger.warning(f"FetchAI profile refresh failed: {e}")
+
+    def start(self) -> None:
+        """Start the background refresher"""
+        if self._refresher is None:
+            self._refresher = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop the background refresher, let running fetches store their results and close the database"""
+        if self._in_flight:
+            await asyncio.wait(list(self._in_flight.values()), timeout=timeout)
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Create a global profile cache instance
+profile_cache = ProfileCache(
+    path=settings.PROFILE_CACHE_PATH,
+    ttl=settings.PROFILE_CACHE_TTL_SECONDS,
+    negative_ttl=settings.PROFILE_CACHE_NEGATIVE_TTL_SECONDS,
+    refresh_interval=settings.PROFILE_CACHE_REFRESH_INTERVAL_SECONDS
+)
+track_cache("fetchai_profiles", profile_cache)
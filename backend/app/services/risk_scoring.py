@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, Any, Iterable, List, Tuple
+
+from ..core.imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Lexicon categories as (weight, terms). Negative weights lower the risk score.
+LEXICON: Dict[str, Tuple[float, List[str]]] = {
+    "crisis": (5.0, [
+        "suicidal", "suicide", "self harm", "self-harm", "hurt myself", "end it all",
+        "no way out", "can't go on", "cannot go on", "hopeless", "worthless",
+    ]),
+    "overwhelm": (3.0, [
+        "overwhelmed", "overwhelming", "can't handle", "cannot handle", "can't cope",
+        "cannot cope", "burned out", "burnt out", "burnout", "breaking point",
+        "falling apart", "exhausted", "drowning",
+    ]),
+    "anxiety": (2.0, [
+        "anxiety", "anxious", "panic", "panicking", "panic attack", "dread",
+        "terrified", "scared", "nervous", "worried", "worrying",
+    ]),
+    "stress": (1.5, [
+        "stressed", "stressful", "stress", "frustrated", "irritable", "on edge",
+        "can't sleep", "cannot sleep", "insomnia", "not sleeping", "tired",
+    ]),
+    "workload": (0.5, [
+        "deadline", "deadlines", "workload", "pressure", "overtime", "behind schedule",
+        "too much work", "requirements keep changing",
+    ]),
+    "positive": (-1.0, [
+        "calm", "relaxed", "happy", "better", "great", "good", "rested",
+        "motivated", "supported", "fine",
+    ]),
+}
+
+# Words that negate a lexicon term appearing shortly after them in the same clause
+NEGATIONS = ["not", "no", "never", "don't", "dont", "doesn't", "didn't", "isn't",
+             "wasn't", "aren't", "without", "hardly", "barely", "nor"]
+NEGATION_WINDOW = 3
+# A negated term contributes this fraction of its weight with the opposite sign
+NEGATION_FACTOR = 0.5
+
+# Mood reported for the dominant lexicon category of a transcript
+CATEGORY_MOODS = {
+    "crisis": "distressed",
+    "overwhelm": "overwhelmed",
+    "anxiety": "anxious",
+    "stress": "stressed",
+    "workload": "stressed",
+    "positive": "positive",
+}
+
+# Score thresholds for each risk level
+HIGH_RISK_SCORE = 3.0
+MEDIUM_RISK_SCORE = 1.5
+
+# Joins transcripts for batch scanning; the period stops negation crossing texts
+BATCH_SEPARATOR = "\n.\n"
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Build a regex matching any of the terms, factored into a prefix trie.
+
+    Python's regex engine tries alternatives one by one, so sharing common
+    prefixes ("anxi(?:ety|ous)") makes a large lexicon much cheaper to scan
+    than a flat alternation. Longer terms are preferred over their prefixes.
+    """
+    root: Dict[str, Any] = {}
+    for term in terms:
+        node = root
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(root)
+
+CATEGORIES = list(LEXICON)
+WEIGHTS = [weight for weight, _ in LEXICON.values()]
+TERM_CATEGORY = {term: index for index, (_, terms) in enumerate(LEXICON.values()) for term in terms}
+NEGATION_WORDS = frozenset(NEGATIONS)
+
+LEXICON_PATTERN = re.compile(rf"\b{_trie_pattern(TERM_CATEGORY)}\b")
+CLAUSE_CHARS = ".!?;,\n"
+CLAUSE_PATTERN = re.compile(f"[{re.escape(CLAUSE_CHARS)}]")
+WORD_PATTERN = re.compile(r"[\w']+")
+WORD_CHAR_PATTERN = re.compile(r"[\w']")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Batch scoring compares words as integers: up to KEY_CHARS characters of a
+# word, one byte each, split over a (low, high) pair of 64-bit keys
+KEY_CHARS = 16
+
+def _key(word: str) -> Tuple[int, int]:
+    """Pack an ASCII word into its (low, high) key pair"""
+    packed = sum(ord(char) << 8 * index for index, char in enumerate(word))
+    return packed & (2 ** 64 - 1), packed >> 64
+
+# Lexicon terms as their \w tokens, indexes into the sorted token keys, and
+# the exact text between them ("can't go on" is can/t/go/on joined by "'",
+# " " and " ")
+LEXICON_TOKEN_KEYS = sorted({_key(token) for term in TERM_CATEGORY for token in TOKEN_PATTERN.findall(term)})
+TERM_SEQUENCES = [
+    (
+        [LEXICON_TOKEN_KEYS.index(_key(token)) for token in TOKEN_PATTERN.findall(term)],
+        [(len(gap), _key(gap)[0]) for gap in TOKEN_PATTERN.split(term)[1:-1]],
+        len(term),
+        category,
+    )
+    for term, category in TERM_CATEGORY.items()
+]
+NEGATION_KEYS = sorted(_key(word) for word in NEGATION_WORDS)
+
+def _normalize(text: str) -> str:
+    """Lower-case text and unify typographic apostrophes"""
+    return text.lower().replace("’", "'")
+
+def _is_negated(text: str, start: int) -> bool:
+    """Whether a negation word occurs within NEGATION_WINDOW words before start, in the same clause"""
+    clause_start = max(text.rfind(char, 0, start) for char in CLAUSE_CHARS) + 1
+    words = WORD_PATTERN.findall(text, clause_start, start)
+    return not NEGATION_WORDS.isdisjoint(words[-NEGATION_WINDOW:])
+
+def _scan(text: str) -> Tuple[List[int], List[int], List[bool]]:
+    """Return the start offset, category index and negation of every lexicon match"""
+    starts, categories, negated = [], [], []
+    for match in LEXICON_PATTERN.finditer(text):
+        starts.append(match.start())
+        categories.append(TERM_CATEGORY[match.group()])
+        negated.append(_is_negated(text, match.start()))
+    return starts, categories, negated
+
+def _char_mask(chars: np.ndarray, codes: np.ndarray, pattern: re.Pattern) -> np.ndarray:
+    """Mask of the characters matching a single-character pattern"""
+    mask = np.array([pattern.match(chr(code)) is not None for code in range(128)] + [False])[chars]
+    wide = np.flatnonzero(chars == 128)
+    if len(wide):
+        unique, inverse = np.unique(codes[wide], return_inverse=True)
+        mask[wide] = np.array([pattern.match(chr(code)) is not None for code in unique.tolist()])[inverse]
+    return mask
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end offsets of the runs of True in a mask"""
+    edges = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def _lookup(windows: np.ndarray, starts: np.ndarray, ends: np.ndarray, keys: List[Tuple[int, int]]) -> np.ndarray:
+    """Index into the sorted keys of the text between each start and end, or -1 where it has none"""
+    indexes = np.full(len(starts), -1, dtype=np.intp)
+    masks = np.array([2 ** (8 * count) - 1 for count in range(9)], dtype=np.uint64)
+    lengths = ends - starts
+    # Only the texts whose low halves have a key need their high halves packed
+    candidates = np.flatnonzero(lengths <= KEY_CHARS)
+    low = windows[starts[candidates]] & masks[np.minimum(lengths[candidates], 8)]
+    key_low = np.array([key[0] for key in keys], dtype=np.uint64)
+    first = np.searchsorted(key_low, low)
+    last = np.searchsorted(key_low, low, side="right")
+    found = last > first
+    candidates, first, last = candidates[found], first[found], last[found]
+    high = windows[starts[candidates] + 8] & masks[np.clip(lengths[candidates] - 8, 0, 8)]
+
+    key_high = np.array([key[1] for key in keys], dtype=np.uint64)
+    # Keys sharing their low half sit next to each other; try each in turn
+    for offset in range(int((last - first).max(initial=0))):
+        index = first + offset
+        found = (index < last) & (key_high[np.minimum(index, len(keys) - 1)] == high)
+        indexes[candidates[found]] = index[found]
+    return indexes
+
+def _scan_batch(text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Array version of _scan for long texts.
+
+    Instead of running the lexicon regex and re-reading the context of every
+    match, the text's \\w tokens and [\\w'] words are located with array
+    operations and compared as packed integer keys: a lexicon term matches
+    where its tokens follow each other with the same text between them, and
+    is negated when a negation word lies between the start of its clause (or
+    NEGATION_WINDOW words back, whichever is later) and the match. Matches
+    and negation agree exactly with _scan.
+    """
+    # One byte per character; non-ASCII characters become 128, which no key contains
+    if text.isascii():
+        codes = chars = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    else:
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        chars = np.minimum(codes, 128).astype(np.uint8)
+    # The eight characters from every position, read as one little-endian integer key
+    padded = np.concatenate([chars, np.zeros(16, dtype=np.uint8)])
+    windows = np.ndarray((len(chars) + 8,), dtype="<u8", buffer=padded, strides=(1,))
+
+    is_word = _char_mask(chars, codes, WORD_CHAR_PATTERN)
+    token_starts, token_ends = _runs(is_word & (chars != ord("'")))
+    tokens = _lookup(windows, token_starts, token_ends, LEXICON_TOKEN_KEYS)
+
+    hits = np.flatnonzero(tokens >= 0)
+    hit_tokens = tokens[hits]
+    positions, lengths, categories = [], [], []
+    for term_tokens, term_gaps, length, category in TERM_SEQUENCES:
+        candidates = hits[hit_tokens == term_tokens[0]]
+        for offset, (token, (gap_length, gap)) in enumerate(zip(term_tokens[1:], term_gaps), start=1):
+            candidates = candidates[candidates + offset < len(tokens)]
+            candidates = candidates[tokens[candidates + offset] == token]
+            gap_starts = token_ends[candidates + offset - 1]
+            same_gap = (token_starts[candidates + offset] - gap_starts == gap_length) & (
+                windows[gap_starts] & np.uint64(2 ** (8 * gap_length) - 1) == gap)
+            candidates = candidates[same_gap]
+        positions.append(candidates)
+        lengths.append(np.full(len(candidates), length))
+        categories.append(np.full(len(candidates), category, dtype=np.intp))
+    positions, lengths, categories = np.concatenate(positions), np.concatenate(lengths), np.concatenate(categories)
+
+    # Like the regex, take the longest term at each token and skip terms inside an earlier match
+    order = np.lexsort((-lengths, positions))
+    positions, lengths, categories = positions[order], lengths[order], categories[order]
+    longest = np.diff(positions, prepend=-1) != 0
+    starts = token_starts[positions[longest]]
+    ends = starts + lengths[longest]
+    categories = categories[longest]
+    if np.any(starts[1:] < ends[:-1]):
+        keep, end = np.zeros(len(starts), dtype=bool), 0
+        for index, (start, stop) in enumerate(zip(starts.tolist(), ends.tolist())):
+            if start >= end:
+                keep[index], end = True, stop
+        starts, categories = starts[keep], categories[keep]
+
+    word_starts, word_ends = _runs(is_word)
+    separators = np.flatnonzero(_char_mask(chars, codes, CLAUSE_PATTERN))
+    previous = separators[np.maximum(np.searchsorted(separators, starts) - 1, 0)] if len(separators) else starts
+    # Words are numbered from 0; an apostrophe glued to a match's front counts as a word, as in _is_negated
+    clause_first = np.where(previous < starts, np.searchsorted(word_starts, previous), 0)
+    words_before = np.searchsorted(word_starts, starts)
+    window = words_before[:, None] - np.arange(1, NEGATION_WINDOW + 1)
+    in_clause = window >= clause_first[:, None]
+    negations = np.zeros(window.shape, dtype=bool)
+    words = window[in_clause]
+    negations[in_clause] = _lookup(windows, word_starts[words], word_ends[words], NEGATION_KEYS) >= 0
+    return starts, categories, negations.any(axis=1)
+
+def risk_level_for(score: float) -> str:
+    """Map a risk score to a risk level"""
+    if score >= HIGH_RISK_SCORE:
+        return "high"
+    if score >= MEDIUM_RISK_SCORE:
+        return "medium"
+    return "low"
+
+def mood_for(categories: Dict[str, int]) -> str:
+    """Mood for the category with the most weighted matches, or "neutral" without matches"""
+    if not categories:
+        return "neutral"
+    dominant = max(categories, key=lambda category: abs(LEXICON[category][0]) * categories[category])
+    return CATEGORY_MOODS[dominant]
+
+def score_transcript(transcript: str) -> Dict[str, Any]:
+    """Score a single transcript against the risk lexicon.
+
+    Args:
+        transcript: Free text from a session
+
+    Returns:
+        Dictionary with the numeric ``score``, the ``risk_level`` and the
+        number of (non-negated) matches per ``categories`` entry
+    """
+    score = 0.0
+    counts: Dict[str, int] = {}
+    _, categories, negated = _scan(_normalize(transcript or ""))
+    for category, is_negated in zip(categories, negated):
+        weight = WEIGHTS[category]
+        if is_negated:
+            score -= weight * NEGATION_FACTOR
+        else:
+            score += weight
+            counts[CATEGORIES[category]] = counts.get(CATEGORIES[category], 0) + 1
+    score = round(float(score), 2)
+    return {"score": score, "risk_level": risk_level_for(score), "categories": counts}
+
+def score_batch(transcripts: Iterable[str]) -> pd.DataFrame:
+    """Score many transcripts at once.
+
+    The transcripts are joined and scanned once with array operations
+    (see _scan_batch) rather than a regex pass and a negation check per
+    match; matches are mapped back to their transcript by offset and
+    weighted and summed, giving the same scores as score_transcript.
+
+    Args:
+        transcripts: Transcripts to score; missing values score as empty text
+
+    Returns:
+        DataFrame aligned with the input with ``score`` and ``risk_level``
+        columns and one match-count column per lexicon category
+    """
+    texts = [_normalize(text) if isinstance(text, str) else "" for text in transcripts]
+    offsets = np.cumsum([0] + [len(text) + len(BATCH_SEPARATOR) for text in texts[:-1]])
+    starts, categories, negated = _scan_batch(BATCH_SEPARATOR.join(texts))
+
+    rows = np.searchsorted(offsets, starts, side="right") - 1
+
+    scores = np.zeros(len(texts))
+    np.add.at(scores, rows, np.asarray(WEIGHTS)[categories] * np.where(negated, -NEGATION_FACTOR, 1.0))
+    counts = np.zeros((len(texts), len(CATEGORIES)), dtype=np.int64)
+    np.add.at(counts, (rows[~negated], categories[~negated]), 1)
+
+    scores = scores.round(2)
+    result = pd.DataFrame(counts, columns=CATEGORIES)
+    result.insert(0, "score", scores)
+    result.insert(1, "risk_level", np.select(
+        [scores >= HIGH_RISK_SCORE, scores >= MEDIUM_RISK_SCORE],
+        ["high", "medium"],
+        default="low",
+    ))
+    return result
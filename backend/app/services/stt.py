@@ -0,0 +1,198 @@
+import asyncio
+import io
+import logging
+import wave
+from typing import AsyncIterator, Dict, Any, List, Optional, Type
+
+from ..core.config import settings
+from ..core.executor import run_cpu
+from .audio import TARGET_SAMPLE_RATE, find_pause, trim_pcm_async
+from .groq import GroqClient
+
+logger = logging.getLogger("ruhani")
+
+# Streaming audio is 16-bit little-endian mono PCM
+SAMPLE_WIDTH = 2
+DEFAULT_SAMPLE_RATE = 16000
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap 16-bit mono PCM in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+class STTBackend:
+    """Speech-to-text backend interface.
+
+    Backends receive one segment of 16-bit mono PCM at a time and return its
+    text. They are created per stream and closed when the stream ends.
+    """
+
+    async def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class StubSTTBackend(STTBackend):
+    """Local backend that needs no API key, for development and tests.
+
+    Returns scripted segment texts in order when given, otherwise a
+    placeholder describing the segment.
+    """
+
+    def __init__(self, script: Optional[List[str]] = None):
+        self.script = list(script or [])
+        self.segments = 0
+
+    async def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        self.segments += 1
+        if self.script:
+            return self.script.pop(0)
+        seconds = len(pcm) / (SAMPLE_WIDTH * sample_rate)
+        return f"[segment {self.segments}: {seconds:.1f}s of speech]"
+
+class GroqSTTBackend(STTBackend):
+    """Backend that sends each segment to Groq's transcription endpoint"""
+
+    def __init__(self):
+        self.client = GroqClient()
+
+    async def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        result = await self.client.transcribe_audio(pcm_to_wav(pcm, sample_rate), filename="segment.wav")
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result["transcript"]
+
+    async def close(self) -> None:
+        await self.client.close()
+
+STT_BACKENDS: Dict[str, Type[STTBackend]] = {
+    "stub": StubSTTBackend,
+    "groq": GroqSTTBackend,
+}
+
+def get_stt_backend(name: Optional[str] = None) -> STTBackend:
+    """Create the configured STT backend; without a setting, Groq is used when its API key is set"""
+    name = name or settings.STT_BACKEND or ("groq" if settings.GROQ_API_KEY else "stub")
+    if name not in STT_BACKENDS:
+        raise ValueError(f"Unknown STT backend: {name}")
+    return STT_BACKENDS[name]()
+
+class StreamingTranscriber:
+    """Incrementally transcribe audio that arrives in chunks.
+
+    Once about ``segment_seconds`` of audio is buffered, it is cut into a
+    segment at the last pause in speech found by detect_speech, or after
+    ``max_segment_seconds`` if the speaker never pauses. Each segment is
+    trimmed of silence and handed to the STT backend while more audio is
+    still arriving, and its text is published as a partial transcript.
+    Segments without speech never reach the backend. When the speaker
+    finishes, only the final short segment is left to transcribe.
+
+    At most ``max_buffer_seconds`` of audio may wait to be transcribed;
+    feeding more raises BufferError.
+    """
+
+    def __init__(self, backend: STTBackend, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                 segment_seconds: float = settings.STT_SEGMENT_SECONDS,
+                 max_segment_seconds: float = settings.STT_MAX_SEGMENT_SECONDS,
+                 max_buffer_seconds: float = settings.STT_MAX_BUFFER_SECONDS):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.segment_bytes = int(segment_seconds * sample_rate) * SAMPLE_WIDTH
+        assert self.segment_bytes > 0, "segments must hold at least one sample"
+        self.max_segment_bytes = max(int(max_segment_seconds * sample_rate) * SAMPLE_WIDTH, self.segment_bytes)
+        self.max_buffer_bytes = max(int(max_buffer_seconds * sample_rate) * SAMPLE_WIDTH, self.max_segment_bytes)
+        self.texts: List[str] = []
+        self._buffer = bytearray()
+        # Bytes fed but not yet cut into a segment, queued or buffered
+        self._pending = 0
+        self._chunks: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+        self._partials: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+        self._worker = asyncio.ensure_future(self._transcribe_segments())
+
+    @property
+    def transcript(self) -> str:
+        """Text transcribed so far"""
+        return " ".join(text for text in self.texts if text)
+
+    def feed(self, chunk: bytes) -> None:
+        """Add a chunk of PCM audio to be segmented and transcribed"""
+        if self._pending + len(chunk) > self.max_buffer_bytes:
+            raise BufferError(f"More than {self.max_buffer_bytes} bytes of audio waiting to be transcribed")
+        self._pending += len(chunk)
+        self._chunks.put_nowait(chunk)
+
+    def finish(self) -> None:
+        """Transcribe the remaining audio; no more chunks may be fed afterwards"""
+        self._chunks.put_nowait(None)
+
+    async def partials(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a partial transcript after each segment, ending once finish() has been processed"""
+        while True:
+            partial = await self._partials.get()
+            if partial is None:
+                break
+            yield partial
+        await self._worker
+
+    async def _next_segment(self) -> Optional[bytes]:
+        """Cut the next segment from the buffer, or None until enough audio has arrived"""
+        if len(self._buffer) < self.segment_bytes:
+            return None
+        cut = await run_cpu(find_pause, bytes(self._buffer), self.sample_rate)
+        if not cut:
+            if len(self._buffer) < self.max_segment_bytes:
+                return None
+            cut = self.max_segment_bytes
+        segment = bytes(self._buffer[:cut])
+        del self._buffer[:cut]
+        self._pending -= cut
+        return segment
+
+    async def _transcribe(self, segment: bytes) -> None:
+        """Transcribe the speech in a segment and publish it as a partial transcript"""
+        speech = await trim_pcm_async(segment, self.sample_rate)
+        if not speech:
+            return
+        text = (await self.backend.transcribe(speech, TARGET_SAMPLE_RATE)).strip()
+        self.texts.append(text)
+        self._partials.put_nowait({
+            "segment": len(self.texts),
+            "text": text,
+            "transcript": self.transcript
+        })
+
+    async def _transcribe_segments(self) -> None:
+        """Segment fed audio and transcribe the segments in order"""
+        try:
+            while True:
+                chunk = await self._chunks.get()
+                if chunk is None:
+                    break
+                self._buffer.extend(chunk)
+                while (segment := await self._next_segment()) is not None:
+                    await self._transcribe(segment)
+            # Drop a trailing partial sample so the last segment stays 16-bit aligned
+            remainder = len(self._buffer) - len(self._buffer) % SAMPLE_WIDTH
+            if remainder:
+                await self._transcribe(bytes(self._buffer[:remainder]))
+            self._buffer.clear()
+            self._pending = 0
+        finally:
+            self._partials.put_nowait(None)
+
+    async def close(self) -> None:
+        """Stop transcribing and release the backend"""
+        if not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+        await self.backend.close()
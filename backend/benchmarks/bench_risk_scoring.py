@@ -0,0 +1,76 @@
+"""Benchmark the batch risk scorer against scoring transcripts one at a time.
+
+Run from the backend directory:
+
+    python benchmarks/bench_risk_scoring.py --transcripts 20000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the backend directory to sys.path to allow imports
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import risk_scoring
+
+FILLER = [
+    "the sprint review went long", "my manager asked about the roadmap", "we shipped the release",
+    "the team had lunch together", "I spent the day in meetings", "code review took most of the afternoon",
+]
+PHRASES = [
+    "I feel stressed", "I'm not stressed", "I am overwhelmed", "I don't feel anxious", "I'm worried",
+    "I can't sleep", "the deadline is close", "I feel calm", "I'm not fine", "I see no way out",
+    "I'm exhausted", "things are better",
+]
+
+def generate_transcripts(count: int, seed: int = 42) -> list:
+    """Generate synthetic session transcripts mixing neutral filler and lexicon phrases"""
+    rng = random.Random(seed)
+    transcripts = []
+    for _ in range(count):
+        sentences = rng.sample(FILLER, 3) + rng.sample(PHRASES, rng.randint(0, 3))
+        rng.shuffle(sentences)
+        transcripts.append(". ".join(sentences) + ".")
+    return transcripts
+
+def best_of(repeat: int, fn, *args):
+    """Return the fastest wall-clock time of fn(*args) and its last result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def score_each(transcripts: list) -> list:
+    """Score transcripts one call at a time"""
+    return [risk_scoring.score_transcript(transcript) for transcript in transcripts]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcripts", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    transcripts = generate_transcripts(args.transcripts)
+    each_time, each = best_of(args.repeat, score_each, transcripts)
+    batch_time, batch = best_of(args.repeat, risk_scoring.score_batch, transcripts)
+
+    # Both paths must agree before their timings mean anything
+    mismatches = sum(
+        1 for row, (score, level) in zip(each, zip(batch["score"], batch["risk_level"]))
+        if row["score"] != score or row["risk_level"] != level
+    )
+    if mismatches:
+        sys.exit(f"{mismatches} transcripts scored differently by the batch and single scorers")
+
+    print(f"transcripts: {len(transcripts)}")
+    print(f"one at a time: {each_time * 1000:.1f} ms ({len(transcripts) / each_time:,.0f} transcripts/s)")
+    print(f"batch:         {batch_time * 1000:.1f} ms ({len(transcripts) / batch_time:,.0f} transcripts/s)")
+    print(f"speedup:       {each_time / batch_time:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark the orjson serialization layer against the stdlib on credential-heavy payloads.
+
+Run from the backend directory:
+
+    python benchmarks/bench_serialization.py --credentials 5000
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the backend directory to sys.path to allow imports
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core import serialization
+
+def make_credential(index: int) -> dict:
+    """Build a session credential shaped like CoralClient.issue_credential output"""
+    issued = datetime(2024, 1, 1) + timedelta(minutes=index)
+    return {
+        "@context": ["https://www.w3.org/2018/credentials/v1", "https://coral.protocol/credentials/v1"],
+        "id": f"urn:uuid:{uuid.UUID(int=index)}",
+        "type": ["VerifiableCredential", "WellnessSessionCredential"],
+        "issuer": "did:coral:0123456789abcdef",
+        "issuanceDate": issued.isoformat(),
+        "expirationDate": (issued + timedelta(days=90)).isoformat(),
+        "credentialSubject": {
+            "id": f"did:coral:{index:016x}",
+            "sessionId": str(uuid.UUID(int=index + 1)),
+            "mood": "stressed",
+            "riskLevel": ["low", "medium", "high"][index % 3],
+            # Apostrophes are common in free text and break str(dict).replace("'", '"')
+            "note": "Employee's check-in; they're under deadline pressure",
+            "summaryHash": f"{index:064x}",
+        },
+        "proof": {
+            "type": "Ed25519Signature2020",
+            "created": issued.isoformat(),
+            "verificationMethod": "did:coral:0123456789abcdef#keys-1",
+            "proofPurpose": "assertionMethod",
+            "proofValue": "z" + "A" * 86,
+        },
+    }
+
+def best_of(repeat: int, fn, *args):
+    """Return the fastest wall-clock time of fn(*args) and its last result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def report(name: str, count: int, baseline: float, optimized: float) -> None:
+    print(f"{name:<28} {baseline * 1000:>9.1f} ms {optimized * 1000:>9.1f} ms "
+          f"{count / optimized:>12,.0f}/s {baseline / optimized:>7.1f}x")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--credentials", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    credentials = [make_credential(index) for index in range(args.credentials)]
+    count = len(credentials)
+
+    # Old VARIANT binding versus serializing for PARSE_JSON(%s)
+    replaced_time, replaced = best_of(args.repeat, lambda: [str(c).replace("'", '"') for c in credentials])
+    stdlib_time, _ = best_of(args.repeat, lambda: [json.dumps(c) for c in credentials])
+    orjson_time, bound = best_of(args.repeat, lambda: [serialization.dumps_str(c) for c in credentials])
+    invalid = 0
+    for text in replaced:
+        try:
+            json.loads(text)
+        except ValueError:
+            invalid += 1
+
+    # Parsing VARIANT columns on HR reads
+    loads_stdlib, _ = best_of(args.repeat, lambda: [json.loads(text) for text in bound])
+    loads_orjson, _ = best_of(args.repeat, lambda: [serialization.load_variant(text) for text in bound])
+
+    # Rendering a response body that carries the credentials
+    body = {"credentials": credentials}
+    render_stdlib, _ = best_of(args.repeat, lambda: JSONResponse(jsonable_encoder(body)).body)
+    render_orjson, _ = best_of(args.repeat, lambda: serialization.ORJSONResponse(body).body)
+
+    # Canonical JSON for claim digests
+    canonical_stdlib, _ = best_of(args.repeat, lambda: [
+        json.dumps(c, sort_keys=True, separators=(",", ":"), default=str).encode() for c in credentials
+    ])
+    canonical_orjson, _ = best_of(args.repeat, lambda: [serialization.canonical_dumps(c) for c in credentials])
+
+    print(f"credentials: {count}")
+    print(f"{'operation':<28} {'stdlib':>12} {'orjson':>12} {'throughput':>14} {'speedup':>8}")
+    report("bind (vs str().replace)", count, replaced_time, orjson_time)
+    report("bind (vs json.dumps)", count, stdlib_time, orjson_time)
+    report("parse VARIANT", count, loads_stdlib, loads_orjson)
+    report("render response", count, render_stdlib, render_orjson)
+    report("canonical JSON", count, canonical_stdlib, canonical_orjson)
+    print(f"str().replace produced invalid JSON for {invalid} of {count} credentials")
+
+if __name__ == "__main__":
+    main()
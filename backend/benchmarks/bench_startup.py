@@ -0,0 +1,132 @@
+"""Benchmark cold start: import time of app.main per module, and process start to first response.
+
+Run from the backend directory:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --check   # exit 1 if a budget is exceeded, e.g. in CI
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Modules that should only be imported on first use (see app/core/imports.py)
+LAZY_MODULES = ["pandas", "numpy", "pyarrow", "snowflake.connector", "jwt"]
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+
+def import_wall_times(runs: int) -> List[float]:
+    """Seconds to import app.main in fresh interpreters"""
+    code = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+    return [float(run_python(code).stdout.split()[-1]) for _ in range(runs)]
+
+def import_profile() -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    """(module, self us, cumulative us) for every module app.main imports, from -X importtime,
+    and the lazily imported modules that were imported anyway"""
+    check = f"import sys, app.main; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = run_python(check, "-X", "importtime")
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules, [name for name in result.stdout.strip().split(",") if name]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for(url: str, started: float, timeout: float, status: int = 200) -> Optional[float]:
+    """Seconds from started until url answers with status, or None after timeout"""
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == status:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    return None
+
+def first_response(ready_timeout: float) -> Tuple[Optional[float], Optional[float]]:
+    """Seconds from starting a uvicorn worker to its first /health/live and /health/ready responses"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy()
+    )
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/health/live", started, timeout=30)
+        ready = wait_for(f"http://127.0.0.1:{port}/health/ready", started, timeout=ready_timeout) if live else None
+        return live, ready
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def by_package(modules: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Self time summed per top-level package"""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time the import in")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules and packages to list")
+    parser.add_argument("--ready-timeout", type=float, default=10.0,
+                        help="Seconds to wait for /health/ready (needs a reachable, migrated Snowflake)")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if a budget below is exceeded")
+    parser.add_argument("--import-budget-ms", type=float, default=1000.0,
+                        help="Budget for the median import time of app.main")
+    parser.add_argument("--first-response-budget-ms", type=float, default=2500.0,
+                        help="Budget for process start to the first /health/live response")
+    args = parser.parse_args()
+
+    modules, eager = import_profile()
+    print(f"Slowest modules imported by app.main (-X importtime, cumulative):")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda module: module[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms {self_us / 1000:>8.1f} ms self  {name}")
+    print("Self time per package:")
+    for package, self_us in sorted(by_package(modules).items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:>8.1f} ms  {package}")
+
+    times = import_wall_times(args.runs)
+    import_ms = statistics.median(times) * 1000
+    print(f"import app.main: median {import_ms:.0f} ms, best {min(times) * 1000:.0f} ms over {args.runs} runs")
+
+    live, ready = first_response(args.ready_timeout)
+    live_ms = live * 1000 if live is not None else None
+    print(f"start to first /health/live: {f'{live_ms:.0f} ms' if live_ms is not None else 'no response'}")
+    print(f"start to /health/ready: {f'{ready * 1000:.0f} ms' if ready is not None else f'not ready within {args.ready_timeout:g} s'}")
+
+    failures = []
+    if eager:
+        failures.append(f"imported at startup instead of on first use: {', '.join(eager)}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import took {import_ms:.0f} ms, budget {args.import_budget_ms:.0f} ms")
+    if live_ms is None or live_ms > args.first_response_budget_ms:
+        failures.append(f"first response took {live_ms or float('inf'):.0f} ms, budget {args.first_response_budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    if args.check and failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
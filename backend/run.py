@@ -1,8 +1,14 @@
+import argparse
+import importlib.util
+import os
+import shutil
 import uvicorn
 import logging
 import sys
 from pathlib import Path
 
+from app.core.config import settings
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -10,14 +16,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ruhani")
 
-def run_server():
+# Where workers share metrics snapshots when METRICS_DIR is not set
+DEFAULT_METRICS_DIR = ".cache/metrics"
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def prepare_workers(workers: int) -> None:
+    """Set up the environment the worker processes inherit"""
+    if workers > 1:
+        # Each worker's /metrics merges the others' snapshots; stale ones from
+        # a previous run would be counted again
+        metrics_dir = Path(os.environ.get("METRICS_DIR") or DEFAULT_METRICS_DIR)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        os.environ["METRICS_DIR"] = str(metrics_dir)
+        # Every worker has its own CPU process pool; share the cores between them
+        # unless the pool size is set explicitly
+        os.environ.setdefault("CPU_PROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2 // workers)))
+
+def run_production(host: str, port: int, workers: int) -> None:
+    """Serve with a supervised pool of worker processes.
+
+    Workers share one listening socket; uvicorn's supervisor restarts workers
+    that die and replaces them one by one on SIGHUP. Each worker runs the
+    startup warm-up before it accepts connections. On SIGTERM, workers stop
+    accepting, finish in-flight requests for up to
+    SERVER_GRACEFUL_TIMEOUT_SECONDS and then drain background jobs.
+    """
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    prepare_workers(workers)
+    logger.info(f"Starting RUHANI backend with {workers} workers on {host}:{port} ({loop}, {http})")
+    uvicorn.run(
+        "app.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        proxy_headers=True,
+        access_log=settings.SERVER_ACCESS_LOG,
+        log_level="info"
+    )
+
+def run_server(production: bool = False, host: str = settings.SERVER_HOST, port: int = settings.SERVER_PORT,
+               workers: int = settings.SERVER_WORKERS):
     """Run the FastAPI server with proper error handling"""
     try:
+        if production:
+            run_production(host, port, workers)
+            return
         logger.info("Starting RUHANI backend server...")
         uvicorn.run(
             "app.main:app",
-            host="0.0.0.0",
-            port=8000,
+            host=host,
+            port=port,
             reload=True,
             log_level="info"
         )
@@ -26,4 +83,12 @@ def run_server():
         sys.exit(1)
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the RUHANI backend")
+    parser.add_argument("--production", action="store_true", default=settings.is_production,
+                        help="Serve with multiple workers and no reloading (default when ENVIRONMENT=production)")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="Worker processes in production mode (default: CPU count)")
+    args = parser.parse_args()
+    run_server(production=args.production, host=args.host, port=args.port, workers=args.workers)